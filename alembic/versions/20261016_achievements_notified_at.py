@@ -0,0 +1,34 @@
+# /app/alembic/versions/20261016_achievements_notified_at.py
+
+"""Track which unlocked achievements were reported to the client
+
+Revision ID: 20261016_achievements_notified_at
+Revises: 20261016_conversation_summaries
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261016_achievements_notified_at'
+down_revision: Union[str, None] = '20261016_conversation_summaries'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Adds achievements.notified_at; existing achievements count as already reported."""
+    op.add_column(
+        'achievements',
+        sa.Column('notified_at', sa.DateTime(timezone=True), nullable=True, comment="When the unlock was reported to the client"),
+    )
+    op.execute("UPDATE achievements SET notified_at = created_at")
+
+
+def downgrade() -> None:
+    """Drops achievements.notified_at."""
+    op.drop_column('achievements', 'notified_at')
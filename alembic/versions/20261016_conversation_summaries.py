@@ -0,0 +1,39 @@
+# /app/alembic/versions/20261016_conversation_summaries.py
+
+"""Per-user rolling conversation summaries
+
+Revision ID: 20261016_conversation_summaries
+Revises: 20261016_messages_recent_index
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261016_conversation_summaries'
+down_revision: Union[str, None] = '20261016_messages_recent_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Creates conversation_summaries."""
+    op.create_table(
+        'conversation_summaries',
+        sa.Column('user_id', sa.String(length=64), nullable=False, comment="FK to users.id"),
+        sa.Column('summary', sa.Text(), nullable=False, comment="Rolling summary of messages outside the context window"),
+        sa.Column('last_message_id', sa.Integer(), nullable=False, comment="High-water mark: last summarized messages.id"),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_conversation_summaries_user_id_users'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', name=op.f('pk_conversation_summaries'))
+    )
+
+
+def downgrade() -> None:
+    """Drops conversation_summaries."""
+    op.drop_table('conversation_summaries')
@@ -0,0 +1,35 @@
+# /app/alembic/versions/20261016_messages_recent_index.py
+
+"""Composite index for most-recent-messages retrieval
+
+Revision ID: 20261016_messages_recent_index
+Revises: 20261016_user_message_counters
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261016_messages_recent_index'
+down_revision: Union[str, None] = '20261016_user_message_counters'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Adds (user_id, created_at DESC, id DESC) index on messages."""
+    op.create_index(
+        'ix_messages_user_id_created_at_id',
+        'messages',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Drops the composite index."""
+    op.drop_index('ix_messages_user_id_created_at_id', table_name='messages')
@@ -0,0 +1,56 @@
+# /app/alembic/versions/20261016_user_message_counters.py
+
+"""Denormalized per-user message counters on users
+
+Revision ID: 20261016_user_message_counters
+Revises: 20240620_initial
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261016_user_message_counters'
+down_revision: Union[str, None] = '20240620_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Adds user/assistant message counters and backfills them from messages."""
+    op.add_column(
+        'users',
+        sa.Column('user_message_count', sa.Integer(), server_default='0', nullable=False,
+                  comment="Number of messages with role 'user'"),
+    )
+    op.add_column(
+        'users',
+        sa.Column('assistant_message_count', sa.Integer(), server_default='0', nullable=False,
+                  comment="Number of messages with role 'assistant'"),
+    )
+
+    # Первичное заполнение. Для повторной синхронизации на живой базе есть
+    # Celery задача backfill_message_counters_task (пакетами по пользователям).
+    op.execute(
+        """
+        UPDATE users SET
+            user_message_count = (
+                SELECT count(*) FROM messages
+                WHERE messages.user_id = users.id AND messages.role = 'user'
+            ),
+            assistant_message_count = (
+                SELECT count(*) FROM messages
+                WHERE messages.user_id = users.id AND messages.role = 'assistant'
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Drops the message counters."""
+    op.drop_column('users', 'assistant_message_count')
+    op.drop_column('users', 'user_message_count')
@@ -0,0 +1,32 @@
+# /app/alembic/versions/20261016_user_streaks.py
+
+"""Daily activity streak columns on users
+
+Revision ID: 20261016_user_streaks
+Revises: 20261016_achievements_notified_at
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261016_user_streaks'
+down_revision: Union[str, None] = '20261016_achievements_notified_at'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Adds users.streak_days and users.last_active_date (streaks start from the next message)."""
+    op.add_column('users', sa.Column('streak_days', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('last_active_date', sa.Date(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drops the streak columns."""
+    op.drop_column('users', 'last_active_date')
+    op.drop_column('users', 'streak_days')
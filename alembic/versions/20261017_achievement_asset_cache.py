@@ -0,0 +1,48 @@
+# /app/alembic/versions/20261017_achievement_asset_cache.py
+
+"""Shared content-addressed cache of generated achievement assets
+
+Revision ID: 20261017_achievement_asset_cache
+Revises: 20261017_outbox_messages
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_achievement_asset_cache'
+down_revision: Union[str, None] = '20261017_outbox_messages'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Creates achievement_asset_cache."""
+    op.create_table(
+        'achievement_asset_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False, comment="sha256 of generation parameters"),
+        sa.Column('variant_index', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(length=64), nullable=False),
+        sa.Column('title_candidates', sa.JSON(), nullable=False),
+        sa.Column('icon_png', sa.LargeBinary(), nullable=True),
+        sa.Column('badge_png_url', sa.String(length=512), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=func.now(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), nullable=False, comment="LRU eviction order"),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_achievement_asset_cache')),
+        sa.UniqueConstraint('cache_key', 'variant_index', name='uq_achievement_asset_cache_key_variant'),
+    )
+    op.create_index(
+        op.f('ix_achievement_asset_cache_last_used_at'), 'achievement_asset_cache', ['last_used_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Drops achievement_asset_cache."""
+    op.drop_index(op.f('ix_achievement_asset_cache_last_used_at'), table_name='achievement_asset_cache')
+    op.drop_table('achievement_asset_cache')
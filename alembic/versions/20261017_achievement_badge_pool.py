@@ -0,0 +1,42 @@
+# /app/alembic/versions/20261017_achievement_badge_pool.py
+
+"""Pool of pre-generated achievement badge variants
+
+Revision ID: 20261017_achievement_badge_pool
+Revises: 20261017_achievement_asset_cache
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_achievement_badge_pool'
+down_revision: Union[str, None] = '20261017_achievement_asset_cache'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Creates achievement_badge_pool."""
+    op.create_table(
+        'achievement_badge_pool',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(length=64), nullable=False),
+        sa.Column('params_key', sa.String(length=64), nullable=False, comment="asset_cache_key of generation parameters"),
+        sa.Column('title_candidates', sa.JSON(), nullable=False),
+        sa.Column('badge_png_url', sa.String(length=512), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_achievement_badge_pool')),
+    )
+    op.create_index(op.f('ix_achievement_badge_pool_code'), 'achievement_badge_pool', ['code'], unique=False)
+
+
+def downgrade() -> None:
+    """Drops achievement_badge_pool."""
+    op.drop_index(op.f('ix_achievement_badge_pool_code'), table_name='achievement_badge_pool')
+    op.drop_table('achievement_badge_pool')
@@ -0,0 +1,34 @@
+# /app/alembic/versions/20261017_achievement_generation_count.py
+
+"""Generation counter on achievements for outbox dedupe keys
+
+Revision ID: 20261017_achievement_generation_count
+Revises: 20261017_outbox_published_at_index
+Create Date: 2026-10-17 18:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_achievement_generation_count'
+down_revision: Union[str, None] = '20261017_outbox_published_at_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Adds achievements.generation_count."""
+    op.add_column(
+        'achievements',
+        sa.Column('generation_count', sa.Integer(), server_default='0', nullable=False,
+                  comment="Times generation was queued (part of the outbox dedupe key)"),
+    )
+
+
+def downgrade() -> None:
+    """Drops achievements.generation_count."""
+    op.drop_column('achievements', 'generation_count')
@@ -0,0 +1,47 @@
+# /app/alembic/versions/20261017_outbox_messages.py
+
+"""Transactional outbox for Celery task dispatch
+
+Revision ID: 20261017_outbox_messages
+Revises: 20261016_user_streaks
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_outbox_messages'
+down_revision: Union[str, None] = '20261016_user_streaks'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Creates outbox_messages and a partial index over unpublished rows."""
+    op.create_table(
+        'outbox_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task_name', sa.String(length=255), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False, comment="Task keyword arguments"),
+        sa.Column('dedupe_key', sa.String(length=255), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=func.now(), nullable=False),
+        sa.Column('published_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_outbox_messages')),
+        sa.UniqueConstraint('dedupe_key', name=op.f('uq_outbox_messages_dedupe_key')),
+    )
+    op.create_index(
+        'ix_outbox_messages_unpublished', 'outbox_messages', ['id'],
+        postgresql_where=sa.text('published_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Drops outbox_messages."""
+    op.drop_index('ix_outbox_messages_unpublished', table_name='outbox_messages')
+    op.drop_table('outbox_messages')
@@ -0,0 +1,29 @@
+# /app/alembic/versions/20261017_outbox_published_at_index.py
+
+"""Index on outbox_messages.published_at for retention cleanup
+
+Revision ID: 20261017_outbox_published_at_index
+Revises: 20261017_achievement_badge_pool
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20261017_outbox_published_at_index'
+down_revision: Union[str, None] = '20261017_achievement_badge_pool'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Adds an index on outbox_messages.published_at."""
+    op.create_index('ix_outbox_messages_published_at', 'outbox_messages', ['published_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Drops the published_at index."""
+    op.drop_index('ix_outbox_messages_published_at', table_name='outbox_messages')
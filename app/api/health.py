@@ -3,7 +3,7 @@ from fastapi import APIRouter, status, HTTPException
 import redis
 from sqlalchemy import text
 
-from app.db.base import engine
+from app.db.base import get_engine
 from app.config import settings
 from app.core.calendar.base import get_calendar_provider
 
@@ -14,7 +14,7 @@ router = APIRouter(tags=["Health"])
 def healthcheck():
     # DB
     try:
-        with engine.connect() as conn:
+        with get_engine().connect() as conn:
             conn.execute(text("SELECT 1"))
     except Exception as e:
         raise HTTPException(500, detail=f"DB error: {e}")
@@ -2,34 +2,44 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
-from typing import List
+import time
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, TypeVar
 
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Body
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 # --- Наши Модули ---
 # LLM (клиент и типы)
 from app.core.llm.client import LLMClient
 from app.core.llm.message import Message, Event
+from app.core.llm.context import ContextAssembler
 # Сервисы
 from app.core.achievements.service import AchievementsService # <--- ИМПОРТИРУЕМ СЕРВИС АЧИВОК
-from app.core.users.service import UsersService
-# Модели
-from app.core.users.models import User # Для get_current_user
+from app.core.users.service import UsersService, local_now
+from app.core.users.context_cache import get_context_cache
+from app.core.outbox.service import OutboxService
+from app.core.outbox.relay import schedule_outbox_relay
+from app.core.aio import gather_cancelling
 # --- ЗАВИСИМОСТИ ---
-from app.db.base import get_async_db_session
-from app.core.auth.security import get_current_user
+from app.db.base import async_session_context
+from app.core.auth.schemas import TokenData
+from app.core.auth.security import get_token_data, load_user
+from app.config import settings
 
 # --- Инициализация ---
 router = APIRouter(
     prefix="/v1/chat",
     tags=["chat"],
-    dependencies=[Depends(get_current_user)] # Защищаем весь роутер
+    dependencies=[Depends(get_token_data)] # Защищаем весь роутер
 )
 log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 # --- Модели Запроса/Ответа (остаются как были) ---
 class ChatRequest(BaseModel):
@@ -50,6 +60,244 @@ class ChatResponse(BaseModel):
 def get_llm_client() -> LLMClient:
     return LLMClient()
 
+
+# --- Замер стадий реплики ---
+class _TurnTimings:
+    """Длительность стадий реплики: для лога и заголовка Server-Timing."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    async def run(self, stage: str, aw: Awaitable[T], timeout: float = 0) -> T:
+        """Выполняет стадию (с таймаутом, если он больше 0) и запоминает её длительность."""
+        started = time.perf_counter()
+        try:
+            return await (asyncio.wait_for(aw, timeout) if timeout > 0 else aw)
+        finally:
+            self.stages[stage] = time.perf_counter() - started
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing (миллисекунды), включая общее время."""
+        total = time.perf_counter() - self.started
+        return ", ".join(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in [*self.stages.items(), ("total", total)]
+        )
+
+
+# --- Общие шаги обработки реплики ---
+def _events_to_out(raw_events: List[Event]) -> List[EventOut]:
+    """Преобразует события, извлечённые LLM, в схему ответа API."""
+    processed_events_out: List[EventOut] = []
+    for e in raw_events:
+        if e:
+            processed_events_out.append(
+                EventOut(
+                    title=e["title"],
+                    start=e["start"].isoformat(),
+                    end=e["end"].isoformat() if e.get("end") else None,
+                )
+            )
+    return processed_events_out
+
+
+async def _load_history(user_id: str, limit: int) -> tuple[List[Message], Optional[str]]:
+    """
+    Фаза 1: проверяет пользователя из токена и читает историю и резюме
+    ранней части диалога в одной короткой транзакции. Соединение
+    возвращается в пул до вызова LLM.
+    """
+    async with async_session_context() as session:
+        # Пользователь из токена проверяется в этой же транзакции (404, если его нет)
+        await load_user(user_id, session)
+        user_service = UsersService(session, context_cache=get_context_cache())
+        history = await user_service.get_recent_messages(user_id, limit=limit)
+        summary = await user_service.get_conversation_summary(user_id)
+    return history, summary
+
+
+async def _load_context(llm: LLMClient, user_id: str, prompt: str) -> tuple[List[Message], List[str]]:
+    """
+    Читает последнюю историю и упаковывает её в бюджет токенов провайдера.
+    Резюме более ранней части диалога возвращается как RAG-факт.
+    """
+    history, summary = await _load_history(user_id, limit=settings.CHAT_HISTORY_FETCH_LIMIT)
+    rag_facts = [f"Summary of the earlier conversation: {summary}"] if summary else []
+    return ContextAssembler.for_provider(llm.provider.name).assemble(history, prompt), rag_facts
+
+
+async def _enqueue_summary_if_due(outbox: OutboxService, user_id: str, user_message_count: int) -> None:
+    """Ставит обновление резюме диалога в outbox каждые N сообщений пользователя."""
+    if not settings.CONVERSATION_SUMMARY_ENABLED:
+        return
+    if user_message_count % settings.CONVERSATION_SUMMARY_EVERY_N_MESSAGES != 0:
+        return
+    await outbox.enqueue(
+        "app.workers.tasks.summarize_conversation_task",
+        {"user_id": user_id},
+        dedupe_key=f"summarize_conversation:{user_id}:{user_message_count}",
+    )
+
+
+async def _persist_turn(user_id: str, message_text: str, ai_reply_text: str) -> List[str]:
+    """
+    Фаза 3: сохраняет реплику и ответ в одной короткой транзакции, после
+    коммита дописывает реплику в кэш контекста и, если в outbox что-то
+    записано, запускает relay.
+
+    Ачивки проверяются в этой же транзакции (режим ``inline``) или воркером
+    (режим ``async``: событие реплики пишется в outbox). В обоих режимах
+    возвращаются коды ачивок, о которых клиенту ещё не сообщали: в режиме
+    ``async`` результат проверки этой реплики придёт в одном из следующих ответов.
+    """
+    evaluate_inline = settings.ACHIEVEMENTS_EVALUATION_MODE == "inline"
+    message_time = local_now()
+    async with async_session_context() as session:
+        user_service = UsersService(session)
+        ach_service = AchievementsService(db_session=session) # LLMClient ему не нужен напрямую
+        outbox = OutboxService(session)
+
+        # 5. Сохранить сообщение пользователя и ответ AI в историю
+        #    (одна вставка; число сообщений приходит в той же транзакции)
+        log.debug("[API /chat] Saving messages to history for user '%s'", user_id)
+        saved_turn = await user_service.save_turn(
+            user_id, message_text, ai_reply_text, activity_date=message_time.date()
+        )
+        log.debug("[API /chat] Messages saved for user '%s'", user_id)
+        user_message_count = saved_turn.user_message_count
+
+        # 6. Проверить ачивки по актуальному числу пользовательских сообщений
+        if evaluate_inline:
+            log.debug("[API /chat] Checking achievements for user '%s' with count %d", user_id, user_message_count)
+            await ach_service.check_and_award(
+                user_id=user_id,
+                message_text=message_text,
+                user_message_count=user_message_count,
+                streak_days=saved_turn.streak_days,
+                message_time=message_time,
+            )
+        else:
+            await outbox.enqueue(
+                "app.workers.tasks.evaluate_achievements_task",
+                {
+                    "user_id": user_id,
+                    "message_text": message_text,
+                    "user_message_count": user_message_count,
+                    "streak_days": saved_turn.streak_days,
+                    "message_time": message_time.isoformat(),
+                },
+                dedupe_key=f"evaluate_achievements:{saved_turn.user_message_id}",
+            )
+        await _enqueue_summary_if_due(outbox, user_id, user_message_count)
+        unlocked_codes = await ach_service.claim_unnotified_codes(user_id)
+        relay_needed = outbox.enqueued
+
+    # Задачи из outbox публикуются только после коммита (если они есть)
+    if relay_needed:
+        schedule_outbox_relay()
+
+    # В кэш пишем только закоммиченные сообщения
+    context_cache = get_context_cache()
+    if context_cache is not None:
+        await context_cache.append(user_id, [
+            Message(role="user", content=message_text),
+            Message(role="assistant", content=ai_reply_text),
+        ])
+    return unlocked_codes
+
+
+async def _extract_events_safe(timings: _TurnTimings, stage: str, llm: LLMClient, text: str) -> List[Event]:
+    """
+    Извлечение событий - необязательная стадия: по таймауту
+    (CHAT_EXTRACT_TIMEOUT_SECONDS) или ошибке реплика обходится без событий.
+    """
+    try:
+        return await timings.run(stage, llm.extract_events(text), settings.CHAT_EXTRACT_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        log.warning("[API /chat] Stage '%s' timed out, continuing without its events", stage)
+    except Exception as e_extract:
+        log.warning("[API /chat] Stage '%s' failed, continuing without its events: %s", stage, e_extract)
+    return []
+
+
+def _start_speculative_extraction(
+    timings: _TurnTimings, llm: LLMClient, message_text: str
+) -> Optional[asyncio.Future]:
+    """Запускает извлечение событий из реплики пользователя параллельно с генерацией."""
+    if not settings.CHAT_SPECULATIVE_EXTRACTION_ENABLED:
+        return None
+    return asyncio.ensure_future(_extract_events_safe(timings, "extract_user", llm, message_text))
+
+
+async def _load_turn_context(
+    timings: _TurnTimings, llm: LLMClient, user_id: str, message_text: str
+) -> tuple[List[Message], List[str]]:
+    """Стадия ``context``: пользователь и история (см. _load_history) с таймаутом."""
+    return await timings.run(
+        "context", _load_context(llm, user_id, message_text), settings.CHAT_CONTEXT_TIMEOUT_SECONDS
+    )
+
+
+def _merge_events(*groups: List[Event]) -> List[Event]:
+    """Объединяет события стадий извлечения без повторов (по названию и началу)."""
+    merged: Dict[tuple, Event] = {}
+    for events in groups:
+        for event in events:
+            if event:
+                merged.setdefault((event["title"].strip().lower(), event["start"]), event)
+    return list(merged.values())
+
+
+async def _complete_turn(
+    llm: LLMClient,
+    user_id: str,
+    message_text: str,
+    ai_reply_text: str,
+    timings: _TurnTimings,
+    speculative_events: Optional[asyncio.Future] = None,
+) -> ChatResponse:
+    """
+    Завершает обработку реплики, когда ответ LLM уже получен: извлечение
+    событий из ответа и сохранение с проверкой ачивок независимы и идут
+    параллельно; события из реплики пользователя к этому моменту обычно уже
+    готовы. Общий код для обычного и потокового (SSE) эндпоинтов.
+    """
+    # 3. Извлечь события из ответа LLM  |  5-6. Сохранение и ачивки
+    # (4. Добавить события в календарь - пропускаем для MVP)
+    try:
+        reply_events, unlocked_codes = await gather_cancelling(
+            _extract_events_safe(timings, "extract_reply", llm, ai_reply_text),
+            timings.run(
+                "persist", _persist_turn(user_id, message_text, ai_reply_text), settings.CHAT_PERSIST_TIMEOUT_SECONDS
+            ),
+        )
+    except asyncio.TimeoutError:
+        # Исход коммита неизвестен, а реплика могла не попасть в кэш контекста
+        context_cache = get_context_cache()
+        if context_cache is not None:
+            await context_cache.invalidate(user_id)
+        raise
+    user_events = await speculative_events if speculative_events is not None else []
+
+    # 7. Сформировать ответ
+    return ChatResponse(
+        reply_text=ai_reply_text,
+        detected_events=_events_to_out(_merge_events(reply_events, user_events)),
+        unlocked_achievements=unlocked_codes, # Ачивки, о которых клиенту ещё не сообщали
+    )
+
+
+def _turn_timeout_error(endpoint: str, user_id: str, timings: _TurnTimings) -> HTTPException:
+    """Ошибка 504 для стадии, не уложившейся в свой таймаут."""
+    log.error("[API %s] Stage timed out for user '%s'. Timings: %s", endpoint, user_id, timings.server_timing())
+    return HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="The chat turn timed out")
+
+
+def _sse_frame(event: str, data: dict) -> str:
+    """Кодирует один кадр Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 # --- Эндпоинт Чата (Обновлен) ---
 @router.post(
     "/",
@@ -58,82 +306,130 @@ def get_llm_client() -> LLMClient:
     description="Sends user message, gets AI reply, and checks for achievements."
 )
 async def chat_endpoint(
+    response: Response,
     # --- Зависимости ---
-    db: AsyncSession = Depends(get_async_db_session),
-    current_user: User = Depends(get_current_user),
+    # Сессия БД не берётся из зависимости: каждая фаза открывает свою
+    # короткую транзакцию, чтобы не держать соединение во время вызова LLM.
+    # Пользователь проверяется не в зависимости, а в транзакции чтения истории.
+    token_data: TokenData = Depends(get_token_data),
     llm: LLMClient = Depends(get_llm_client),
     # Убираем calendar_provider для MVP
     # --- Тело запроса ---
     payload: ChatRequest = Body(...)
 ) -> ChatResponse:
-    user_id = current_user.id
+    user_id = token_data.user_id
     log.info("[API /chat] User '%s' request: '%.50s...'", user_id, payload.message_text)
-
-    # Инициализация сервисов
-    user_service = UsersService(db)
-    # --- ИНИЦИАЛИЗИРУЕМ AchievementsService ---
-    ach_service = AchievementsService(db_session=db) # LLMClient ему не нужен напрямую
-    # -----------------------------------------
+    timings = _TurnTimings()
+    speculative_events = _start_speculative_extraction(timings, llm, payload.message_text)
 
     try:
 
-        # 2. Вызвать LLM
-        # Передаем полную историю для LLM
-        full_history: List[Message] = await user_service.get_recent_messages(user_id, limit=20)
+        # 1. Пользователь и история (одна транзакция), история укладывается в бюджет токенов
+        full_history, rag_facts = await _load_turn_context(timings, llm, user_id, payload.message_text)
+
+        # 2. Вызвать LLM - соединение с БД в этот момент не удерживается
         log.debug("[API /chat] Calling llm.generate for user '%s' with %d history items", user_id, len(full_history))
-        ai_reply_text = await llm.generate(payload.message_text, full_history)
+        ai_reply_text = await timings.run(
+            "generate",
+            llm.generate(payload.message_text, full_history, rag_facts=rag_facts),
+            settings.CHAT_GENERATE_TIMEOUT_SECONDS,
+        )
         log.info("[API /chat] LLM reply for user '%s': '%.50s...'", user_id, ai_reply_text)
 
-        # 3. Извлечь события из ответа LLM
-        detected_raw_events: List[Event] = await llm.extract_events(ai_reply_text)
-        processed_events_out: List[EventOut] = []
-        for e in detected_raw_events:
-            if e:
-                processed_events_out.append(
-                    EventOut(
-                        title=e["title"],
-                        start=e["start"].isoformat(),
-                        end=e["end"].isoformat() if e.get("end") else None,
-                    )
-                )
-
-        # 4. Добавить события в календарь (Пропускаем для MVP)
-
-        # 5. Сохранить сообщение пользователя и ответ AI в историю
-        log.debug("[API /chat] Saving messages to history for user '%s'", user_id)
-        await user_service.save_message(user_id, Message(role="user", content=payload.message_text))
-        await user_service.save_message(user_id, Message(role="assistant", content=ai_reply_text))
-        log.debug("[API /chat] Messages saved for user '%s'", user_id)
-
-        # 6. Получить актуальное число пользовательских сообщений и проверить ачивки
-        user_message_count = await user_service.get_user_message_count(user_id)
-        log.debug("[API /chat] Checking achievements for user '%s' with count %d", user_id, user_message_count)
-
-        unlocked_codes: List[str] = await ach_service.check_and_award(
-            user_id=user_id,
-            message_text=payload.message_text,
-            user_message_count=user_message_count,
-        )
-        log.debug("[API /chat] Achievement check completed, tasks dispatched for: %s", unlocked_codes)
-        # -----------------------------------------------------------------------------------
-
-        # 7. Сформировать и вернуть ответ
-        response = ChatResponse(
-            reply_text=ai_reply_text,
-            detected_events=processed_events_out,
-            unlocked_achievements=unlocked_codes, # Передаем коды ачивок, для которых запущены задачи
+        # 3-7. События, сохранение истории, ачивки и ответ
+        chat_response = await _complete_turn(
+            llm, user_id, payload.message_text, ai_reply_text, timings, speculative_events
         )
+        response.headers["Server-Timing"] = timings.server_timing()
         log.info(
-            "[API /chat] Response ready for user '%s'. New Achievement Tasks: %s",
-            user_id, response.unlocked_achievements
+            "[API /chat] Response ready for user '%s'. New Achievement Tasks: %s. Timings: %s",
+            user_id, chat_response.unlocked_achievements, response.headers["Server-Timing"]
         )
-        return response
+        return chat_response
 
     except HTTPException:
         raise
+    except asyncio.TimeoutError as e_timeout:
+        raise _turn_timeout_error("/chat", user_id, timings) from e_timeout
     except Exception as e_main:
         log.exception("[API /chat] Unhandled error processing chat for user '%s': %s", user_id, e_main)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An internal error occurred: {type(e_main).__name__}"
         ) from e_main
+    finally:
+        if speculative_events is not None and not speculative_events.done():
+            speculative_events.cancel()
+
+
+# --- Потоковый Эндпоинт Чата (SSE) ---
+@router.post(
+    "/stream",
+    summary="Send message to AI with streamed reply (Authenticated)",
+    description=(
+        "Same as POST /v1/chat/, but the reply is pushed as Server-Sent Events: "
+        "`token` frames with text fragments as the model produces them, then a final "
+        "`done` frame with the full ChatResponse (detected_events, unlocked_achievements)."
+    ),
+    response_class=StreamingResponse,
+)
+async def chat_stream_endpoint(
+    token_data: TokenData = Depends(get_token_data),
+    llm: LLMClient = Depends(get_llm_client),
+    payload: ChatRequest = Body(...)
+) -> StreamingResponse:
+    user_id = token_data.user_id
+    log.info("[API /chat/stream] User '%s' request: '%.50s...'", user_id, payload.message_text)
+    timings = _TurnTimings()
+
+    # Пользователь и история читаются до начала стрима в короткой транзакции
+    try:
+        full_history, rag_facts = await _load_turn_context(timings, llm, user_id, payload.message_text)
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError as e_timeout:
+        raise _turn_timeout_error("/chat/stream", user_id, timings) from e_timeout
+    except Exception as e_load:
+        log.exception("[API /chat/stream] Unhandled error loading context for user '%s': %s", user_id, e_load)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An internal error occurred: {type(e_load).__name__}"
+        ) from e_load
+    # Заголовки уйдут с первым кадром: Server-Timing содержит только стадии до стрима
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Server-Timing": timings.server_timing()}
+
+    async def event_stream() -> AsyncIterator[str]:
+        reply_parts: List[str] = []
+        speculative_events = _start_speculative_extraction(timings, llm, payload.message_text)
+        try:
+            generate_started = time.perf_counter()
+            async for chunk in llm.generate_stream(payload.message_text, full_history, rag_facts=rag_facts):
+                reply_parts.append(chunk)
+                yield _sse_frame("token", {"text": chunk})
+            timings.stages["generate"] = time.perf_counter() - generate_started
+
+            ai_reply_text = "".join(reply_parts)
+            log.info("[API /chat/stream] LLM reply for user '%s': '%.50s...'", user_id, ai_reply_text)
+
+            # Сохранение выполняется после завершения стрима в собственной транзакции
+            response = await _complete_turn(
+                llm, user_id, payload.message_text, ai_reply_text, timings, speculative_events
+            )
+            log.info(
+                "[API /chat/stream] Stream completed for user '%s'. New Achievement Tasks: %s. Timings: %s",
+                user_id, response.unlocked_achievements, timings.server_timing()
+            )
+            yield _sse_frame("done", response.model_dump())
+        except asyncio.TimeoutError:
+            # Заголовки уже отправлены: 504 передаётся кадром ошибки
+            error = _turn_timeout_error("/chat/stream", user_id, timings)
+            yield _sse_frame("error", {"detail": error.detail})
+        except Exception as e_stream:
+            # Заголовки уже отправлены, поэтому об ошибке сообщаем отдельным кадром
+            log.exception("[API /chat/stream] Unhandled error streaming chat for user '%s': %s", user_id, e_stream)
+            yield _sse_frame("error", {"detail": f"An internal error occurred: {type(e_stream).__name__}"})
+        finally:
+            if speculative_events is not None and not speculative_events.done():
+                speculative_events.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
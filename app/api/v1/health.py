@@ -8,7 +8,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from redis import Redis
 from redis.exceptions import RedisError
 
-from app.db.base import engine
+from app.db.base import get_engine
 from app.config import settings
 from app.core.calendar import get_calendar_provider
 
@@ -22,7 +22,7 @@ def healthz():
 
     # DB
     try:
-        with engine.connect() as conn:
+        with get_engine().connect() as conn:
             conn.execute(text("SELECT 1"))
         out["db"] = "ok"
     except SQLAlchemyError as exc:
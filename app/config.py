@@ -6,7 +6,7 @@ import os
 import logging
 from pathlib import Path
 # Убедимся, что Optional импортирован
-from typing import List, Optional, Any, Dict
+from typing import List, Literal, Optional, Any, Dict
 
 from pydantic import Field, AnyHttpUrl, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -44,6 +44,86 @@ class Settings(BaseSettings):
     GOOGLE_CALENDAR_CREDENTIALS_JSON: Optional[str] = Field(
         None, env="GOOGLE_CALENDAR_CREDENTIALS_JSON"
     )
+    # --- Кэш контекста диалога (Redis + LRU в процессе) ---
+    CONTEXT_CACHE_ENABLED: bool = Field(True, env="CONTEXT_CACHE_ENABLED")
+    CONTEXT_CACHE_REDIS_URL: Optional[str] = Field(None, env="CONTEXT_CACHE_REDIS_URL") # По умолчанию REDIS_URL
+    CONTEXT_CACHE_MAX_MESSAGES: int = Field(50, env="CONTEXT_CACHE_MAX_MESSAGES")
+    CONTEXT_CACHE_TTL_SECONDS: int = Field(60 * 60 * 24, env="CONTEXT_CACHE_TTL_SECONDS")
+    CONTEXT_CACHE_LOCAL_LRU_SIZE: int = Field(1024, env="CONTEXT_CACHE_LOCAL_LRU_SIZE") # 0 - без LRU в процессе
+    # --- Конвейер реплики /chat (таймауты стадий в секундах; 0 - без таймаута) ---
+    CHAT_CONTEXT_TIMEOUT_SECONDS: float = Field(5.0, env="CHAT_CONTEXT_TIMEOUT_SECONDS") # Чтение истории; истёк - 504
+    CHAT_GENERATE_TIMEOUT_SECONDS: float = Field(60.0, env="CHAT_GENERATE_TIMEOUT_SECONDS") # Ответ модели; истёк - 504
+    CHAT_PERSIST_TIMEOUT_SECONDS: float = Field(10.0, env="CHAT_PERSIST_TIMEOUT_SECONDS") # Сохранение реплики; истёк - 504 (коммит мог пройти)
+    CHAT_EXTRACT_TIMEOUT_SECONDS: float = Field(2.0, env="CHAT_EXTRACT_TIMEOUT_SECONDS") # Извлечение событий; истёк - без событий
+    CHAT_SPECULATIVE_EXTRACTION_ENABLED: bool = Field(True, env="CHAT_SPECULATIVE_EXTRACTION_ENABLED") # События из реплики пользователя параллельно с генерацией
+    # --- Бюджет контекста LLM (приблизительные токены истории на запрос) ---
+    CHAT_HISTORY_FETCH_LIMIT: int = Field(50, env="CHAT_HISTORY_FETCH_LIMIT") # Сколько сообщений читать до упаковки
+    LLM_CONTEXT_TOKEN_BUDGET: int = Field(4000, env="LLM_CONTEXT_TOKEN_BUDGET") # Для провайдеров без своего бюджета
+    GEMINI_CONTEXT_TOKEN_BUDGET: int = Field(8000, env="GEMINI_CONTEXT_TOKEN_BUDGET")
+    STUB_CONTEXT_TOKEN_BUDGET: int = Field(4000, env="STUB_CONTEXT_TOKEN_BUDGET")
+    LLM_CONTEXT_MAX_MESSAGE_TOKENS: int = Field(1000, env="LLM_CONTEXT_MAX_MESSAGE_TOKENS") # Длиннее - обрезаются
+    # --- Извлечение событий из ответов (LLMClient.extract_events) ---
+    EVENT_EXTRACTION_LOCAL_ENABLED: bool = Field(True, env="EVENT_EXTRACTION_LOCAL_ENABLED") # Префильтр + dateparser (Gemini)
+    EVENT_EXTRACTION_LLM_ENABLED: bool = Field(False, env="EVENT_EXTRACTION_LLM_ENABLED") # Модель: для неоднозначных текстов или для всех без локального разбора
+    EVENT_EXTRACTION_LANGUAGES: str = Field("ru,en", env="EVENT_EXTRACTION_LANGUAGES") # Языки dateparser, через запятую
+    EVENT_EXTRACTION_PROCESSES: int = Field(1, env="EVENT_EXTRACTION_PROCESSES") # Пул dateparser; 0 - в потоке
+    EVENT_EXTRACTION_HORIZON_DAYS: int = Field(365, env="EVENT_EXTRACTION_HORIZON_DAYS") # Даты дальше - неоднозначны
+    EVENT_EXTRACTION_BATCH_WINDOW_MS: int = Field(5, env="EVENT_EXTRACTION_BATCH_WINDOW_MS") # Окно сбора пачки; 0 - без пачек
+    EVENT_EXTRACTION_BATCH_MAX_SIZE: int = Field(16, env="EVENT_EXTRACTION_BATCH_MAX_SIZE") # Текстов в одном промпте
+    # --- Ачивки ---
+    USER_ACTIVITY_TIMEZONE: str = Field("UTC", env="USER_ACTIVITY_TIMEZONE") # Для серий дней и правил по времени суток
+    # inline - проверка в транзакции запроса /chat;
+    # async - после коммита публикуется событие, проверку выполняет воркер
+    ACHIEVEMENTS_EVALUATION_MODE: Literal["inline", "async"] = Field("inline", env="ACHIEVEMENTS_EVALUATION_MODE")
+    # --- Общий кэш сгенерированных иконок/названий ачивок ---
+    ACHIEVEMENT_ASSET_CACHE_ENABLED: bool = Field(True, env="ACHIEVEMENT_ASSET_CACHE_ENABLED")
+    ACHIEVEMENT_ASSET_VARIANTS_PER_KEY: int = Field(3, env="ACHIEVEMENT_ASSET_VARIANTS_PER_KEY") # K вариантов на ключ до переиспользования
+    ACHIEVEMENT_ASSET_CACHE_MAX_ENTRIES: int = Field(10000, env="ACHIEVEMENT_ASSET_CACHE_MAX_ENTRIES") # Сверх лимита - LRU-вытеснение
+    ACHIEVEMENT_ASSET_CACHE_TOUCH_SECONDS: int = Field(3600, env="ACHIEVEMENT_ASSET_CACHE_TOUCH_SECONDS") # Точность LRU: не чаще одной записи на вариант
+    ACHIEVEMENT_ASSET_CACHE_VERSION: str = Field("1", env="ACHIEVEMENT_ASSET_CACHE_VERSION") # Смена версии инвалидирует кэш
+    # --- Пакетная генерация названий ачивок (LLMClient) ---
+    ACHIEVEMENT_NAME_BATCH_WINDOW_MS: int = Field(25, env="ACHIEVEMENT_NAME_BATCH_WINDOW_MS") # Окно сбора пачки; 0 - без пачек
+    ACHIEVEMENT_NAME_BATCH_MAX_SIZE: int = Field(20, env="ACHIEVEMENT_NAME_BATCH_MAX_SIZE") # Ачивок в одном промпте
+    # --- Пул заранее сгенерированных вариантов ачивок ---
+    ACHIEVEMENT_POOL_ENABLED: bool = Field(True, env="ACHIEVEMENT_POOL_ENABLED")
+    ACHIEVEMENT_POOL_TARGET_DEPTH: int = Field(20, env="ACHIEVEMENT_POOL_TARGET_DEPTH") # Вариантов на код
+    ACHIEVEMENT_POOL_BATCH_SIZE: int = Field(4, env="ACHIEVEMENT_POOL_BATCH_SIZE") # Иконок за один запрос генерации
+    ACHIEVEMENT_POOL_REFILL_WINDOWS: str = Field("01:00-06:00", env="ACHIEVEMENT_POOL_REFILL_WINDOWS") # Непиковые окна (USER_ACTIVITY_TIMEZONE), через запятую
+    ACHIEVEMENT_POOL_REFILL_INTERVAL_SECONDS: float = Field(900.0, env="ACHIEVEMENT_POOL_REFILL_INTERVAL_SECONDS")
+    # --- Локальный рендер значков ачивок (app/core/llm/badge_renderer.py) ---
+    BADGE_RENDER_PROCESSES: int = Field(2, env="BADGE_RENDER_PROCESSES") # 0 - рендер в потоке, без пула процессов
+    BADGE_RENDER_ZLIB_LEVEL: int = Field(6, env="BADGE_RENDER_ZLIB_LEVEL")
+    ACHIEVEMENT_ICON_FALLBACK_ENABLED: bool = Field(True, env="ACHIEVEMENT_ICON_FALLBACK_ENABLED") # Локальный значок, если Imagen недоступен
+    ACHIEVEMENT_ICON_PLACEHOLDER_ENABLED: bool = Field(True, env="ACHIEVEMENT_ICON_PLACEHOLDER_ENABLED") # Заглушка, пока генерирует Imagen
+    # --- Хранилище бинарных объектов (см. app/core/storage) ---
+    STORAGE_BACKEND: Optional[Literal["gcs", "local", "memory", "none"]] = Field(None, env="STORAGE_BACKEND") # None - gcs, если задан бакет
+    GCS_PUBLIC_READ: bool = Field(True, env="GCS_PUBLIC_READ") # make_public для загруженных объектов
+    LOCAL_STORAGE_ROOT: str = Field("./var/blobs", env="LOCAL_STORAGE_ROOT")
+    LOCAL_STORAGE_BASE_URL: Optional[str] = Field(None, env="LOCAL_STORAGE_BASE_URL") # Иначе file:// URI
+    STORAGE_MAX_CONCURRENCY: int = Field(8, env="STORAGE_MAX_CONCURRENCY") # Потоков для блокирующего SDK
+    STORAGE_UPLOAD_CHUNK_SIZE: int = Field(8 * 1024 * 1024, env="STORAGE_UPLOAD_CHUNK_SIZE") # Кратно 256 КБ
+    # --- Transactional outbox для задач Celery ---
+    OUTBOX_RELAY_ON_COMMIT: bool = Field(True, env="OUTBOX_RELAY_ON_COMMIT") # Публиковать сразу после коммита
+    OUTBOX_RELAY_BATCH_SIZE: int = Field(100, env="OUTBOX_RELAY_BATCH_SIZE")
+    OUTBOX_RELAY_INTERVAL_SECONDS: float = Field(30.0, env="OUTBOX_RELAY_INTERVAL_SECONDS") # Период задачи-подборщика
+    OUTBOX_MAX_ATTEMPTS: int = Field(5, env="OUTBOX_MAX_ATTEMPTS") # После стольких ошибок строка не публикуется (dead letter)
+    OUTBOX_RETENTION_HOURS: float = Field(72.0, env="OUTBOX_RETENTION_HOURS") # Сколько хранить опубликованные строки
+    # --- Резюме ранней части диалога (фоновая задача) ---
+    CONVERSATION_SUMMARY_ENABLED: bool = Field(True, env="CONVERSATION_SUMMARY_ENABLED")
+    CONVERSATION_SUMMARY_EVERY_N_MESSAGES: int = Field(20, env="CONVERSATION_SUMMARY_EVERY_N_MESSAGES") # Частота запуска
+    CONVERSATION_SUMMARY_KEEP_RECENT: int = Field(50, env="CONVERSATION_SUMMARY_KEEP_RECENT") # Окно, которое не сворачивается
+    CONVERSATION_SUMMARY_BATCH_SIZE: int = Field(200, env="CONVERSATION_SUMMARY_BATCH_SIZE")
+    # --- Пул соединений БД (на процесс; профили для web и воркеров Celery) ---
+    DB_ROLE: Literal["web", "worker"] = Field("web", env="DB_ROLE") # Воркер Celery переключается сам (см. runtime.py)
+    DB_ECHO: bool = Field(False, env="DB_ECHO")
+    DB_POOL_SIZE_WEB: int = Field(10, env="DB_POOL_SIZE_WEB")
+    DB_MAX_OVERFLOW_WEB: int = Field(10, env="DB_MAX_OVERFLOW_WEB")
+    DB_POOL_TIMEOUT_WEB: float = Field(10.0, env="DB_POOL_TIMEOUT_WEB") # Секунды ожидания свободного соединения
+    DB_POOL_SIZE_WORKER: int = Field(2, env="DB_POOL_SIZE_WORKER")
+    DB_MAX_OVERFLOW_WORKER: int = Field(2, env="DB_MAX_OVERFLOW_WORKER")
+    DB_POOL_TIMEOUT_WORKER: float = Field(30.0, env="DB_POOL_TIMEOUT_WORKER")
+    DB_POOL_RECYCLE_SECONDS: int = Field(1800, env="DB_POOL_RECYCLE_SECONDS")
+    DB_STATEMENT_CACHE_SIZE: int = Field(100, env="DB_STATEMENT_CACHE_SIZE") # asyncpg; 0 - для PgBouncer в transaction mode
     # GOOGLE_CLIENT_ID: Optional[str] = Field(None, env="GOOGLE_CLIENT_ID") # Закомментировано для MVP
     # TOKENS_ENCRYPTION_KEY: Optional[str] = Field(None, env="TOKENS_ENCRYPTION_KEY") # Закомментировано для MVP
 
@@ -57,6 +137,20 @@ class Settings(BaseSettings):
              raise ValueError("Redis URL must be set for Celery defaults") # pragma: no cover
         return self
 
+    def get_context_token_budget(self, provider_name: str) -> int:
+        """Бюджет токенов истории для провайдера: ``<PROVIDER>_CONTEXT_TOKEN_BUDGET`` или общий."""
+        return getattr(self, f"{provider_name.upper()}_CONTEXT_TOKEN_BUDGET", self.LLM_CONTEXT_TOKEN_BUDGET)
+
+    def get_db_pool_options(self, role: str) -> Dict[str, Any]:
+        """Параметры пула соединений для ``create_async_engine`` по профилю роли процесса."""
+        suffix = role.upper()
+        return {
+            "pool_size": getattr(self, f"DB_POOL_SIZE_{suffix}"),
+            "max_overflow": getattr(self, f"DB_MAX_OVERFLOW_{suffix}"),
+            "pool_timeout": getattr(self, f"DB_POOL_TIMEOUT_{suffix}"),
+            "pool_recycle": self.DB_POOL_RECYCLE_SECONDS,
+        }
+
 # --- ЯВНЫЙ ВЫЗОВ model_rebuild ---
 try:
     Settings.model_rebuild(force=True)
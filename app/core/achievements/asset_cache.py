@@ -0,0 +1,205 @@
+# app/core/achievements/asset_cache.py
+
+"""
+Общий контентно-адресуемый кэш сгенерированных ассетов ачивок.
+
+Тема генерации берётся из статических правил (``generation_theme``), поэтому
+для одного кода ачивки Imagen и Gemini получают практически одинаковые
+запросы. Кэш хранит результаты по ключу - хэшу параметров генерации - и
+позволяет воркеру переиспользовать их вместо повторной генерации.
+
+Политика разнообразия: на ключ накапливается K вариантов (первые K
+разблокировок генерируют новый вариант), дальше пользователь получает один из
+них - детерминированно по seed (id пользователя). При превышении лимита
+записей вытесняются варианты, которые дольше всех не использовались (LRU).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from .models import AchievementAssetVariant
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedAsset:
+    """Вариант ассетов, выбранный для пользователя."""
+    cache_key: str
+    variant_index: int
+    title_candidates: List[str]
+    icon_png: Optional[bytes]
+    badge_png_url: Optional[str]
+
+
+def asset_cache_key(
+    code: str,
+    theme: str,
+    style_id: str,
+    palette: str,
+    shape: str,
+    model_version: str,
+) -> str:
+    """
+    Ключ кэша: sha256 от параметров генерации. Версия кэша из настроек
+    входит в ключ, поэтому её смена инвалидирует все записи.
+
+    Returns:
+        str: Hex-дайджест (64 символа).
+    """
+    params = [settings.ACHIEVEMENT_ASSET_CACHE_VERSION, code, theme, style_id, palette, shape, model_version]
+    return hashlib.sha256(json.dumps(params, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _stable_index(seed: str, size: int) -> int:
+    # hash() рандомизирован между процессами - нужен стабильный хэш
+    digest = hashlib.blake2b(seed.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % size
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite возвращает datetime без tzinfo
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+class AchievementAssetCache:
+    """Доступ к таблице achievement_asset_cache (сервис не коммитит сессию)."""
+
+    def __init__(
+        self,
+        db_session: AsyncSession,
+        variants_per_key: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ):
+        """
+        Args:
+            db_session (AsyncSession): Асинхронная сессия БД.
+            variants_per_key (int | None): K - сколько вариантов накопить на ключ.
+            max_entries (int | None): Лимит записей до LRU-вытеснения.
+        """
+        self.db = db_session
+        self.variants_per_key = max(1, variants_per_key or settings.ACHIEVEMENT_ASSET_VARIANTS_PER_KEY)
+        self.max_entries = max_entries or settings.ACHIEVEMENT_ASSET_CACHE_MAX_ENTRIES
+
+    async def lookup(self, cache_key: str, seed: str) -> Optional[CachedAsset]:
+        """
+        Возвращает вариант для пользователя, если по ключу уже накоплено K
+        вариантов; иначе None - нужно сгенерировать новый вариант.
+
+        Args:
+            cache_key (str): Ключ из ``asset_cache_key``.
+            seed (str): Значение для стабильного выбора варианта (id пользователя).
+        """
+        stmt = (
+            select(AchievementAssetVariant)
+            .where(AchievementAssetVariant.cache_key == cache_key)
+            .order_by(AchievementAssetVariant.variant_index)
+        )
+        variants = (await self.db.execute(stmt)).scalars().all()
+        if len(variants) < self.variants_per_key:
+            return None
+
+        variant = variants[_stable_index(seed, len(variants))]
+        # last_used_at обновляется не чаще раза в ACHIEVEMENT_ASSET_CACHE_TOUCH_SECONDS:
+        # горячий вариант не становится точкой конкурентной записи
+        now = datetime.now(timezone.utc)
+        if now - _as_utc(variant.last_used_at) >= timedelta(seconds=settings.ACHIEVEMENT_ASSET_CACHE_TOUCH_SECONDS):
+            variant.last_used_at = now
+            await self.db.flush()
+        return CachedAsset(
+            cache_key=cache_key,
+            variant_index=variant.variant_index,
+            title_candidates=list(variant.title_candidates),
+            icon_png=variant.icon_png,
+            badge_png_url=variant.badge_png_url,
+        )
+
+    def _insert_for_dialect(self):
+        dialect_name = self.db.get_bind().dialect.name
+        if dialect_name == "postgresql":
+            return postgresql_insert(AchievementAssetVariant)
+        if dialect_name == "sqlite":
+            return sqlite_insert(AchievementAssetVariant)
+        raise NotImplementedError(f"Asset cache insert is not supported for dialect '{dialect_name}'") # pragma: no cover
+
+    async def store(
+        self,
+        cache_key: str,
+        code: str,
+        title_candidates: Sequence[str],
+        icon_png: Optional[bytes],
+        badge_png_url: Optional[str],
+    ) -> bool:
+        """
+        Добавляет новый вариант по ключу и при необходимости вытесняет
+        старые записи. Параллельная запись того же индекса варианта другим
+        воркером не считается ошибкой - вариант просто не добавляется.
+
+        Returns:
+            bool: True, если вариант добавлен.
+        """
+        next_index = (
+            await self.db.execute(
+                select(func.coalesce(func.max(AchievementAssetVariant.variant_index) + 1, 0))
+                .where(AchievementAssetVariant.cache_key == cache_key)
+            )
+        ).scalar_one()
+        stmt = (
+            self._insert_for_dialect()
+            .values(
+                cache_key=cache_key,
+                variant_index=next_index,
+                code=code,
+                title_candidates=list(title_candidates),
+                icon_png=icon_png,
+                badge_png_url=badge_png_url,
+                last_used_at=datetime.now(timezone.utc),
+            )
+            .on_conflict_do_nothing(index_elements=["cache_key", "variant_index"])
+        )
+        inserted = (await self.db.execute(stmt)).rowcount > 0
+        if inserted:
+            log.info("Asset cache: stored variant %d for '%s' (key %s)", next_index, code, cache_key[:12])
+            await self.evict()
+        return inserted
+
+    async def evict(self) -> int:
+        """
+        Удаляет варианты, которые дольше всех не использовались, сверх
+        ``max_entries``.
+
+        Returns:
+            int: Число удалённых записей.
+        """
+        total = (await self.db.execute(select(func.count(AchievementAssetVariant.id)))).scalar_one()
+        excess = total - self.max_entries
+        if excess <= 0:
+            return 0
+        lru_ids = (
+            select(AchievementAssetVariant.id)
+            .order_by(AchievementAssetVariant.last_used_at, AchievementAssetVariant.id)
+            .limit(excess)
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            delete(AchievementAssetVariant)
+            .where(AchievementAssetVariant.id.in_(lru_ids))
+            .execution_options(synchronize_session=False)
+        )
+        log.info("Asset cache: evicted %d least recently used variants", result.rowcount)
+        return result.rowcount
+
+
+__all__ = ["AchievementAssetCache", "CachedAsset", "asset_cache_key"]
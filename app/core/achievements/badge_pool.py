@@ -0,0 +1,151 @@
+# app/core/achievements/badge_pool.py
+
+"""
+Пул заранее сгенерированных вариантов ачивок.
+
+Набор кодов ачивок небольшой и известен заранее (ACHIEVEMENT_RULES), поэтому
+названия и иконки можно сгенерировать до разблокировки: периодическая задача
+воркера в непиковые окна (ACHIEVEMENT_POOL_REFILL_WINDOWS) пополняет пул
+каждого кода до ACHIEVEMENT_POOL_TARGET_DEPTH. При разблокировке вариант
+атомарно забирается из пула, и ачивка сразу становится COMPLETED - без
+ожидания Imagen. Пустой пул - обычная фоновая генерация.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import AchievementBadgeVariant
+
+log = logging.getLogger(__name__)
+
+TimeWindow = Tuple[time, time]
+
+
+@dataclass(frozen=True)
+class PooledVariant:
+    """Вариант, забранный из пула."""
+    title_candidates: List[str]
+    badge_png_url: str
+
+
+def parse_time_windows(spec: str) -> List[TimeWindow]:
+    """
+    Разбирает окна вида ``"01:00-06:00, 13:30-14:00"``. Окно может
+    переходить через полночь (``"23:00-02:00"``).
+
+    Raises:
+        ValueError: Неверный формат окна.
+    """
+    windows: List[TimeWindow] = []
+    for part in filter(None, (chunk.strip() for chunk in spec.split(","))):
+        try:
+            start, end = (time.fromisoformat(value.strip()) for value in part.split("-"))
+        except ValueError as e:
+            raise ValueError(f"Invalid time window {part!r}, expected 'HH:MM-HH:MM'") from e
+        windows.append((start, end))
+    return windows
+
+
+def in_time_windows(moment: time, windows: Sequence[TimeWindow]) -> bool:
+    """Попадает ли время в одно из окон (начало включительно, конец - нет)."""
+    for start, end in windows:
+        if start <= end:
+            if start <= moment < end:
+                return True
+        elif moment >= start or moment < end:
+            return True
+    return False
+
+
+class BadgePoolService:
+    """Доступ к таблице achievement_badge_pool (сервис не коммитит сессию)."""
+
+    def __init__(self, db_session: AsyncSession):
+        """
+        Args:
+            db_session (AsyncSession): Асинхронная сессия БД.
+        """
+        self.db = db_session
+
+    async def depths(self) -> Dict[str, int]:
+        """Число доступных вариантов по кодам."""
+        stmt = select(AchievementBadgeVariant.code, func.count()).group_by(AchievementBadgeVariant.code)
+        return {code: count for code, count in (await self.db.execute(stmt)).all()}
+
+    async def discard_stale(self, code: str, params_key: str) -> int:
+        """
+        Удаляет варианты кода, сгенерированные с другими параметрами (сменилась
+        тема, стиль или модель).
+
+        Returns:
+            int: Число удалённых вариантов.
+        """
+        result = await self.db.execute(
+            delete(AchievementBadgeVariant)
+            .where(AchievementBadgeVariant.code == code, AchievementBadgeVariant.params_key != params_key)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            log.info("Badge pool: discarded %d stale variants of '%s'", result.rowcount, code)
+        return result.rowcount
+
+    async def add(self, code: str, params_key: str, variants: Sequence[Tuple[Sequence[str], str]]) -> int:
+        """
+        Добавляет варианты в пул одним INSERT.
+
+        Args:
+            code (str): Код ачивки.
+            params_key (str): Ключ параметров генерации (``asset_cache_key``).
+            variants: Пары (кандидаты названий, URL загруженной иконки).
+
+        Returns:
+            int: Число добавленных вариантов.
+        """
+        if not variants:
+            return 0
+        await self.db.execute(
+            insert(AchievementBadgeVariant),
+            [
+                {"code": code, "params_key": params_key, "title_candidates": list(titles), "badge_png_url": url}
+                for titles, url in variants
+            ],
+        )
+        return len(variants)
+
+    async def claim(self, code: str) -> Optional[PooledVariant]:
+        """
+        Атомарно забирает один вариант кода: ``DELETE ... WHERE id = (SELECT ...
+        FOR UPDATE SKIP LOCKED) RETURNING``. Параллельные разблокировки
+        получают разные варианты и не ждут друг друга.
+
+        Returns:
+            PooledVariant | None: Вариант или None, если пул кода пуст.
+        """
+        oldest_id = (
+            select(AchievementBadgeVariant.id)
+            .where(AchievementBadgeVariant.code == code)
+            .order_by(AchievementBadgeVariant.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            delete(AchievementBadgeVariant)
+            .where(AchievementBadgeVariant.id == oldest_id)
+            .returning(AchievementBadgeVariant.title_candidates, AchievementBadgeVariant.badge_png_url)
+            .execution_options(synchronize_session=False)
+        )
+        row = (await self.db.execute(stmt)).first()
+        if row is None:
+            return None
+        return PooledVariant(title_candidates=list(row.title_candidates), badge_png_url=row.badge_png_url)
+
+
+__all__ = ["BadgePoolService", "PooledVariant", "in_time_windows", "parse_time_windows"]
@@ -0,0 +1,160 @@
+# /app/app/core/achievements/matcher.py
+
+"""
+Поиск ключевых слов правил ачивок в тексте сообщения.
+
+Все ключевые слова всех правил компилируются один раз в префиксное дерево
+(trie). Сообщение нормализуется и просматривается за один проход: от начала
+каждого слова идём по дереву, пока есть совпадение. Ключевое слово считается
+найденным, только если оно начинается с начала слова, а остаток слова - одно
+из допустимых окончаний. Поэтому "кот" находит "кота" и "коты", но не
+"который".
+
+Морфология упрощённая: у ключевого слова отбрасывается известное окончание
+(если остаётся основа не короче ``min_stem_length``), после чего к основе
+допускается любое окончание из набора. Многословные ключи ("black cat")
+поддерживаются: слова сообщения сравниваются через один пробел.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Set
+
+log = logging.getLogger(__name__)
+
+# Окончания, которые допускаются после основы ключевого слова ("" - само слово)
+RUSSIAN_ENDINGS: FrozenSet[str] = frozenset({
+    "", "а", "я", "у", "ю", "е", "и", "ы", "о", "ь",
+    "ой", "ей", "ом", "ем", "ам", "ям", "ах", "ях", "ов", "ев", "ью",
+    "ами", "ями", "ого", "его", "ому", "ему", "ые", "ие", "ый", "ий", "ая", "яя",
+    "ик", "ика", "ику", "ики", "иком", "ок", "ка", "ки", "ку", "ке", "кой",
+})
+ENGLISH_ENDINGS: FrozenSet[str] = frozenset({"", "s", "es", "ie", "ies", "y"})
+DEFAULT_ENDINGS: FrozenSet[str] = RUSSIAN_ENDINGS | ENGLISH_ENDINGS
+
+_WORD_RE = re.compile(r"\w+")
+_CODES = "" # Ключ узла дерева с кодами правил; символ текста не бывает пустой строкой
+
+
+def normalize_text(text: str) -> str:
+    """Приводит текст к виду, в котором хранятся ключевые слова (регистр, ё -> е)."""
+    return text.lower().replace("ё", "е")
+
+
+class KeywordMatcher:
+    """
+    Скомпилированный набор ключевых слов всех правил.
+
+    Пример:
+        matcher = KeywordMatcher({"cat_lover_discovery": ["кот", "cat"]})
+        matcher.match("У меня два кота")  # {"cat_lover_discovery"}
+    """
+
+    def __init__(
+        self,
+        keywords_by_code: Mapping[str, Iterable[str]],
+        endings: Iterable[str] = DEFAULT_ENDINGS,
+        min_stem_length: int = 3,
+    ) -> None:
+        """
+        Args:
+            keywords_by_code (Mapping[str, Iterable[str]]): Код правила -> его ключевые слова.
+            endings (Iterable[str]): Допустимые окончания после основы.
+            min_stem_length (int): Минимальная длина основы при отбрасывании окончания.
+        """
+        self.endings: FrozenSet[str] = frozenset(normalize_text(e) for e in endings) | {""}
+        self.min_stem_length = min_stem_length
+        # Самые длинные окончания проверяем первыми при выделении основы
+        self._endings_by_length: List[str] = sorted(self.endings, key=len, reverse=True)
+        self._root: Dict[str, Any] = {}
+        self.codes: FrozenSet[str] = frozenset(keywords_by_code)
+        patterns = 0
+        for code, keywords in keywords_by_code.items():
+            for keyword in keywords:
+                stem = self._stem(keyword)
+                if stem:
+                    self._add(stem, code)
+                    patterns += 1
+        log.debug("KeywordMatcher compiled: %d rules, %d patterns", len(self.codes), patterns)
+
+    @classmethod
+    def from_rules(cls, rules: Mapping[str, Mapping[str, Any]], **kwargs: Any) -> "KeywordMatcher":
+        """Строит matcher из описаний правил (условие ``trigger.keywords``)."""
+        return cls(
+            {
+                code: rule["trigger"]["keywords"]
+                for code, rule in rules.items()
+                if rule.get("trigger", {}).get("keywords")
+            },
+            **kwargs,
+        )
+
+    def _stem(self, keyword: str) -> str:
+        """Нормализует ключевое слово и отбрасывает окончание у последнего слова."""
+        words = _WORD_RE.findall(normalize_text(keyword))
+        if not words:
+            return ""
+        last = words[-1]
+        for ending in self._endings_by_length:
+            if ending and last.endswith(ending) and len(last) - len(ending) >= self.min_stem_length:
+                last = last[: -len(ending)]
+                break
+        return " ".join(words[:-1] + [last])
+
+    def _add(self, stem: str, code: str) -> None:
+        node = self._root
+        for char in stem:
+            node = node.setdefault(char, {})
+        node.setdefault(_CODES, set()).add(code)
+
+    def match(self, text: str | None) -> Set[str]:
+        """
+        Возвращает коды всех правил, ключевые слова которых встречаются в тексте.
+
+        Args:
+            text (str | None): Текст сообщения.
+
+        Returns:
+            Set[str]: Коды сработавших правил (пустое множество, если совпадений нет).
+        """
+        found: Set[str] = set()
+        if not text:
+            return found
+        words = _WORD_RE.findall(normalize_text(text))
+        if not words:
+            return found
+        line = " ".join(words)
+        length = len(line)
+
+        # Конец слова для каждой позиции строки - чтобы выделить окончание за O(1)
+        word_end: List[int] = [0] * length
+        position = 0
+        for word in words:
+            end = position + len(word)
+            for i in range(position, end):
+                word_end[i] = end
+            position = end + 1
+
+        root = self._root
+        endings = self.endings
+        position = 0
+        for word in words:
+            node = root
+            j = position
+            while j < length:
+                node = node.get(line[j])
+                if node is None:
+                    break
+                j += 1
+                codes = node.get(_CODES)
+                if codes is not None:
+                    tail_end = word_end[j - 1]
+                    if line[j:tail_end] in endings:
+                        found |= codes
+            position += len(word) + 1
+        return found
+
+
+__all__ = ["KeywordMatcher", "normalize_text", "DEFAULT_ENDINGS", "RUSSIAN_ENDINGS", "ENGLISH_ENDINGS"]
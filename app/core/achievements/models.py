@@ -6,7 +6,7 @@ from typing import List, Optional, Sequence, Union, TYPE_CHECKING
 
 import sqlalchemy as sa
 from sqlalchemy import (
-    DateTime, ForeignKey, Integer, String, Text, Boolean, UniqueConstraint
+    JSON, DateTime, ForeignKey, Integer, LargeBinary, String, Text, Boolean, UniqueConstraint
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
@@ -29,8 +29,54 @@ class Achievement(Base):
     title: Mapped[Optional[str]] = mapped_column(String(128), nullable=True, comment="Generated title")
     badge_png_url: Mapped[Optional[str]] = mapped_column(String(512), nullable=True, comment="URL to the generated PNG badge in GCS")
     status: Mapped[str] = mapped_column(String(32), default="PENDING_GENERATION", nullable=False, index=True)
+    notified_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True, comment="When the unlock was reported to the client")
+    generation_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False, server_default="0", comment="Times generation was queued (part of the outbox dedupe key)")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     def __repr__(self) -> str: # pragma: no cover
         return f"<Achievement id={self.id} user='{self.user_id}' code='{self.code}' status='{self.status}'>"
+
+
+class AchievementAssetVariant(Base):
+    """
+    Вариант сгенерированных ассетов ачивки (иконка + кандидаты названий),
+    общий для всех пользователей. ``cache_key`` - хэш параметров генерации
+    (код, тема, стиль, палитра, форма, версия модели); на один ключ хранится
+    до K вариантов (ACHIEVEMENT_ASSET_VARIANTS_PER_KEY).
+    """
+    __tablename__ = "achievement_asset_cache"
+    __table_args__ = (UniqueConstraint('cache_key', 'variant_index', name='uq_achievement_asset_cache_key_variant'),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    cache_key: Mapped[str] = mapped_column(String(64), nullable=False, comment="sha256 of generation parameters")
+    variant_index: Mapped[int] = mapped_column(Integer, nullable=False)
+    code: Mapped[str] = mapped_column(String(64), nullable=False)
+    title_candidates: Mapped[List[str]] = mapped_column(JSON, nullable=False)
+    icon_png: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    badge_png_url: Mapped[Optional[str]] = mapped_column(String(512), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True, comment="LRU eviction order")
+
+    def __repr__(self) -> str: # pragma: no cover
+        return f"<AchievementAssetVariant code='{self.code}' key='{self.cache_key[:12]}' variant={self.variant_index}>"
+
+
+class AchievementBadgeVariant(Base):
+    """
+    Заранее сгенерированный вариант ачивки (названия + загруженная иконка)
+    в пуле кода. При разблокировке вариант забирается из пула (строка
+    удаляется) и ачивка сразу становится COMPLETED. Пул пополняет
+    периодическая задача в непиковые часы.
+    """
+    __tablename__ = "achievement_badge_pool"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    code: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    params_key: Mapped[str] = mapped_column(String(64), nullable=False, comment="asset_cache_key of generation parameters")
+    title_candidates: Mapped[List[str]] = mapped_column(JSON, nullable=False)
+    badge_png_url: Mapped[str] = mapped_column(String(512), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str: # pragma: no cover
+        return f"<AchievementBadgeVariant id={self.id} code='{self.code}'>"
@@ -0,0 +1,153 @@
+# /app/app/core/achievements/rules.py
+
+"""
+Декларативные правила ачивок и их компиляция.
+
+Правило описывается данными (см. ACHIEVEMENT_RULES): тексты для генерации и
+блок ``trigger`` с условиями. Все условия блока должны выполняться
+одновременно. Поддерживаемые условия:
+
+  • ``keywords``          - ключевые слова в сообщении (см. KeywordMatcher);
+  • ``user_message_count`` - число сообщений пользователя равно значению
+                            (срабатывает один раз - на этом сообщении);
+  • ``min_user_messages`` - число сообщений пользователя не меньше порога;
+  • ``streak_days``       - дней подряд с сообщениями ровно столько;
+  • ``min_streak_days``   - дней подряд с сообщениями не меньше порога;
+  • ``time_of_day``       - локальное время сообщения в интервале
+                            ("HH:MM", "HH:MM"), интервал может переходить
+                            через полночь.
+
+RuleEngine компилирует правила в функции-проверки один раз при старте и
+проверяет все правила за один проход, без обращений к БД.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time
+from typing import Any, Callable, Dict, List, Mapping, Set, Tuple
+
+from .matcher import KeywordMatcher
+
+log = logging.getLogger(__name__)
+
+# --- Правила ачивок ---
+# Ключ - это achievement_code
+# generation_theme - используется как контекст/тема для генерации названия и иконки
+ACHIEVEMENT_RULES: Dict[str, Dict[str, Any]] = {
+    "first_message_sent": {
+        "title_hint": "Ice Breaker", # Используется для PENDING статуса
+        "generation_theme": "A user sending their very first encouraging message in a new friendly AI chat application, breaking the ice.",
+        "description_for_user": "You've sent your first message and started a new friendship!", # Описание для пользователя
+        "trigger": {"user_message_count": 1},
+    },
+    "cat_lover_discovery": {
+        "title_hint": "Feline Friend",
+        "generation_theme": "A joyful moment of discovering a shared love for cats, perhaps a user mentioning their pet cat.",
+        "description_for_user": "You've revealed your love for cats! Meow-tastic!",
+        "trigger": {"keywords": ["cat", "кошка", "котенок", "кот", "кота", "кошку", "котэ", "мур", "мяу"]},
+    },
+    "long_convo_starter": {
+        "title_hint": "Chatty Companion",
+        "generation_theme": "A user engaging in a significantly long and meaningful conversation with the AI, showing deep engagement.",
+        "description_for_user": "Wow, what a great conversation we had! You're a true Chatty Companion.",
+        "trigger": {"user_message_count": 50},
+    },
+    "three_day_streak": {
+        "title_hint": "Steady Friend",
+        "generation_theme": "A user coming back to chat with their AI friend three days in a row, a growing daily habit.",
+        "description_for_user": "Three days in a row - you're becoming a regular!",
+        "trigger": {"streak_days": 3},
+    },
+    "night_owl": {
+        "title_hint": "Night Owl",
+        "generation_theme": "A cozy late-night conversation under the moon and stars, an owl keeping the user company.",
+        "description_for_user": "Chatting after midnight? Hello, fellow night owl!",
+        "trigger": {"time_of_day": ("00:00", "05:00")},
+    },
+}
+
+
+@dataclass(frozen=True)
+class TurnContext:
+    """Данные реплики пользователя, по которым проверяются правила."""
+    message_text: str | None
+    user_message_count: int
+    streak_days: int
+    local_time: datetime # Время сообщения в часовом поясе пользователя
+
+
+# Проверка условия: (контекст, коды правил с найденными ключевыми словами) -> bool
+RuleCheck = Callable[[TurnContext, Set[str]], bool]
+
+
+def _parse_time(value: str) -> time:
+    hours, minutes = value.split(":")
+    return time(int(hours), int(minutes))
+
+
+def _compile_trigger(code: str, trigger: Mapping[str, Any]) -> List[RuleCheck]:
+    """Превращает блок ``trigger`` правила в список функций-проверок."""
+    checks: List[RuleCheck] = []
+    for condition, value in trigger.items():
+        if condition == "keywords":
+            checks.append(lambda ctx, keyword_codes: code in keyword_codes)
+        elif condition == "user_message_count":
+            expected = int(value)
+            checks.append(lambda ctx, _, expected=expected: ctx.user_message_count == expected)
+        elif condition == "min_user_messages":
+            threshold = int(value)
+            checks.append(lambda ctx, _, threshold=threshold: ctx.user_message_count >= threshold)
+        elif condition == "streak_days":
+            expected = int(value)
+            checks.append(lambda ctx, _, expected=expected: ctx.streak_days == expected)
+        elif condition == "min_streak_days":
+            threshold = int(value)
+            checks.append(lambda ctx, _, threshold=threshold: ctx.streak_days >= threshold)
+        elif condition == "time_of_day":
+            start, end = _parse_time(value[0]), _parse_time(value[1])
+            if start <= end:
+                checks.append(lambda ctx, _, start=start, end=end: start <= ctx.local_time.time() < end)
+            else: # Интервал через полночь, например 22:00-02:00
+                checks.append(lambda ctx, _, start=start, end=end: not (end <= ctx.local_time.time() < start))
+        else:
+            raise ValueError(f"Unknown trigger condition '{condition}' in achievement rule '{code}'")
+    if not checks:
+        raise ValueError(f"Achievement rule '{code}' has no trigger conditions")
+    return checks
+
+
+class RuleEngine:
+    """Скомпилированный набор правил ачивок."""
+
+    def __init__(self, rules: Mapping[str, Mapping[str, Any]]) -> None:
+        """
+        Args:
+            rules (Mapping[str, Mapping[str, Any]]): Код ачивки -> описание правила.
+
+        Raises:
+            ValueError: Если у правила неизвестное или пустое условие.
+        """
+        self.rules = rules
+        self._compiled: List[Tuple[str, List[RuleCheck]]] = [
+            (code, _compile_trigger(code, rule.get("trigger", {}))) for code, rule in rules.items()
+        ]
+        self._keyword_matcher = KeywordMatcher.from_rules(rules)
+        log.debug("RuleEngine compiled %d achievement rules", len(self._compiled))
+
+    def evaluate(self, ctx: TurnContext) -> List[str]:
+        """
+        Проверяет все правила для реплики.
+
+        Returns:
+            List[str]: Коды сработавших правил в порядке их объявления.
+        """
+        keyword_codes = self._keyword_matcher.match(ctx.message_text)
+        return [
+            code for code, checks in self._compiled
+            if all(check(ctx, keyword_codes) for check in checks)
+        ]
+
+
+__all__ = ["ACHIEVEMENT_RULES", "RuleEngine", "TurnContext"]
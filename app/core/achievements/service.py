@@ -3,40 +3,31 @@
 from __future__ import annotations
 
 import logging
-from typing import List, Sequence, Optional, Dict, Any # Добавили Dict, Any
+from typing import List, Sequence, Optional, Dict
+from datetime import datetime
 
-from sqlalchemy import select, func as sql_func # Переименовываем func, чтобы не конфликтовать с нашим
+import sqlalchemy as sa
+from sqlalchemy import select, update, func as sql_func # Переименовываем func, чтобы не конфликтовать с нашим
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
+from app.core.outbox.service import OutboxService
+from app.core.users.service import local_now
+from .badge_pool import BadgePoolService, PooledVariant
 from .models import Achievement # Импортируем только Achievement
+from .rules import ACHIEVEMENT_RULES, RuleEngine, TurnContext
 # LLMClient НЕ НУЖЕН здесь, он используется в Celery задаче
 
 log = logging.getLogger(__name__)
 
-# --- "Зашитые" Правила Ачивок для MVP ---
-# Ключ - это achievement_code
-# generation_theme - используется как контекст/тема для генерации названия и иконки
-HARDCODED_ACHIEVEMENT_RULES: Dict[str, Dict[str, Any]] = {
-    "first_message_sent": { # Код ачивки
-        "title_hint": "Ice Breaker", # Используется для PENDING статуса
-        "generation_theme": "A user sending their very first encouraging message in a new friendly AI chat application, breaking the ice.",
-        "description_for_user": "You've sent your first message and started a new friendship!", # Описание для пользователя
-        # Условия триггера будут в логике сервиса
-    },
-    "cat_lover_discovery": {
-        "title_hint": "Feline Friend",
-        "generation_theme": "A joyful moment of discovering a shared love for cats, perhaps a user mentioning their pet cat.",
-        "description_for_user": "You've revealed your love for cats! Meow-tastic!",
-        "trigger_keywords": ["cat", "кошка", "котенок", "кот", "кота", "кошку", "котэ", "мур", "мяу"]
-    },
-    "long_convo_starter": {
-        "title_hint": "Chatty Companion",
-        "generation_theme": "A user engaging in a significantly long and meaningful conversation with the AI, showing deep engagement.",
-        "description_for_user": "Wow, what a great conversation we had! You're a true Chatty Companion.",
-        # Триггер может быть по количеству сообщений в сессии или общей истории
-    },
-    # Добавьте еще 1-2 простых правила для MVP
-}
+# Правила компилируются один раз при импорте модуля
+_RULE_ENGINE = RuleEngine(ACHIEVEMENT_RULES)
+
+# Статусы, при которых повторная генерация не нужна
+_ACTIVE_STATUSES = frozenset({"COMPLETED", "PENDING_GENERATION", "PROCESSING"})
+
 
 class AchievementsService:
     """
@@ -45,147 +36,187 @@ class AchievementsService:
     и запускает фоновые задачи для генерации их контента.
     """
 
-    def __init__(self, db_session: AsyncSession):
+    def __init__(self, db_session: AsyncSession, rule_engine: RuleEngine = _RULE_ENGINE):
         """
         Инициализирует сервис.
 
         Args:
             db_session (AsyncSession): Асинхронная сессия БД.
+            rule_engine (RuleEngine): Скомпилированные правила ачивок.
         """
         self.db: AsyncSession = db_session
+        self.rule_engine = rule_engine
 
-    async def _get_achievement(self, user_id: str, achievement_code: str) -> Achievement | None:
-        """Вспомогательный метод для получения существующей записи ачивки."""
-        stmt = select(Achievement).where(
-            Achievement.user_id == user_id,
-            Achievement.code == achievement_code
-        )
+    async def _get_statuses(self, user_id: str) -> Dict[str, str]:
+        """Коды и статусы всех ачивок пользователя одним запросом."""
+        stmt = select(Achievement.code, Achievement.status).where(Achievement.user_id == user_id)
         result = await self.db.execute(stmt)
-        return result.scalar_one_or_none()
-
-    async def _create_or_get_pending_achievement(
-        self, user_id: str, achievement_code: str, rule_title_hint: str
-    ) -> tuple[Achievement, bool]: # Возвращает (ачивку, была_ли_создана_новая_или_сброшена)
+        return {row.code: row.status for row in result}
+
+    def _insert_for_dialect(self):
+        """Конструктор INSERT с поддержкой ON CONFLICT для диалекта текущей сессии."""
+        dialect_name = self.db.get_bind().dialect.name
+        if dialect_name == "postgresql":
+            return postgresql_insert(Achievement)
+        if dialect_name == "sqlite":
+            return sqlite_insert(Achievement)
+        raise NotImplementedError(f"Achievement upsert is not supported for dialect '{dialect_name}'") # pragma: no cover
+
+    async def _upsert_pending(self, user_id: str, codes: Sequence[str]) -> Dict[str, int]:
         """
-        Находит существующую ачивку или создает новую со статусом PENDING_GENERATION.
-        Если ачивка уже существует со статусом FAILED_GENERATION, сбрасывает его на PENDING.
-        Возвращает саму ачивку и флаг, нужно ли запускать генерацию.
-        """
-        existing_ach = await self._get_achievement(user_id, achievement_code)
-        needs_generation_task = False
-
-        if existing_ach:
-            # Ачивка уже есть, проверяем статус
-            if existing_ach.status == "COMPLETED":
-                log.debug(f"Achievement '{achievement_code}' for user '{user_id}' already COMPLETED.")
-                return existing_ach, False # Генерация не нужна
-            elif existing_ach.status == "PENDING_GENERATION" or existing_ach.status == "PROCESSING":
-                log.debug(f"Achievement '{achievement_code}' for user '{user_id}' already PENDING/PROCESSING.")
-                return existing_ach, False # Генерация уже запущена/в процессе
-            elif existing_ach.status == "FAILED_GENERATION":
-                log.info(f"Retrying FAILED achievement '{achievement_code}' for user '{user_id}'. Setting to PENDING.")
-                existing_ach.status = "PENDING_GENERATION"
-                existing_ach.title = f"Retrying: {rule_title_hint}" # Обновляем временный титул
-                self.db.add(existing_ach)
-                needs_generation_task = True
-            # Если какой-то другой статус - считаем, что нужно перегенерировать
-            else:
-                 log.warning(f"Achievement '{achievement_code}' for user '{user_id}' has unusual status '{existing_ach.status}'. Resetting to PENDING.")
-                 existing_ach.status = "PENDING_GENERATION"
-                 existing_ach.title = f"Resetting: {rule_title_hint}"
-                 self.db.add(existing_ach)
-                 needs_generation_task = True
-            ach_to_process = existing_ach
-        else:
-            # Ачивки нет, создаем новую PENDING
-            log.info(f"Creating new PENDING achievement '{achievement_code}' for user '{user_id}'")
-            new_achievement = Achievement(
-                user_id=user_id,
-                code=achievement_code,
-                title=f"Pending: {rule_title_hint}",
-                status="PENDING_GENERATION",
-            )
-            self.db.add(new_achievement)
-            ach_to_process = new_achievement
-            needs_generation_task = True
-        
-        if needs_generation_task:
-            await self.db.flush() # Получаем ID для новой или применяем изменения для существующей
-            if ach_to_process: # Проверка на случай, если flush вернул None (хотя не должен)
-                await self.db.refresh(ach_to_process)
-        
-        return ach_to_process, needs_generation_task
+        Атомарно переводит ачивки в PENDING_GENERATION одним запросом
+        ``INSERT ... ON CONFLICT (user_id, code) DO UPDATE ... WHERE ... RETURNING``:
+        новые строки вставляются, а существующие сбрасываются, только если их
+        статус не "активный" (COMPLETED / PENDING_GENERATION / PROCESSING).
+        Параллельные запросы не падают на uq_achievement_user_code.
+        Каждая вставка или сброс увеличивает ``generation_count``.
 
+        Returns:
+            Dict[str, int]: Коды, для которых нужно запустить генерацию
+                (строка вставлена или сброшена именно этим запросом),
+                и их новый ``generation_count``.
+        """
+        title_hints = {code: self.rule_engine.rules[code]["title_hint"] for code in codes}
+        stmt = self._insert_for_dialect().values([
+            {
+                "user_id": user_id,
+                "code": code,
+                "title": f"Pending: {hint}",
+                "status": "PENDING_GENERATION",
+                "generation_count": 1,
+            }
+            for code, hint in title_hints.items()
+        ])
+        table = Achievement.__table__
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.code],
+            set_={
+                "status": "PENDING_GENERATION",
+                "title": sa.case(
+                    (
+                        table.c.status == "FAILED_GENERATION",
+                        sa.case({code: f"Retrying: {hint}" for code, hint in title_hints.items()}, value=table.c.code),
+                    ),
+                    else_=sa.case({code: f"Resetting: {hint}" for code, hint in title_hints.items()}, value=table.c.code),
+                ),
+                "generation_count": table.c.generation_count + 1,
+                "updated_at": sql_func.now(),
+            },
+            where=table.c.status.notin_(_ACTIVE_STATUSES),
+        ).returning(table.c.code, table.c.generation_count)
+        result = await self.db.execute(stmt)
+        claimed = {row.code: row.generation_count for row in result}
+        # Порядок - как у сработавших правил
+        return {code: claimed[code] for code in codes if code in claimed}
 
     async def check_and_award(
         self,
         user_id: str,
         message_text: str | None = None, # Для триггеров по ключевым словам
-        user_message_count: int = 0, # Для триггера "первое сообщение"
-        # Можно добавить другие параметры контекста, например, trigger_event_type
+        user_message_count: int = 0, # Для триггеров по числу сообщений
+        streak_days: int = 0, # Для триггеров по серии дней
+        message_time: datetime | None = None, # Для триггеров по времени суток
     ) -> List[str]:
         """
-        Проверяет условия для "зашитых" правил ачивок и запускает их генерацию.
+        Проверяет все правила ачивок для реплики и запускает генерацию сработавших.
         Эта функция должна быть вызвана после сохранения сообщения пользователя и ответа AI.
 
+        Правила проверяются без обращений к БД; если что-то сработало,
+        статусы ачивок пользователя читаются одним запросом, а PENDING-записи
+        создаются/сбрасываются одним идемпотентным UPSERT.
+
         Args:
             user_id (str): ID пользователя.
             message_text (str | None): Текст последнего сообщения пользователя.
             user_message_count (int): Общее количество сообщений от этого пользователя.
+            streak_days (int): Сколько дней подряд пользователь пишет (включая сегодня).
+            message_time (datetime | None): Локальное время сообщения (по умолчанию - сейчас).
 
         Returns:
-            List[str]: Список кодов ачивок, для которых была ЗАПУЩЕНА фоновая генерация.
+            List[str]: Коды ачивок, выданных этим вызовом: завершённых вариантом из
+                пула или с фоновой генерацией в очереди (задачи публикуются из
+                outbox после коммита).
         """
         log.debug(f"AchievementsService: Checking achievements for user '{user_id}'")
-        triggered_task_codes: List[str] = []
-        # Импортируем Celery задачу ВНУТРИ метода, чтобы избежать проблем с импортом при старте
-        # и если tasks.py импортирует этот сервис (хотя не должен)
-        from app.workers.tasks import generate_achievement_task
-
-        # --- Логика Триггеров для MVP ---
-        # Правило 1: "Первое сообщение"
-        code = "first_message_sent"
-        if code in HARDCODED_ACHIEVEMENT_RULES and user_message_count == 1: # Триггер на первое сообщение
-            rule_data = HARDCODED_ACHIEVEMENT_RULES[code]
-            achievement, needs_generation = await self._create_or_get_pending_achievement(
-                user_id, code, rule_data["title_hint"]
+        ctx = TurnContext(
+            message_text=message_text,
+            user_message_count=user_message_count,
+            streak_days=streak_days,
+            local_time=message_time or local_now(),
+        )
+        triggered_codes = self.rule_engine.evaluate(ctx)
+        if not triggered_codes:
+            log.debug(f"AchievementsService: No achievements triggered for user '{user_id}'")
+            return []
+
+        # Дешёвый предварительный фильтр: правила по ключевым словам и времени
+        # суток срабатывают и после выдачи ачивки, а UPSERT - это запись
+        # (блокировка строки, расход последовательности id). Решение принимает UPSERT.
+        statuses = await self._get_statuses(user_id)
+        candidates = [code for code in triggered_codes if statuses.get(code) not in _ACTIVE_STATUSES]
+        if not candidates:
+            log.debug(f"AchievementsService: Triggered {triggered_codes} already awarded for user '{user_id}'")
+            return []
+        codes_to_generate = await self._upsert_pending(user_id, candidates)
+        if not codes_to_generate:
+            log.debug(f"AchievementsService: {candidates} claimed concurrently for user '{user_id}'")
+            return []
+
+        # Заранее сгенерированный вариант из пула: ачивка сразу COMPLETED.
+        # Для остальных задачи генерации пишутся в outbox той же транзакции:
+        # воркер увидит задачу только после коммита PENDING-записи (публикует relay)
+        pool = BadgePoolService(self.db) if settings.ACHIEVEMENT_POOL_ENABLED else None
+        outbox = OutboxService(self.db)
+        queued: List[str] = []
+        for code, generation in codes_to_generate.items():
+            variant = await pool.claim(code) if pool is not None else None
+            if variant is not None:
+                await self._complete_from_pool(user_id, code, variant)
+                continue
+            await outbox.enqueue(
+                "app.workers.tasks.generate_achievement_task",
+                {
+                    "user_id": user_id,
+                    "achievement_code": code,
+                    "theme": self.rule_engine.rules[code]["generation_theme"],
+                },
+                # Повтор после сброса FAILED_GENERATION получает новый ключ
+                dedupe_key=f"generate_achievement:{user_id}:{code}:{generation}",
             )
-            if needs_generation and achievement:
-                generate_achievement_task.delay(
-                    user_id=user_id,
-                    achievement_code=achievement.code,
-                    theme=rule_data["generation_theme"]
-                )
-                triggered_task_codes.append(achievement.code)
-
-        # Правило 2: "Любитель кошек"
-        code = "cat_lover_discovery"
-        if message_text and code in HARDCODED_ACHIEVEMENT_RULES:
-            rule_data = HARDCODED_ACHIEVEMENT_RULES[code]
-            for keyword in rule_data.get("trigger_keywords", []):
-                if keyword in message_text.lower():
-                    achievement, needs_generation = await self._create_or_get_pending_achievement(
-                        user_id, code, rule_data["title_hint"]
-                    )
-                    if needs_generation and achievement:
-                        generate_achievement_task.delay(
-                            user_id=user_id,
-                            achievement_code=achievement.code,
-                            theme=rule_data["generation_theme"]
-                        )
-                        triggered_task_codes.append(achievement.code)
-                        break # Достаточно одного ключевого слова для этого триггера
-
-        # Добавьте другие зашитые правила/триггеры здесь
-
-        if triggered_task_codes:
-            # Коммит транзакции (если создавались/обновлялись PENDING записи)
-            # будет выполнен FastAPI зависимостью get_async_db_session
-            log.info(f"AchievementsService: Tasks dispatched for user '{user_id}': {triggered_task_codes}")
-        else:
-            log.debug(f"AchievementsService: No new achievements triggered for user '{user_id}'")
-
-        return triggered_task_codes
+            queued.append(code)
+        # Коммит транзакции выполняет вызывающий код
+        if queued:
+            log.info(f"AchievementsService: Generation queued for user '{user_id}': {queued}")
+        return list(codes_to_generate)
+
+    async def _complete_from_pool(self, user_id: str, code: str, variant: PooledVariant) -> None:
+        """Завершает PENDING-ачивку вариантом из пула (одним UPDATE)."""
+        title = variant.title_candidates[0] if variant.title_candidates else self.rule_engine.rules[code]["title_hint"]
+        await self.db.execute(
+            update(Achievement)
+            .where(Achievement.user_id == user_id, Achievement.code == code)
+            .values(title=title, badge_png_url=variant.badge_png_url, status="COMPLETED", updated_at=sql_func.now())
+            .execution_options(synchronize_session=False)
+        )
+        log.info(f"AchievementsService: '{code}' for user '{user_id}' completed from the badge pool")
+
+    async def claim_unnotified_codes(self, user_id: str) -> List[str]:
+        """
+        Помечает ещё не сообщённые клиенту ачивки как сообщённые и возвращает их коды.
+        Один UPDATE ... RETURNING: параллельные запросы не получат один код дважды.
+        """
+        stmt = (
+            update(Achievement)
+            .where(Achievement.user_id == user_id, Achievement.notified_at.is_(None))
+            .values(notified_at=sql_func.now())
+            .returning(Achievement.code)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.db.execute(stmt)
+        codes = list(result.scalars().all())
+        if codes:
+            log.debug(f"AchievementsService: Claimed unnotified achievements for user '{user_id}': {codes}")
+        return codes
 
     async def get_user_achievements(self, user_id: str) -> Sequence[Achievement]:
         """
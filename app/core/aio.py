@@ -0,0 +1,26 @@
+# app/core/aio.py
+
+"""Вспомогательные функции asyncio, общие для API и воркеров."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, List
+
+
+async def gather_cancelling(*aws: Awaitable[Any]) -> List[Any]:
+    """
+    asyncio.gather, который при первой ошибке отменяет остальные корутины
+    и дожидается их завершения (аналог TaskGroup для Python 3.10).
+    """
+    pending = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*pending)
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        raise
+
+
+__all__ = ["gather_cancelling"]
@@ -10,11 +10,10 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings # Наш синглтон настроек
-# Импортируем асинхронную зависимость для сессии
-from app.db.base import get_async_db_session
+# Короткоживущая сессия для загрузки пользователя
+from app.db.base import AsyncSession, async_session_context
 # Импортируем модель пользователя для поиска в БД
 from app.core.users.models import User
 
@@ -125,18 +124,68 @@ async def verify_token(token: str, credentials_exception: HTTPException) -> Toke
 
 # --- FastAPI Dependency для получения текущего пользователя ---
 
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_token_data(
+    token: str = Depends(oauth2_scheme),
+) -> TokenData:
+    """
+    FastAPI зависимость: только верифицирует токен, без обращения к БД.
+    Эндпоинты, которым пользователь нужен не сразу, проверяют его сами
+    (:func:`load_user`) вместе с другими чтениями.
+
+    Raises:
+        HTTPException: status_code 401, если аутентификация не удалась.
+    """
+    return await verify_token(token, _credentials_exception())
+
+
+async def load_user(user_id: str, db: Optional[AsyncSession] = None) -> User:
+    """
+    Загружает пользователя из токена: в переданной сессии (чтобы проверка
+    шла в одной транзакции с другими чтениями) или в короткой собственной.
+
+    Raises:
+        HTTPException: status_code 404, если пользователь из токена не найден в БД.
+    """
+    log.debug("Fetching user from DB with id: %s", user_id)
+    if db is not None:
+        user = await db.get(User, user_id)
+    else:
+        async with async_session_context() as db:
+            user = await db.get(User, user_id)
+
+    if user is None:
+        # Если пользователь не найден в БД после успешной верификации токена
+        log.error("User with id %s from valid token not found in DB.", user_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, # Используем 404, т.к. ресурс (пользователь) не найден
+            detail=f"User with id {user_id} not found",
+        )
+
+    log.debug("Authenticated user retrieved: %r", user)
+    return user
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_async_db_session)
 ) -> User:
     """
     FastAPI зависимость для получения текущего аутентифицированного пользователя.
 
     Верифицирует токен, извлекает user_id и загружает пользователя из БД.
+    Пользователь читается в короткой собственной сессии, а не в сессии
+    запроса: иначе соединение из пула оставалось бы занятым до конца
+    обработки запроса (в том числе на время долгих вызовов LLM).
 
     Args:
         token (str): JWT токен из заголовка Authorization.
-        db (AsyncSession): Асинхронная сессия БД.
 
     Returns:
         User: ORM объект текущего пользователя.
@@ -145,30 +194,8 @@ async def get_current_user(
         HTTPException: status_code 401, если аутентификация не удалась.
                        status_code 404, если пользователь из токена не найден в БД.
     """
-    # Определяем исключение здесь, чтобы оно было однотипным
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
-    # Верифицируем токен и получаем данные
-    token_data = await verify_token(token, credentials_exception)
-
-    # Ищем пользователя в БД по ID из токена
-    log.debug("Fetching user from DB with id: %s", token_data.user_id)
-    user = await db.get(User, token_data.user_id)
-
-    if user is None:
-        # Если пользователь не найден в БД после успешной верификации токена
-        log.error("User with id %s from valid token not found in DB.", token_data.user_id)
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, # Используем 404, т.к. ресурс (пользователь) не найден
-            detail=f"User with id {token_data.user_id} not found",
-        )
-
-    log.debug("Authenticated user retrieved: %r", user)
-    return user
+    token_data = await verify_token(token, _credentials_exception())
+    return await load_user(token_data.user_id)
 
 # Пример зависимости для получения ID текущего пользователя (если не нужна вся модель)
 async def get_current_user_id(
@@ -6,7 +6,7 @@ from __future__ import annotations
 from .client import LLMClient
 
 # --- Реэкспортируем ТИПЫ СООБЩЕНИЙ/СОБЫТИЙ из правильного места ---
-from .message import Message, Event
+from .message import AchievementNameRequest, Message, Event
 
 # --- Опционально: Реэкспортируем базовый класс провайдера или фабрику ---
 #     (но обычно клиент - основная точка входа)
@@ -17,6 +17,7 @@ __all__ = [
     "LLMClient",
     "Message",
     "Event",
+    "AchievementNameRequest",
     # "BaseLLMProvider", # Раскомментируйте, если нужно
     # "get_llm_provider", # Раскомментируйте, если нужно
 ]
@@ -0,0 +1,336 @@
+# app/core/llm/badge_renderer.py
+
+"""
+Локальный процедурный рендер значков ачивок (PNG 512x512, RGBA).
+
+Используется:
+  • как запасной вариант, когда Imagen недоступен (Vertex AI не настроен
+    или вызов упал);
+  • как мгновенная заглушка, пока генерируется версия Imagen;
+  • по умолчанию в stub-провайдере (тесты, локальная разработка).
+
+Значок - концентрические слои фигуры из ``shape_hint`` (обводка, кольцо,
+заливка) и эмблема в центре; цвета берутся из ``palette_hint``. Рендер на
+чистом Python: каждая строка растра заполняется отрезками (scanline fill
+многоугольников) через срезы bytearray, кодирование PNG - zlib. Рендер
+CPU-bound, поэтому выполняется в пуле процессов (BADGE_RENDER_PROCESSES).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import re
+import struct
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+RGBA = Tuple[int, int, int, int]
+Point = Tuple[float, float]
+
+_COLORS: Dict[str, RGBA] = {
+    "gold": (245, 190, 40, 255),
+    "yellow": (250, 215, 60, 255),
+    "orange": (245, 140, 40, 255),
+    "red": (220, 60, 60, 255),
+    "pink": (240, 120, 170, 255),
+    "purple": (140, 80, 200, 255),
+    "violet": (150, 100, 220, 255),
+    "blue": (50, 115, 230, 255),
+    "navy": (30, 50, 110, 255),
+    "teal": (30, 160, 160, 255),
+    "green": (60, 170, 90, 255),
+    "brown": (140, 90, 50, 255),
+    "silver": (190, 195, 205, 255),
+    "gray": (128, 128, 128, 255),
+    "grey": (128, 128, 128, 255),
+    "white": (255, 255, 255, 255),
+    "black": (25, 25, 30, 255),
+}
+_DEFAULT_PALETTE = ("gold", "blue", "white")
+_DEFAULT_OUTLINE = "black"
+
+# Доля радиуса значка для каждого слоя
+_OUTLINE_SCALE = 0.96
+_RING_SCALE = 0.86
+_FILL_SCALE = 0.72
+_EMBLEM_SCALE = 0.40
+
+_SHAPES = ("circle", "square", "hexagon", "shield", "octagon")
+_EMBLEMS = ("star", "heart", "bolt", "moon", "diamond")
+# Эмблема по ключевым словам темы; иначе - стабильный выбор по хэшу темы
+_EMBLEM_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "moon": ("night", "moon", "owl", "ноч", "лун", "сов"),
+    "heart": ("love", "cat", "friend", "люб", "кот", "кош", "друг"),
+    "bolt": ("streak", "row", "energy", "habit", "days", "подряд", "сери"),
+    "diamond": ("long", "deep", "meaningful", "долг"),
+    "star": ("first", "start", "перв"),
+}
+
+
+@dataclass(frozen=True)
+class BadgeSpec:
+    """Параметры рендера значка."""
+    shape: str
+    emblem: str
+    outline: RGBA
+    ring: RGBA
+    fill: RGBA
+    emblem_color: RGBA
+    size: int = 512
+
+
+def _parse_palette(palette_hint: str) -> Tuple[List[RGBA], Optional[RGBA]]:
+    """Цвета из подсказки вида ``"gold, blue, white, black outline"``: (основные, обводка)."""
+    colors: List[RGBA] = []
+    outline: Optional[RGBA] = None
+    for part in re.split(r"[,;/]| and ", palette_hint.lower()):
+        names = [word for word in re.findall(r"[a-z]+", part) if word in _COLORS]
+        if not names:
+            continue
+        if "outline" in part or "border" in part:
+            outline = _COLORS[names[0]]
+        else:
+            colors.extend(_COLORS[name] for name in names)
+    return colors, outline
+
+
+def _pick_emblem(context: str) -> str:
+    lowered = context.lower()
+    for emblem, keywords in _EMBLEM_KEYWORDS.items():
+        if any(keyword in lowered for keyword in keywords):
+            return emblem
+    digest = hashlib.blake2b(lowered.encode("utf-8"), digest_size=4).digest()
+    return _EMBLEMS[int.from_bytes(digest, "big") % len(_EMBLEMS)]
+
+
+def badge_spec(context: str, palette_hint: str, shape_hint: str, size: int = 512) -> BadgeSpec:
+    """
+    Строит параметры значка из тех же подсказок, что получает Imagen.
+
+    Args:
+        context (str): Тема ачивки (определяет эмблему).
+        palette_hint (str): Подсказка по цветам.
+        shape_hint (str): Подсказка по форме (circle, square, hexagon, shield, octagon).
+        size (int): Сторона изображения в пикселях.
+
+    Returns:
+        BadgeSpec: Параметры рендера.
+    """
+    colors, outline = _parse_palette(palette_hint or "")
+    defaults = [_COLORS[name] for name in _DEFAULT_PALETTE]
+    fill, ring, emblem_color = (colors + defaults[len(colors):] if len(colors) < 3 else colors)[:3]
+    shape = next((name for name in _SHAPES if name in (shape_hint or "").lower()), "circle")
+    return BadgeSpec(
+        shape=shape,
+        emblem=_pick_emblem(context or ""),
+        outline=outline or _COLORS[_DEFAULT_OUTLINE],
+        ring=ring,
+        fill=fill,
+        emblem_color=emblem_color,
+        size=size,
+    )
+
+
+# --- Геометрия (единичные координаты: центр (0, 0), радиус 1, y вниз) ---
+def _regular_polygon(sides: int, rotation: float = 0.0) -> List[Point]:
+    return [
+        (math.cos(rotation + 2 * math.pi * i / sides), math.sin(rotation + 2 * math.pi * i / sides))
+        for i in range(sides)
+    ]
+
+
+def _shape_outline(shape: str) -> List[Point]:
+    if shape == "square":
+        return [(-0.88, -0.88), (0.88, -0.88), (0.88, 0.88), (-0.88, 0.88)]
+    if shape == "hexagon":
+        return _regular_polygon(6, -math.pi / 2)
+    if shape == "octagon":
+        return _regular_polygon(8, math.pi / 8)
+    if shape == "shield":
+        top = [(-0.85, -0.9), (0.85, -0.9), (0.85, 0.1)]
+        curve = [(0.85 * math.cos(a), 0.1 + 0.9 * math.sin(a)) for a in (math.pi * i / 16 for i in range(1, 16))]
+        return top + [(x, y) for x, y in curve if x > 0] + [(0.0, 1.0)] + [(x, y) for x, y in curve if x < 0] + [(-0.85, 0.1)]
+    return _regular_polygon(128)
+
+
+def _emblem_outline(emblem: str) -> List[Point]:
+    if emblem == "heart":
+        points = []
+        for i in range(96):
+            t = 2 * math.pi * i / 96
+            x = 16 * math.sin(t) ** 3
+            y = 13 * math.cos(t) - 5 * math.cos(2 * t) - 2 * math.cos(3 * t) - math.cos(4 * t)
+            points.append((x / 17, -y / 17 - 0.05))
+        return points
+    if emblem == "bolt":
+        return [(0.15, -1.0), (-0.55, 0.1), (-0.05, 0.1), (-0.2, 1.0), (0.55, -0.15), (0.05, -0.15), (0.3, -1.0)]
+    if emblem == "moon":
+        # Полумесяц: дуга единичной окружности минус смещённый круг; дуги стыкуются в точках пересечения
+        shift, radius = 0.45, 0.8
+        tip_x = (1 + shift ** 2 - radius ** 2) / (2 * shift)
+        tip_y = math.sqrt(1 - tip_x ** 2)
+        outer_from = math.atan2(tip_y, tip_x)
+        inner_from = math.atan2(tip_y, tip_x - shift)
+        outer = [(math.cos(a), math.sin(a)) for a in (outer_from + (2 * math.pi - 2 * outer_from) * i / 48 for i in range(49))]
+        inner = [
+            (shift + radius * math.cos(a), radius * math.sin(a))
+            for a in (2 * math.pi - inner_from - (2 * math.pi - 2 * inner_from) * i / 48 for i in range(1, 48))
+        ]
+        return outer + inner
+    if emblem == "diamond":
+        return [(0.0, -1.0), (0.75, 0.0), (0.0, 1.0), (-0.75, 0.0)]
+    # star
+    return [
+        ((1.0 if i % 2 == 0 else 0.42) * math.cos(-math.pi / 2 + math.pi * i / 5),
+         (1.0 if i % 2 == 0 else 0.42) * math.sin(-math.pi / 2 + math.pi * i / 5))
+        for i in range(10)
+    ]
+
+
+def _to_pixels(points: Sequence[Point], size: int, scale: float) -> List[Point]:
+    half = size / 2
+    return [(half + x * half * scale, half + y * half * scale) for x, y in points]
+
+
+def _scanline_spans(points: Sequence[Point], size: int) -> Dict[int, List[Tuple[float, float]]]:
+    """
+    Отрезки каждой строки растра внутри многоугольника (правило чёт-нечет,
+    выборка в центрах пикселей). Каждое ребро добавляет пересечения только в
+    строки, которые оно пересекает, поэтому работа пропорциональна высоте
+    рёбер, а не (строки x рёбра).
+    """
+    crossings: Dict[int, List[float]] = {}
+    for (x1, y1), (x2, y2) in zip(points, list(points[1:]) + [points[0]]):
+        if y1 == y2:
+            continue
+        if y1 > y2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        dx_dy = (x2 - x1) / (y2 - y1)
+        for y in range(max(0, math.ceil(y1 - 0.5)), min(size, math.ceil(y2 - 0.5))):
+            crossings.setdefault(y, []).append(x1 + (y + 0.5 - y1) * dx_dy)
+    spans = {}
+    for y, xs in crossings.items():
+        xs.sort()
+        spans[y] = list(zip(xs[0::2], xs[1::2]))
+    return spans
+
+
+def render_badge_png(spec: BadgeSpec) -> bytes:
+    """
+    Рендерит значок в PNG (синхронно, чистый Python + zlib).
+
+    Returns:
+        bytes: PNG RGBA с прозрачным фоном.
+    """
+    size = spec.size
+    shape = _shape_outline(spec.shape)
+    layers = [
+        (_scanline_spans(_to_pixels(shape, size, _OUTLINE_SCALE), size), bytes(spec.outline)),
+        (_scanline_spans(_to_pixels(shape, size, _RING_SCALE), size), bytes(spec.ring)),
+        (_scanline_spans(_to_pixels(shape, size, _FILL_SCALE), size), bytes(spec.fill)),
+        (_scanline_spans(_to_pixels(_emblem_outline(spec.emblem), size, _EMBLEM_SCALE), size), bytes(spec.emblem_color)),
+    ]
+
+    raw = bytearray()
+    empty_row = bytes(size * 4)
+    for y in range(size):
+        row = bytearray(empty_row)
+        for spans, color in layers:
+            for xa, xb in spans.get(y, ()):
+                # Пиксель закрашивается, если его центр внутри отрезка
+                x0 = max(0, math.ceil(xa - 0.5))
+                x1 = min(size, math.ceil(xb - 0.5))
+                if x1 > x0:
+                    row[x0 * 4:x1 * 4] = color * (x1 - x0)
+        raw.append(0) # Фильтр строки PNG: None
+        raw.extend(row)
+    return _encode_png(size, size, bytes(raw))
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def _encode_png(width: int, height: int, raw_rows: bytes) -> bytes:
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0) # 8 бит, RGBA
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(raw_rows, settings.BADGE_RENDER_ZLIB_LEVEL))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+# --- Пул процессов (по одному на процесс-владелец, пересоздаётся после fork) ---
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor, _executor_pid
+    if settings.BADGE_RENDER_PROCESSES <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=settings.BADGE_RENDER_PROCESSES)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False)
+
+
+async def render_badge(context: str, palette_hint: str, shape_hint: str, size: int = 512) -> bytes:
+    """
+    Асинхронно рендерит значок в пуле процессов (или в потоке, если
+    BADGE_RENDER_PROCESSES=0 либо пул сломан).
+
+    Args:
+        context (str): Тема ачивки.
+        palette_hint (str): Подсказка по цветам.
+        shape_hint (str): Подсказка по форме.
+        size (int): Сторона изображения в пикселях.
+
+    Returns:
+        bytes: PNG значка.
+    """
+    spec = badge_spec(context, palette_hint, shape_hint, size=size)
+    executor = _get_executor()
+    if executor is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, render_badge_png, spec)
+        except (BrokenProcessPool, OSError, AssertionError) as e_pool:
+            # Пул сломан или процессы нельзя создать (например, в daemon-процессе)
+            log.warning("Badge renderer: process pool unavailable (%s), rendering in a thread", e_pool)
+            _reset_executor(executor)
+    return await asyncio.to_thread(render_badge_png, spec)
+
+
+def shutdown_badge_renderer() -> None:
+    """Останавливает пул процессов рендера (при остановке процесса)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None and _executor_pid == os.getpid():
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+__all__ = ["BadgeSpec", "badge_spec", "render_badge", "render_badge_png", "shutdown_badge_renderer"]
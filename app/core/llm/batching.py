@@ -0,0 +1,115 @@
+# app/core/llm/batching.py
+
+"""
+Микро-батчинг вызовов LLM.
+
+Одиночные запросы, пришедшие в пределах короткого окна, собираются в один
+пакетный вызов провайдера: например, всплеск разблокировок ачивок даёт один
+запрос названий на пачку вместо сотни последовательных. Пачка уходит по
+истечении окна ``max_wait`` (отсчитывается от первого запроса) или сразу,
+как только набрано ``max_batch_size`` запросов.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Собирает одиночные запросы в пачки для ``handler``.
+
+    ``handler`` получает список запросов и возвращает список результатов той же
+    длины и в том же порядке. Исключение обработчика получают все запросы
+    пачки. Если все ожидающие пачки отменены, вызов обработчика тоже
+    отменяется. Экземпляр используется из одного event loop.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[T]], Awaitable[Sequence[R]]],
+        max_batch_size: int,
+        max_wait: float,
+        name: str = "batch",
+    ):
+        """
+        Args:
+            handler: Пакетный обработчик.
+            max_batch_size (int): Максимальный размер пачки.
+            max_wait (float): Окно сбора пачки в секундах.
+            name (str): Имя для логов.
+        """
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.name = name
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        """Добавляет запрос в текущую пачку и ждёт его результат."""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    async def drain(self) -> None:
+        """Отправляет накопленную пачку и дожидается всех запущенных вызовов."""
+        self._flush()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [(item, future) for item, future in self._pending if not future.done()]
+        self._pending = []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+        def _cancel_if_abandoned(_: asyncio.Future) -> None:
+            if all(future.cancelled() for _, future in batch):
+                task.cancel()
+
+        for _, future in batch:
+            future.add_done_callback(_cancel_if_abandoned)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future]]) -> None:
+        log.debug("MicroBatcher '%s': dispatching %d items", self.name, len(batch))
+        try:
+            results = list(await self.handler([item for item, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"Batch handler '{self.name}' returned {len(results)} results for {len(batch)} items"
+                )
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+__all__ = ["MicroBatcher"]
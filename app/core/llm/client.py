@@ -3,10 +3,13 @@
 from __future__ import annotations
 
 import logging
-from typing import List, Sequence
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
 
+from app.config import settings
+from .batching import MicroBatcher
 # Импортируем базовые схемы/типы
-from .message import Message, Event
+from .message import AchievementNameRequest, Message, Event
 # Импортируем асинхронную фабрику провайдеров
 from .providers import get_llm_provider
 # Импортируем базовый асинхронный интерфейс провайдера для type hinting
@@ -14,6 +17,32 @@ from .providers.base import BaseLLMProvider
 
 log = logging.getLogger(__name__)
 
+# Микро-батчеры по провайдерам (см. LLMClient._batcher)
+_provider_batchers: "weakref.WeakKeyDictionary[BaseLLMProvider, Dict[str, MicroBatcher]]" = weakref.WeakKeyDictionary()
+
+
+async def _generate_names_batch(
+    provider: BaseLLMProvider, requests: List[AchievementNameRequest]
+) -> List[List[str]]:
+    """Пачка запросов названий; одиночный запрос - обычным вызовом."""
+    if not requests:
+        return []
+    if len(requests) == 1:
+        return [await provider.generate_achievement_name(**requests[0])]
+    log.debug("LLMClient: Calling provider.generate_achievement_names (%d items)...", len(requests))
+    results = await provider.generate_achievement_names(requests)
+    log.debug("LLMClient: Provider.generate_achievement_names returned %d results.", len(results))
+    return results
+
+
+async def _extract_events_batch(provider: BaseLLMProvider, texts: List[str]) -> List[List[Event]]:
+    """Пачка текстов для извлечения событий; одиночный текст - обычным вызовом."""
+    if len(texts) == 1:
+        return [await provider.extract_events(texts[0])]
+    log.debug("LLMClient: Calling provider.extract_events_batch (%d texts)...", len(texts))
+    return await provider.extract_events_batch(texts)
+
+
 class LLMClient:
     """
     Асинхронный универсальный клиент для работы с LLM-провайдерами.
@@ -29,26 +58,98 @@ class LLMClient:
         self.provider: BaseLLMProvider = get_llm_provider()
         log.info("LLMClient using provider: %s", self.provider.name)
 
-    async def generate(self, prompt: str, context: Sequence[Message]) -> str:
+    def _batcher(
+        self,
+        kind: str,
+        handler: Callable[[BaseLLMProvider, List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int,
+        window_ms: int,
+    ) -> Optional[MicroBatcher]:
+        """
+        Микро-батчер операции ``kind`` для текущего провайдера или None, если
+        окно пачки выключено (``window_ms <= 0``). Батчеры общие для всех
+        клиентов провайдера: LLMClient создаётся на каждый запрос, а провайдер
+        один на процесс.
+        """
+        if window_ms <= 0:
+            return None
+        provider = self.provider
+        batchers = _provider_batchers.setdefault(provider, {})
+        batcher = batchers.get(kind)
+        if batcher is None:
+            batcher = batchers[kind] = MicroBatcher(
+                lambda items: handler(provider, items),
+                max_batch_size=max_batch_size,
+                max_wait=window_ms / 1000,
+                name=f"{provider.name}:{kind}",
+            )
+        return batcher
+
+    async def generate(
+        self, prompt: str, context: Sequence[Message], rag_facts: Optional[List[str]] = None
+    ) -> str:
         """
         Асинхронно генерирует ответ на prompt с учётом истории context.
 
         Args:
             prompt (str): Основной запрос пользователя.
             context (Sequence[Message]): История диалога.
+            rag_facts (List[str] | None): Фоновые факты для модели
+                (например, резюме более ранней части диалога).
 
         Returns:
             str: Сгенерированный текстовый ответ.
         """
         log.debug("LLMClient: Calling provider.generate...")
-        response = await self.provider.generate(prompt, context)
+        response = await self.provider.generate(prompt, context, rag_facts=rag_facts)
         log.debug("LLMClient: Provider.generate returned.")
         return response
 
+    async def generate_stream(
+        self, prompt: str, context: Sequence[Message], rag_facts: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Асинхронно генерирует ответ потоково, отдавая фрагменты текста
+        по мере их появления у провайдера.
+
+        Args:
+            prompt (str): Основной запрос пользователя.
+            context (Sequence[Message]): История диалога.
+            rag_facts (List[str] | None): Фоновые факты для модели.
+
+        Yields:
+            str: Очередной фрагмент ответа.
+        """
+        log.debug("LLMClient: Calling provider.generate_stream...")
+        chunks_count = 0
+        async for chunk in self.provider.generate_stream(prompt, context, rag_facts=rag_facts):
+            chunks_count += 1
+            yield chunk
+        log.debug("LLMClient: Provider.generate_stream finished after %d chunks.", chunks_count)
+
+    async def summarize_conversation(
+        self, previous_summary: Optional[str], messages: Sequence[Message]
+    ) -> str:
+        """
+        Асинхронно сворачивает новые сообщения в накопительное резюме диалога.
+
+        Args:
+            previous_summary (str | None): Текущее резюме (None, если его ещё нет).
+            messages (Sequence[Message]): Новые сообщения в хронологическом порядке.
+
+        Returns:
+            str: Обновлённое резюме.
+        """
+        log.debug("LLMClient: Calling provider.summarize_conversation with %d messages...", len(messages))
+        summary = await self.provider.summarize_conversation(previous_summary, messages)
+        log.debug("LLMClient: Provider.summarize_conversation returned %d chars.", len(summary))
+        return summary
+
     async def extract_events(self, text: str) -> List[Event]:
         """
-        Асинхронно извлекает из текста список событий.
-        (В текущем MVP провайдер Gemini возвращает пустой список).
+        Асинхронно извлекает из текста список событий. Запросы, пришедшие
+        в пределах EVENT_EXTRACTION_BATCH_WINDOW_MS, объединяются в один
+        пакетный вызов провайдера.
 
         Args:
             text (str): Текст для анализа.
@@ -57,7 +158,15 @@ class LLMClient:
             List[Event]: Список извлеченных событий.
         """
         log.debug("LLMClient: Calling provider.extract_events...")
-        events = await self.provider.extract_events(text)
+        batcher = self._batcher(
+            "extract-events", _extract_events_batch,
+            settings.EVENT_EXTRACTION_BATCH_MAX_SIZE, settings.EVENT_EXTRACTION_BATCH_WINDOW_MS,
+        )
+        if batcher is not None:
+            # Тексты параллельных запросов уходят провайдеру одной пачкой
+            events = await batcher.submit(text)
+        else:
+            events = await self.provider.extract_events(text)
         log.debug("LLMClient: Provider.extract_events returned %d events.", len(events))
         return events
 
@@ -87,12 +196,36 @@ class LLMClient:
         log.debug("LLMClient: Calling provider.generate_achievement_name...")
         if not hasattr(self.provider, 'generate_achievement_name'):
              raise NotImplementedError(f"Provider '{self.provider.name}' does not support 'generate_achievement_name'") # pragma: no cover
-        names = await self.provider.generate_achievement_name(
+        request = AchievementNameRequest(
             context=context, style_id=style_id, tone_hint=tone_hint, style_examples=style_examples
         )
+        batcher = self._batcher(
+            "achievement-names", _generate_names_batch,
+            settings.ACHIEVEMENT_NAME_BATCH_MAX_SIZE, settings.ACHIEVEMENT_NAME_BATCH_WINDOW_MS,
+        )
+        if batcher is not None:
+            # Запрос попадёт в общую пачку (см. ACHIEVEMENT_NAME_BATCH_WINDOW_MS)
+            names = await batcher.submit(request)
+        else:
+            names = await self.provider.generate_achievement_name(**request)
         log.debug("LLMClient: Provider.generate_achievement_name returned %d names.", len(names))
         return names
 
+    async def generate_achievement_names(
+        self, requests: Sequence[AchievementNameRequest]
+    ) -> List[List[str]]:
+        """
+        Асинхронно генерирует названия для нескольких ачивок одним пакетным
+        вызовом провайдера (если провайдер это поддерживает).
+
+        Args:
+            requests (Sequence[AchievementNameRequest]): Параметры по ачивкам.
+
+        Returns:
+            List[List[str]]: Названия; элемент ``i`` относится к ``requests[i]``.
+        """
+        return await _generate_names_batch(self.provider, list(requests))
+
     async def generate_achievement_icon(
         self,
         context: str,
@@ -127,5 +260,37 @@ class LLMClient:
         log.debug("LLMClient: Provider.generate_achievement_icon returned icon.")
         return icon_bytes
 
+    async def generate_achievement_icons(
+        self,
+        context: str,
+        style_id: str,
+        style_keywords: str,
+        palette_hint: str,
+        shape_hint: str,
+        count: int,
+        ) -> List[bytes]:
+        """
+        Асинхронно генерирует несколько вариантов иконки одной ачивки
+        (пакетом, если провайдер это поддерживает).
+
+        Args:
+            context (str): Описание ачивки.
+            style_id (str): Идентификатор стиля.
+            style_keywords (str): Ключевые слова стиля.
+            palette_hint (str): Подсказка по палитре.
+            shape_hint (str): Подсказка по форме.
+            count (int): Сколько вариантов нужно.
+
+        Returns:
+            List[bytes]: PNG изображения (может быть меньше ``count`` при ошибках).
+        """
+        log.debug("LLMClient: Calling provider.generate_achievement_icons (count=%d)...", count)
+        icons = await self.provider.generate_achievement_icons(
+            context=context, style_id=style_id, style_keywords=style_keywords,
+            palette_hint=palette_hint, shape_hint=shape_hint, count=count,
+        )
+        log.debug("LLMClient: Provider.generate_achievement_icons returned %d icons.", len(icons))
+        return icons
+
 # Экспортируем только клиент
 __all__ = ("LLMClient",)
@@ -0,0 +1,152 @@
+# /app/app/core/llm/context.py
+
+"""
+Сборка контекста (истории диалога) для LLM в пределах бюджета токенов.
+
+Стоит между UsersService (откуда приходит последняя история) и LLMClient:
+вместо фиксированного числа сообщений в промпт попадают самые новые
+сообщения, которые помещаются в бюджет провайдера.
+
+Токены считаются локально и приблизительно - без обращения к API модели.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from typing import List, Sequence
+
+from app.config import settings
+from .message import Message
+
+log = logging.getLogger(__name__)
+
+# Слово или отдельный знак препинания
+_TOKEN_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+# Средняя длина токена в символах: латиница режется на более длинные куски, чем кириллица
+_ASCII_CHARS_PER_TOKEN = 4
+_NON_ASCII_CHARS_PER_TOKEN = 3
+_TRUNCATION_MARK = " …"
+# Меньше этого остатка бюджета сообщение не обрезаем, а отбрасываем
+_MIN_TRUNCATED_TOKENS = 16
+
+
+def _piece_tokens(piece: str) -> int:
+    chars_per_token = _ASCII_CHARS_PER_TOKEN if piece.isascii() else _NON_ASCII_CHARS_PER_TOKEN
+    return -(-len(piece) // chars_per_token) # ceil
+
+
+def estimate_tokens(text: str) -> int:
+    """Быстрая приблизительная оценка числа токенов в тексте."""
+    return sum(_piece_tokens(piece) for piece in _TOKEN_PIECE_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Обрезает текст (с отметкой обрезки) так, чтобы его оценка не превышала ``max_tokens``."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max_tokens - estimate_tokens(_TRUNCATION_MARK)
+    used = 0
+    cut_at = 0
+    for match in _TOKEN_PIECE_RE.finditer(text):
+        piece = match.group()
+        piece_tokens = _piece_tokens(piece)
+        if used + piece_tokens > limit:
+            # Длинный кусок (URL, base64, текст без пробелов) режем посимвольно
+            # по остатку бюджета, иначе от сообщения осталась бы одна отметка
+            chars_per_token = _ASCII_CHARS_PER_TOKEN if piece.isascii() else _NON_ASCII_CHARS_PER_TOKEN
+            remaining = limit - used
+            if remaining > 0:
+                cut_at = match.start() + remaining * chars_per_token
+            break
+        used += piece_tokens
+        cut_at = match.end()
+    return text[:cut_at].rstrip() + _TRUNCATION_MARK
+
+
+class ContextAssembler:
+    """
+    Упаковывает историю диалога в бюджет токенов.
+
+    Правила:
+      • сообщения длиннее ``max_message_tokens`` обрезаются;
+      • сообщения пользователя приоритетнее: сначала от новых к старым
+        набираются реплики пользователя, затем в оставшийся бюджет -
+        ответы ассистента из того же окна (последний не поместившийся
+        ответ может быть обрезан);
+      • результат возвращается в хронологическом порядке.
+    """
+
+    def __init__(self, token_budget: int, max_message_tokens: int) -> None:
+        self.token_budget = token_budget
+        self.max_message_tokens = max_message_tokens
+
+    @classmethod
+    def for_provider(cls, provider_name: str) -> "ContextAssembler":
+        """Создаёт сборщик с бюджетом, настроенным для провайдера в Settings."""
+        return cls(
+            token_budget=settings.get_context_token_budget(provider_name),
+            max_message_tokens=settings.LLM_CONTEXT_MAX_MESSAGE_TOKENS,
+        )
+
+    def _fit_message(self, message: Message) -> tuple[Message, int]:
+        content = message["content"]
+        tokens = estimate_tokens(content)
+        if tokens > self.max_message_tokens:
+            content = truncate_to_tokens(content, self.max_message_tokens)
+            tokens = estimate_tokens(content)
+            message = Message(role=message["role"], content=content)
+        return message, tokens
+
+    def assemble(self, history: Sequence[Message], prompt: str = "") -> List[Message]:
+        """
+        Args:
+            history (Sequence[Message]): История в хронологическом порядке.
+            prompt (str): Текущий запрос; его токены вычитаются из бюджета.
+
+        Returns:
+            List[Message]: Сообщения для передачи в LLM (хронологический порядок).
+        """
+        budget = self.token_budget - estimate_tokens(prompt)
+        if budget <= 0 or not history:
+            return []
+
+        fitted = [self._fit_message(m) for m in history]
+        selected: dict[int, Message] = {}
+
+        # Проход 1: реплики пользователя, от новых к старым, без пропусков
+        window_start = 0
+        for idx in range(len(fitted) - 1, -1, -1):
+            message, tokens = fitted[idx]
+            if message["role"] != "user":
+                continue
+            if tokens > budget:
+                window_start = idx + 1
+                break
+            selected[idx] = message
+            budget -= tokens
+
+        # Проход 2: остальные сообщения окна в оставшийся бюджет
+        for idx in range(len(fitted) - 1, window_start - 1, -1):
+            if idx in selected:
+                continue
+            message, tokens = fitted[idx]
+            if tokens <= budget:
+                selected[idx] = message
+                budget -= tokens
+                continue
+            if budget >= _MIN_TRUNCATED_TOKENS:
+                selected[idx] = Message(
+                    role=message["role"], content=truncate_to_tokens(message["content"], budget)
+                )
+            break
+
+        assembled = [selected[idx] for idx in sorted(selected)]
+        log.debug(
+            "ContextAssembler: packed %d of %d messages into budget %d tokens",
+            len(assembled), len(history), self.token_budget,
+        )
+        return assembled
+
+
+__all__ = ["ContextAssembler", "estimate_tokens", "truncate_to_tokens"]
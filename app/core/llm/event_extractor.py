@@ -0,0 +1,363 @@
+# app/core/llm/event_extractor.py
+
+"""
+Локальное извлечение событий из текста с запасным вызовом LLM.
+
+Конвейер для пачки текстов:
+  1. Префильтр - скомпилированное регулярное выражение по временным
+     выражениям (время, даты, месяцы, дни недели, «завтра», «tomorrow»...).
+     Тексты без них (большинство реплик) дальше не идут.
+  2. ``dateparser.search.search_dates`` с ограниченным набором языков
+     (EVENT_EXTRACTION_LANGUAGES) в пуле процессов: разбор CPU-bound и не
+     должен блокировать event loop. Процессы пула прогреваются при старте
+     (данные локалей dateparser загружаются один раз).
+  3. Неоднозначные результаты (несколько дат, день недели не совпал, потеряно
+     «вечером», явное время без разбора, месяц без числа, отрицание) - в
+     ``llm_fallback`` одной пачкой. Английские слова-омонимы месяцев и дней
+     («may», «march», «sat») без числа рядом датой не считаются.
+     Без fallback неоднозначный текст событий не даёт: ложное событие хуже
+     пропущенного.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Sequence, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from app.config import settings
+from app.core.llm.message import Event
+
+log = logging.getLogger(__name__)
+
+Match = Tuple[str, datetime]
+LLMFallback = Callable[[List[str]], Awaitable[List[List[Event]]]]
+
+# --- 1. Префильтр ---
+_MONTHS = (
+    r"январ\w*|феврал\w*|март\w*|апрел\w*|ма[йяе]|июн\w*|июл\w*|август\w*|сентябр\w*|октябр\w*|ноябр\w*|декабр\w*"
+    r"|january|february|march|april|may|june|july|august|september|october|november|december"
+    r"|jan|feb|mar|apr|jun|jul|aug|sept?|oct|nov|dec"
+)
+_WEEKDAYS_RU = ("понедельник", "вторник", "сред", "четверг", "пятниц", "суббот", "воскресень")
+_WEEKDAYS_EN = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_WEEKDAYS_EN_SHORT = r"mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun"
+_TIME_OF_DAY = r"утр\w*|вечер\w*|днём|днем|дня|ночь\w*|ночи|morning|afternoon|evening|night|tonight"
+# Явные время/дата/месяц/день недели: если dateparser их не разобрал - текст неоднозначен
+_STRONG_TEMPORAL = re.compile(
+    r"\b\d{1,2}[:.]\d{2}\b|\b\d{1,2}\s*(?:am|pm|a\.m\.|p\.m\.)"
+    r"|\b\d{1,2}[./-]\d{1,2}(?:[./-]\d{2,4})?\b|\b\d{4}-\d{2}-\d{2}\b"
+    rf"|\b(?:{_MONTHS})\b|\b(?:{'|'.join(_WEEKDAYS_RU)})\w*|\b(?:{'|'.join(_WEEKDAYS_EN)})\b",
+    re.IGNORECASE,
+)
+_TEMPORAL = re.compile(
+    _STRONG_TEMPORAL.pattern
+    + r"|\b(?:сегодня|(?:после\s*)?завтра|(?:the\s+)?day\s+after\s+tomorrow|выходн\w+|через\s+(?:\d+|час|день|неделю|месяц)"
+    r"|в\s+\d{1,2}\s*(?:час\w*|утра|вечера|дня|ночи)?\b|на\s+(?:этой|следующей)\s+неделе"
+    r"|today|tomorrow|tonight|weekend|next\s+(?:week|month|year)|in\s+\d+\s+(?:minute|hour|day|week)s?"
+    r"|at\s+\d{1,2}\b|this\s+(?:morning|afternoon|evening))"
+    rf"|\b(?:{_TIME_OF_DAY})\b",
+    re.IGNORECASE,
+)
+_TIME_OF_DAY_RE = re.compile(rf"\b(?:{_TIME_OF_DAY})\b|\b\d{{1,2}}\s*(?:am|pm)\b", re.IGNORECASE)
+# Фрагмент с временем суток; без него dateparser подставляет текущее время
+_CLOCK_RE = re.compile(
+    r"\d{1,2}[:.]\d{2}|\d\s*(?:am|pm)\b|\b(?:в|at)\s+\d|через|\bin\s+\d+\s+(?:hour|minute)"
+    rf"|час|минут|hour|minute|noon|полдень|полночь|midnight|\b(?:{_TIME_OF_DAY})\b",
+    re.IGNORECASE,
+)
+_WEEKDAY_RE = re.compile(
+    rf"\b(?:(?P<ru>{'|'.join(_WEEKDAYS_RU)})\w*|(?P<en>{'|'.join(_WEEKDAYS_EN)}|{_WEEKDAYS_EN_SHORT}))\b",
+    re.IGNORECASE,
+)
+# Месяц или сокращённый день недели: без числа и времени рядом дату не задают
+_BARE_DATE_WORD_RE = re.compile(rf"\b(?:{_MONTHS}|{_WEEKDAYS_EN_SHORT})\b", re.IGNORECASE)
+# Английские слова, совпадающие с месяцем/днём недели («you may be right»,
+# «sat at home»): в нижнем регистре и без числа рядом - обычные слова
+_COMMON_WORD_RE = re.compile(r"(?<!\d)(?<!\d )\b(?:may|march|mar|sat|sun|wed)\b(?!\s*\d)")
+# «Завтра не смогу»: отрицание в реплике - скорее отмена, чем событие
+# («не забудь» / «don't forget» - напоминание, а не отрицание)
+_NEGATION_RE = re.compile(
+    r"\b(?:не|нет|not|never|cannot|can['’]t|won['’]t|don['’]t|didn['’]t|isn['’]t|aren['’]t|couldn['’]t)\b"
+    r"(?!\s+(?:забу\w*|forget))",
+    re.IGNORECASE,
+)
+# Относительные дни и их смещение от сегодняшней даты (длинные фразы первыми)
+_RELATIVE_DAYS = (
+    (re.compile(r"\b(?:(?:the\s+)?day\s+after\s+tomorrow|после\s*завтра)\b", re.IGNORECASE), 2),
+    (re.compile(r"\b(?:tomorrow|завтра)\b", re.IGNORECASE), 1),
+    (re.compile(r"\b(?:today|tonight|сегодня)\b", re.IGNORECASE), 0),
+)
+
+
+def _without_common_words(text: str) -> str:
+    return _COMMON_WORD_RE.sub(" ", text)
+
+
+def has_temporal_expression(text: str) -> bool:
+    """Быстрая проверка: есть ли в тексте хоть какое-то временное выражение."""
+    return bool(_TEMPORAL.search(_without_common_words(text)))
+
+
+# --- 2. dateparser (выполняется в процессах пула) ---
+def _dateparser_settings(now: datetime) -> dict:
+    return {
+        "RELATIVE_BASE": now.replace(tzinfo=None),
+        "PREFER_DATES_FROM": "future",
+        "TIMEZONE": str(now.tzinfo),
+        "RETURN_AS_TIMEZONE_AWARE": True,
+    }
+
+
+def _warm_up(languages: Tuple[str, ...]) -> None:
+    """Инициализатор процесса пула: импорт dateparser и загрузка локалей."""
+    from dateparser.search import search_dates
+
+    search_dates("завтра в 10:00, tomorrow at 10am", languages=list(languages))
+
+
+def search_texts(texts: Sequence[str], now: datetime, languages: Tuple[str, ...]) -> List[List[Match]]:
+    """
+    Ищет даты в текстах (``dateparser.search.search_dates``).
+
+    Args:
+        texts (Sequence[str]): Тексты.
+        now (datetime): Текущее время с часовым поясом (база для «завтра»).
+        languages (Tuple[str, ...]): Коды языков dateparser.
+
+    Returns:
+        List[List[Match]]: Для каждого текста пары (фрагмент, дата).
+    """
+    from dateparser.search import search_dates
+
+    parser_settings = _dateparser_settings(now)
+    results: List[List[Match]] = []
+    for text in texts:
+        try:
+            found = search_dates(text, languages=list(languages), settings=parser_settings) or []
+        except Exception as e_parse: # dateparser падает на редких входах - текст просто без дат
+            log.debug("dateparser failed on %.50r: %s", text, e_parse)
+            found = []
+        results.append([(fragment, moment.astimezone(now.tzinfo)) for fragment, moment in found])
+    return results
+
+
+# --- 3. Разбор совпадений ---
+def _title(text: str, fragment: str) -> str:
+    """Название события: предложение с датой без самого фрагмента даты."""
+    sentence = next(
+        (part for part in re.split(r"(?<=[.!?])\s+|\n+", text) if fragment in part), text
+    )
+    title = re.sub(r"\s+", " ", sentence.replace(fragment, " ")).strip(" ,.;:!?-—")
+    title = title[:80].rstrip()
+    return title[:1].upper() + title[1:] if title else fragment.strip()
+
+
+def _relative_day_offsets(text: str) -> Set[int]:
+    """Смещения (в днях) относительных дней в тексте: «послезавтра» -> 2, «завтра» -> 1."""
+    offsets: Set[int] = set()
+    for pattern, offset in _RELATIVE_DAYS:
+        if pattern.search(text):
+            offsets.add(offset)
+            text = pattern.sub(" ", text) # «day after tomorrow» не должно засчитаться как «tomorrow»
+    return offsets
+
+
+def classify_matches(text: str, matches: Sequence[Match], now: datetime) -> Optional[List[Event]]:
+    """
+    Превращает результаты dateparser в события.
+
+    Returns:
+        List[Event] | None: События (возможно, пустой список) или None, если
+            разбор неоднозначен и текст стоит отдать LLM.
+    """
+    horizon = now + timedelta(days=settings.EVENT_EXTRACTION_HORIZON_DAYS)
+    rest = text # Текст без отброшенных совпадений-слов
+    kept: List[Match] = []
+    for fragment, moment in matches:
+        position = text.find(fragment)
+        if position > 0 and re.match(r"[\d.:/-]", text[position - 1]):
+            # Фрагмент начинается внутри числа («20.10 в 11:30» -> «10 в 11:30»)
+            return None
+        if not re.search(r"\d", fragment) and _BARE_DATE_WORD_RE.search(fragment):
+            if not _BARE_DATE_WORD_RE.search(_without_common_words(fragment)):
+                # «you may be right», «sat down» - обычное слово, а не дата
+                rest = rest.replace(fragment, " ")
+                continue
+            # «in March», «Sat at home»: месяц или день без числа - дата неизвестна
+            return None
+        end = position + len(fragment)
+        if position >= 0 and any(
+            m.start() < end and m.end() > position and (m.start() < position or m.end() > end)
+            for m in _TEMPORAL.finditer(text)
+        ):
+            # Временное выражение шире разобранного фрагмента («во вторник в 10 утра» -> «во вторник в 10»)
+            return None
+        if not _CLOCK_RE.search(fragment):
+            # «завтра», «25 декабря» - событие на весь день
+            moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Голые числа, «сейчас», «сегодня» и прошлое - не события
+        if re.fullmatch(r"\s*\d+\s*", fragment) or moment <= now + timedelta(minutes=1):
+            continue
+        kept.append((fragment, moment))
+
+    if not kept:
+        # Явное время или дата, которые dateparser не понял
+        return None if _STRONG_TEMPORAL.search(_without_common_words(rest)) else []
+    if len({moment for _, moment in kept}) > 1 or any(moment > horizon for _, moment in kept):
+        return None
+
+    fragment, moment = kept[0]
+    weekday = _WEEKDAY_RE.search(fragment)
+    if weekday:
+        word = weekday.group(0).lower()
+        if weekday.group("ru"):
+            named = next(i for i, name in enumerate(_WEEKDAYS_RU) if word.startswith(name))
+        else:
+            named = next(i for i, name in enumerate(_WEEKDAYS_EN) if word[:3] == name[:3])
+        if moment.weekday() != named or moment - now > timedelta(days=8):
+            return None
+    # «day after tomorrow» разобрано как «tomorrow»: относительный день не совпал с датой
+    offsets = _relative_day_offsets(text)
+    if offsets and (moment.date() - now.date()).days not in offsets:
+        return None
+    # «Завтра не смогу»: отрицание - скорее отмена, чем событие
+    if _NEGATION_RE.search(text.replace(fragment, " ")):
+        return None
+    # «в пятницу вечером»: время суток осталось за пределами фрагмента
+    if (moment.hour, moment.minute) == (0, 0) and _TIME_OF_DAY_RE.search(text.replace(fragment, " ")):
+        return None
+    return [Event(title=_title(text, fragment), start=moment, end=None)]
+
+
+# --- Пул процессов (по одному на процесс-владелец, пересоздаётся после fork) ---
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+_thread_warmed = False
+
+
+def _languages() -> Tuple[str, ...]:
+    return tuple(code.strip() for code in settings.EVENT_EXTRACTION_LANGUAGES.split(",") if code.strip())
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor, _executor_pid
+    if settings.EVENT_EXTRACTION_PROCESSES <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.EVENT_EXTRACTION_PROCESSES, initializer=_warm_up, initargs=(_languages(),)
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _reset_executor(broken: ProcessPoolExecutor) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False)
+
+
+def _search_in_thread(texts: List[str], now: datetime, languages: Tuple[str, ...]) -> List[List[Match]]:
+    global _thread_warmed
+    if not _thread_warmed:
+        _warm_up(languages)
+        _thread_warmed = True
+    return search_texts(texts, now, languages)
+
+
+async def _search(texts: List[str], now: datetime) -> List[List[Match]]:
+    """dateparser в пуле процессов (тексты делятся между процессами) или в потоке."""
+    languages = _languages()
+    executor = _get_executor()
+    if executor is not None:
+        loop = asyncio.get_running_loop()
+        size = -(-len(texts) // settings.EVENT_EXTRACTION_PROCESSES)
+        try:
+            chunks = await asyncio.gather(*(
+                loop.run_in_executor(executor, search_texts, texts[start:start + size], now, languages)
+                for start in range(0, len(texts), size)
+            ))
+            return [matches for chunk in chunks for matches in chunk]
+        except (BrokenProcessPool, OSError, AssertionError) as e_pool:
+            log.warning("Event extractor: process pool unavailable (%s), parsing in a thread", e_pool)
+            _reset_executor(executor)
+    return await asyncio.to_thread(_search_in_thread, texts, now, languages)
+
+
+async def extract_events_hybrid(
+    texts: Sequence[str], llm_fallback: Optional[LLMFallback] = None, now: Optional[datetime] = None
+) -> List[List[Event]]:
+    """
+    Извлекает события из пачки текстов: префильтр, dateparser, LLM для
+    неоднозначных случаев.
+
+    Args:
+        texts (Sequence[str]): Тексты.
+        llm_fallback: Пакетное извлечение моделью (или None - без модели).
+        now (datetime | None): Текущее время (по умолчанию - сейчас в
+            USER_ACTIVITY_TIMEZONE).
+
+    Returns:
+        List[List[Event]]: События; элемент ``i`` относится к ``texts[i]``.
+    """
+    now = now or datetime.now(ZoneInfo(settings.USER_ACTIVITY_TIMEZONE))
+    results: List[List[Event]] = [[] for _ in texts]
+    candidates = [index for index, text in enumerate(texts) if has_temporal_expression(text)]
+    if not candidates:
+        return results
+
+    matches = await _search([texts[index] for index in candidates], now)
+    ambiguous: List[int] = []
+    for index, text_matches in zip(candidates, matches):
+        events = classify_matches(texts[index], text_matches, now)
+        if events is None:
+            ambiguous.append(index)
+        else:
+            results[index] = events
+    log.debug(
+        "Event extractor: %d texts, %d after prefilter, %d ambiguous",
+        len(texts), len(candidates), len(ambiguous),
+    )
+    if ambiguous and llm_fallback is not None:
+        fallback = await llm_fallback([texts[index] for index in ambiguous])
+        for index, events in zip(ambiguous, fallback):
+            results[index] = events
+    return results
+
+
+def warm_up_event_extractor() -> None:
+    """Запускает процессы пула заранее (загрузка dateparser - при старте, а не на первой реплике)."""
+    executor = _get_executor()
+    if executor is not None:
+        executor.submit(search_texts, [], datetime.now(ZoneInfo(settings.USER_ACTIVITY_TIMEZONE)), _languages())
+
+
+def shutdown_event_extractor() -> None:
+    """Останавливает пул процессов извлечения (при остановке процесса)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None and _executor_pid == os.getpid():
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+__all__ = [
+    "classify_matches",
+    "extract_events_hybrid",
+    "has_temporal_expression",
+    "search_texts",
+    "shutdown_event_extractor",
+    "warm_up_event_extractor",
+]
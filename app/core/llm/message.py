@@ -19,5 +19,12 @@ class Event(TypedDict):
     start: datetime
     end: datetime | None # Используем Union для < 3.10 или | для >= 3.10
 
+class AchievementNameRequest(TypedDict):
+    """Параметры генерации названий одной ачивки (для пакетных вызовов)."""
+    context: str
+    style_id: str
+    tone_hint: str
+    style_examples: str
+
 # --- Экспорты ---
-__all__ = ["Message", "Event"] # Экспортируем явно
+__all__ = ["Message", "Event", "AchievementNameRequest"] # Экспортируем явно
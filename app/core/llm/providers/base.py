@@ -2,18 +2,45 @@
 
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Sequence, Optional # Добавили Optional
+from typing import AsyncIterator, List, Sequence, Optional # Добавили Optional
 
-from app.core.llm.message import Message, Event
+from app.core.llm.message import AchievementNameRequest, Message, Event
 
 class BaseLLMProvider(ABC):
     """Абстрактный базовый класс для LLM провайдеров (АСИНХРОННЫЙ)."""
     name: str # Имя провайдера (e.g., 'stub', 'gemini')
+    # True, если иконки генерируются удалённой моделью (долго): воркер
+    # показывает локальный значок-заглушку, пока ждёт результат
+    remote_icon_generation: bool = False
 
     @abstractmethod
-    async def generate(self, prompt: str, context: Sequence[Message]) -> str:
-        """Генерирует текстовый ответ."""
+    async def generate(
+        self, prompt: str, context: Sequence[Message], rag_facts: Optional[List[str]] = None
+    ) -> str:
+        """Генерирует текстовый ответ. ``rag_facts`` - фоновые факты (например, резюме диалога)."""
+        ...
+
+    @abstractmethod
+    def generate_stream(
+        self, prompt: str, context: Sequence[Message], rag_facts: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Генерирует ответ потоково: асинхронный итератор текстовых фрагментов
+        в том порядке, в котором их выдаёт модель. Склейка всех фрагментов
+        должна совпадать с результатом :meth:`generate`.
+        """
+        ...
+
+    @abstractmethod
+    async def summarize_conversation(
+        self, previous_summary: Optional[str], messages: Sequence[Message]
+    ) -> str:
+        """
+        Сворачивает новые сообщения в накопительное резюме диалога:
+        возвращает обновлённое резюме с учётом ``previous_summary``.
+        """
         ...
 
     @abstractmethod
@@ -21,6 +48,14 @@ class BaseLLMProvider(ABC):
         """Извлекает события календаря из текста."""
         ...
 
+    async def extract_events_batch(self, texts: Sequence[str]) -> List[List[Event]]:
+        """
+        Извлекает события из нескольких текстов: результат ``i`` относится
+        к ``texts[i]``. По умолчанию - параллельные вызовы extract_events;
+        провайдеры с пакетным промптом переопределяют метод.
+        """
+        return list(await asyncio.gather(*(self.extract_events(text) for text in texts)))
+
     @abstractmethod
     async def generate_achievement_name(
         self, context: str, style_id: str, tone_hint: str, style_examples: str
@@ -28,6 +63,17 @@ class BaseLLMProvider(ABC):
         """Генерирует названия для ачивок."""
         ...
 
+    async def generate_achievement_names(
+        self, requests: Sequence[AchievementNameRequest]
+    ) -> List[List[str]]:
+        """
+        Генерирует названия для нескольких ачивок: результат ``i`` относится
+        к ``requests[i]``. По умолчанию - параллельные вызовы
+        generate_achievement_name; провайдеры с пакетным промптом
+        переопределяют метод.
+        """
+        return list(await asyncio.gather(*(self.generate_achievement_name(**request) for request in requests)))
+
     # --- НОВЫЙ АБСТРАКТНЫЙ МЕТОД ---
     @abstractmethod
     async def generate_achievement_icon(
@@ -40,7 +86,30 @@ class BaseLLMProvider(ABC):
         ) -> bytes | None: # Возвращает байты PNG или None при ошибке
         """Генерирует иконку ачивки (PNG байты)."""
         ...
+
+    async def generate_achievement_icons(
+        self,
+        context: str,
+        style_id: str,
+        style_keywords: str,
+        palette_hint: str,
+        shape_hint: str,
+        count: int,
+        ) -> List[bytes]:
+        """
+        Генерирует до ``count`` вариантов иконки (пропуская неудачные).
+        По умолчанию - ``count`` параллельных вызовов generate_achievement_icon;
+        провайдеры с пакетной генерацией переопределяют метод.
+        """
+        icons = await asyncio.gather(*(
+            self.generate_achievement_icon(
+                context=context, style_id=style_id, style_keywords=style_keywords,
+                palette_hint=palette_hint, shape_hint=shape_hint,
+            )
+            for _ in range(count)
+        ))
+        return [icon for icon in icons if icon]
     # -------------------------------
 
 # Экспорты остаются прежними
-__all__ = ["BaseLLMProvider", "Message", "Event"]
+__all__ = ["BaseLLMProvider", "Message", "Event", "AchievementNameRequest"]
@@ -3,11 +3,15 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+import json
 import logging
+from datetime import datetime
+from zoneinfo import ZoneInfo
 import base64 # Для декодирования ответа Imagen
 import google.generativeai as genai
 from google.generativeai.types import GenerationConfig, ContentDict, PartDict, SafetySettingDict, GenerateContentResponse
-from typing import List, Sequence, Optional, Dict, Any, cast
+from typing import AsyncIterator, List, Sequence, Optional, Dict, Any, cast
 
 # --- Импорты для Vertex AI (Imagen) ---
 from google.cloud import aiplatform
@@ -15,7 +19,9 @@ from google.cloud import aiplatform
 # from google.protobuf.struct_pb2 import Value # Обычно не нужен
 # ------------------------------------
 
-from .base import BaseLLMProvider, Message, Event
+from .base import AchievementNameRequest, BaseLLMProvider, Message, Event
+from app.core.llm.badge_renderer import render_badge
+from app.core.llm.event_extractor import extract_events_hybrid
 from app.config import settings # Для API ключей и настроек проекта
 
 log = logging.getLogger(__name__)
@@ -51,6 +57,7 @@ class GeminiLLMProvider(BaseLLMProvider):
     name = "gemini"
     DEFAULT_MODEL_NAME = "gemini-1.5-flash-latest" # Для диалогов
     IMAGEN_MODEL_NAME = "imagegeneration@006"     # Актуальная версия Imagen на момент написания
+    IMAGEN_MAX_IMAGES_PER_CALL = 4                 # Лимит number_of_images для одного запроса
 
     DEFAULT_SAFETY_SETTINGS: List[SafetySettingDict] = [
         {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
@@ -121,11 +128,10 @@ class GeminiLLMProvider(BaseLLMProvider):
             )
         return gemini_history
 
-    async def generate(
-        self, prompt: str, context: Sequence[Message],
-        rag_facts: Optional[List[str]] = None, system_prompt_override: Optional[str] = None
-    ) -> str:
-        log.debug(f"Gemini generate: User prompt='{prompt[:70]}...', Context items={len(context)}")
+    def _build_contents(
+        self, prompt: str, context: Sequence[Message], rag_facts: Optional[List[str]] = None
+    ) -> List[ContentDict]:
+        """Собирает contents для generate_content_async: история + RAG-факты + текущий запрос."""
         history_prepared = self._prepare_gemini_history(context)
 
         if rag_facts:
@@ -142,7 +148,14 @@ class GeminiLLMProvider(BaseLLMProvider):
             log.debug("Gemini generate: Added %d RAG facts.", len(rag_facts))
 
         current_message = cast(ContentDict, {'role': 'user', 'parts': [PartDict(text=prompt)]})
-        contents_for_api = history_prepared + [current_message]
+        return history_prepared + [current_message]
+
+    async def generate(
+        self, prompt: str, context: Sequence[Message],
+        rag_facts: Optional[List[str]] = None, system_prompt_override: Optional[str] = None
+    ) -> str:
+        log.debug(f"Gemini generate: User prompt='{prompt[:70]}...', Context items={len(context)}")
+        contents_for_api = self._build_contents(prompt, context, rag_facts)
 
         try:
             # google-generativeai>=0.4 does not accept ``system_instruction`` in
@@ -188,6 +201,82 @@ class GeminiLLMProvider(BaseLLMProvider):
             log.exception(f"Error during Gemini API call in generate(): {e}")
             return f"(Произошла ошибка при обращении к AI: {type(e).__name__}: {e})"
 
+    async def generate_stream(
+        self, prompt: str, context: Sequence[Message],
+        rag_facts: Optional[List[str]] = None, system_prompt_override: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        log.debug(f"Gemini generate_stream: User prompt='{prompt[:70]}...', Context items={len(context)}")
+        contents_for_api = self._build_contents(prompt, context, rag_facts)
+
+        try:
+            response = await self.model.generate_content_async(
+                contents=contents_for_api,
+                generation_config=self.generation_config,
+                safety_settings=self.safety_settings,
+                stream=True,
+            )
+            if response.prompt_feedback and response.prompt_feedback.block_reason:
+                reason = response.prompt_feedback.block_reason.name
+                log.warning(f"Gemini generate_stream: Response blocked by safety settings: {reason}")
+                yield f"(Ответ был заблокирован: {reason})"
+                return
+
+            emitted_any = False
+            async for chunk in response:
+                try:
+                    chunk_text = chunk.text
+                except (AttributeError, IndexError, ValueError) as chunk_exc:
+                    # Фрагмент без текста (например, отфильтрован) - пропускаем
+                    log.warning(f"Gemini generate_stream: Skipping chunk without text: {chunk_exc}")
+                    continue
+                if chunk_text:
+                    emitted_any = True
+                    yield chunk_text
+            if not emitted_any:
+                log.warning("Gemini generate_stream: Stream finished without any text.")
+                yield "(Ответ AI был отфильтрован или пуст.)"
+            else:
+                log.info("Gemini generate_stream: Stream completed successfully.")
+        except Exception as e:
+            log.exception(f"Error during Gemini API call in generate_stream(): {e}")
+            yield f"(Произошла ошибка при обращении к AI: {type(e).__name__}: {e})"
+
+    async def summarize_conversation(
+        self, previous_summary: Optional[str], messages: Sequence[Message]
+    ) -> str:
+        log.debug(f"Gemini summarize_conversation: {len(messages)} new messages, previous summary: {'YES' if previous_summary else 'NO'}")
+        transcript = "\n".join(
+            f"{'AI-Friend' if m.get('role') == 'assistant' else 'User'}: {m.get('content', '').strip()}"
+            for m in messages
+        )
+        user_prompt = f"""
+You maintain a running memory of a conversation between a user and AI-Friend.
+Update the existing summary with the new messages below.
+Keep facts about the user (names, preferences, plans, important events, feelings), open topics and promises.
+Drop small talk. Write in the language of the conversation, at most 200 words, plain text, no preamble.
+
+Existing summary:
+{previous_summary or "(none yet)"}
+
+New messages:
+{transcript}
+"""
+        try:
+            response = await self.model.generate_content_async(
+                contents=[cast(ContentDict, {'role': 'user', 'parts': [PartDict(text=user_prompt)]})],
+                generation_config=GenerationConfig(temperature=0.2, candidate_count=1),
+                safety_settings=self.safety_settings,
+            )
+            summary_text = response.text.strip()
+            if not summary_text:
+                raise ValueError("empty summary")
+            log.info("Gemini summarize_conversation: summary updated (%d chars).", len(summary_text))
+            return summary_text
+        except Exception as e:
+            # Без нового резюме высокая отметка не двигается - задача повторит попытку позже
+            log.exception(f"Error during Gemini API call in summarize_conversation(): {e}")
+            raise
+
     async def generate_achievement_name(
         self, context: str, style_id: str, tone_hint: str, style_examples: str
     ) -> List[str]:
@@ -248,9 +337,205 @@ Instructions:
             log.exception(f"Error during Gemini API call for achievement names: {e}")
             return ["ApiErrorName 1", "ApiErrorName 2", "ApiErrorName 3"]
 
+    async def generate_achievement_names(
+        self, requests: Sequence[AchievementNameRequest]
+    ) -> List[List[str]]:
+        # Один промпт на пачку (не больше ACHIEVEMENT_NAME_BATCH_MAX_SIZE ачивок)
+        chunk_size = max(1, settings.ACHIEVEMENT_NAME_BATCH_MAX_SIZE)
+        chunks = await asyncio.gather(*(
+            self._generate_achievement_names_chunk(requests[start:start + chunk_size])
+            for start in range(0, len(requests), chunk_size)
+        ))
+        return [names for chunk in chunks for names in chunk]
+
+    async def _generate_achievement_names_chunk(
+        self, requests: Sequence[AchievementNameRequest]
+    ) -> List[List[str]]:
+        log.debug("Gemini generate_achievement_names: %d items", len(requests))
+        system_prompt = "You are a highly creative naming expert specializing in crafting achievement titles. Your goal is to generate short, catchy, and style-consistent names based on the provided context and style guidance. Adhere strictly to the requested tone and format."
+        items = [
+            {
+                "id": index,
+                "context": request["context"],
+                "style_id": request["style_id"],
+                "tone": request["tone_hint"],
+                "style_examples": request["style_examples"],
+            }
+            for index, request in enumerate(requests)
+        ]
+        user_prompt = f"""
+Please generate achievement names for each item of the following JSON array:
+{json.dumps(items, ensure_ascii=False, indent=1)}
+Instructions:
+1.  For every item generate exactly 3 unique achievement name options.
+2.  Each name must be short (maximum 4 words), capture the essence of the item's "context" and match its "tone" and "style_examples".
+3.  Treat items independently.
+4.  Output *only* a JSON array with one object per item: [{{"id": <item id>, "names": ["...", "...", "..."]}}]. Do not add any extra text, explanations, or markdown.
+"""
+        full_prompt_contents: List[ContentDict] = [
+             cast(ContentDict, {'role': 'user', 'parts': [PartDict(text=system_prompt)]}),
+             cast(ContentDict, {'role': 'model', 'parts': [PartDict(text="Okay, I will return a JSON array with 3 names per item.")]}),
+             cast(ContentDict, {'role': 'user', 'parts': [PartDict(text=user_prompt)]})
+        ]
+        results: List[Optional[List[str]]] = [None] * len(requests)
+        try:
+            generation_config_names = GenerationConfig(temperature=0.85, candidate_count=1)
+            response = await self.model.generate_content_async(
+                contents=full_prompt_contents,
+                generation_config=generation_config_names,
+                safety_settings=self.safety_settings
+            )
+            if response.prompt_feedback and response.prompt_feedback.block_reason:
+                # Блокировку могла вызвать одна ачивка - остальные получат названия поштучно
+                log.warning(f"Gemini batched name generation blocked: {response.prompt_feedback.block_reason.name}")
+            elif (response.candidates and response.candidates[0].content and
+                    response.candidates[0].content.parts and response.candidates[0].content.parts[0].text):
+                results = self._parse_batched_names(response.candidates[0].content.parts[0].text, len(requests))
+            else:
+                log.warning("Gemini returned no usable content for batched achievement names.")
+        except Exception as e:
+            log.exception(f"Error during Gemini API call for batched achievement names: {e}")
+            return [["ApiErrorName 1", "ApiErrorName 2", "ApiErrorName 3"] for _ in requests]
+
+        # Пропущенные или неразобранные элементы - отдельными запросами
+        missing = [index for index, names in enumerate(results) if names is None]
+        if missing:
+            log.warning("Gemini batched names: %d of %d items missing, retrying individually", len(missing), len(requests))
+            retried = await asyncio.gather(*(self.generate_achievement_name(**requests[index]) for index in missing))
+            for index, names in zip(missing, retried):
+                results[index] = names
+        log.info("Gemini generated achievement names for %d items in one request", len(requests))
+        return cast(List[List[str]], results)
+
+    @staticmethod
+    def _parse_batched_names(text: str, count: int) -> List[Optional[List[str]]]:
+        """
+        Разбирает ответ пакетного промпта названий (см. _batched_items).
+        Элемент без корректных названий - None.
+        """
+        results: List[Optional[List[str]]] = [None] * count
+        for index, names in GeminiLLMProvider._batched_items(text, count, "names"):
+            if results[index] is not None or not isinstance(names, list):
+                continue
+            valid_names: List[str] = []
+            for name in names:
+                if isinstance(name, str) and name.strip() and name.strip() not in valid_names:
+                    valid_names.append(name.strip())
+            if valid_names:
+                while len(valid_names) < 3: # Добиваем до 3, как и одиночный запрос
+                    valid_names.append(f"Generated Name {len(valid_names) + 1}")
+                results[index] = valid_names[:3]
+        return results
+
+    @staticmethod
+    def _batched_items(text: str, count: int, field: str) -> List[tuple[int, Any]]:
+        """
+        Достаёт из ответа пакетного промпта пары (id элемента, значение ``field``).
+        Допускаются markdown-ограждение и текст вокруг JSON, обёртка
+        ``{"results": [...]}`` и элементы без id (тогда id - позиция).
+        """
+        starts = [position for position in (text.find("["), text.find("{")) if position >= 0]
+        if not starts:
+            return []
+        try:
+            data, _ = json.JSONDecoder().raw_decode(text, min(starts))
+        except ValueError:
+            log.warning("Gemini batched response is not valid JSON")
+            return []
+        if isinstance(data, dict):
+            data = data.get("results", data.get("items"))
+        if not isinstance(data, list):
+            return []
+        items = []
+        for position, entry in enumerate(data):
+            index, value = position, entry
+            if isinstance(entry, dict):
+                index, value = entry.get("id", position), entry.get(field)
+            try:
+                index = int(index)
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < count:
+                items.append((index, value))
+        return items
+
     async def extract_events(self, text: str) -> List[Event]:
-        log.debug("GeminiLLMProvider.extract_events called (returns empty list for MVP).")
-        return []
+        return (await self.extract_events_batch([text]))[0]
+
+    async def extract_events_batch(self, texts: Sequence[str]) -> List[List[Event]]:
+        llm_enabled = settings.EVENT_EXTRACTION_LLM_ENABLED
+        if settings.EVENT_EXTRACTION_LOCAL_ENABLED:
+            # Локальный разбор; модель - только для неоднозначных текстов
+            return await extract_events_hybrid(texts, llm_fallback=self._extract_events_llm if llm_enabled else None)
+        if not llm_enabled:
+            log.debug("GeminiLLMProvider.extract_events_batch: extraction disabled, returning no events.")
+            return [[] for _ in texts]
+        return await self._extract_events_llm(texts)
+
+    async def _extract_events_llm(self, texts: Sequence[str]) -> List[List[Event]]:
+        # Один промпт на пачку текстов (не больше EVENT_EXTRACTION_BATCH_MAX_SIZE)
+        chunk_size = max(1, settings.EVENT_EXTRACTION_BATCH_MAX_SIZE)
+        chunks = await asyncio.gather(*(
+            self._extract_events_chunk(texts[start:start + chunk_size])
+            for start in range(0, len(texts), chunk_size)
+        ))
+        return [events for chunk in chunks for events in chunk]
+
+    async def _extract_events_chunk(self, texts: Sequence[str]) -> List[List[Event]]:
+        log.debug("Gemini extract_events: %d texts", len(texts))
+        now = datetime.now(ZoneInfo(settings.USER_ACTIVITY_TIMEZONE))
+        items = [{"id": index, "text": text} for index, text in enumerate(texts)]
+        user_prompt = f"""
+Current date and time: {now.isoformat(timespec="minutes")} ({now.strftime("%A")}).
+Extract calendar events (meetings, appointments, reminders, plans with a specific date or time) from each item of the following JSON array:
+{json.dumps(items, ensure_ascii=False, indent=1)}
+Instructions:
+1.  Treat items independently. Resolve relative dates ("tomorrow", "в пятницу") against the current date.
+2.  Use ISO 8601 for "start" and "end" ("end" is null if unknown). Keep "title" short, in the language of the item.
+3.  Items without events get an empty "events" list.
+4.  Output *only* a JSON array with one object per item: [{{"id": <item id>, "events": [{{"title": "...", "start": "...", "end": null}}]}}]. Do not add any extra text, explanations, or markdown.
+"""
+        results: List[List[Event]] = [[] for _ in texts]
+        try:
+            response = await self.model.generate_content_async(
+                contents=[cast(ContentDict, {'role': 'user', 'parts': [PartDict(text=user_prompt)]})],
+                generation_config=GenerationConfig(temperature=0.0, candidate_count=1),
+                safety_settings=self.safety_settings
+            )
+            if response.prompt_feedback and response.prompt_feedback.block_reason:
+                log.warning(f"Gemini event extraction blocked: {response.prompt_feedback.block_reason.name}")
+                return results
+            if not (response.candidates and response.candidates[0].content and
+                    response.candidates[0].content.parts and response.candidates[0].content.parts[0].text):
+                log.warning("Gemini returned no usable content for event extraction.")
+                return results
+            response_text = response.candidates[0].content.parts[0].text
+        except Exception as e:
+            # Извлечение событий - не критичная часть ответа: ошибка не валит реплику
+            log.exception(f"Error during Gemini API call for event extraction: {e}")
+            return results
+        for index, raw_events in self._batched_items(response_text, len(texts), "events"):
+            if isinstance(raw_events, list):
+                results[index] = [event for event in map(self._parse_event, raw_events) if event]
+        log.info("Gemini extracted events for %d texts in one request", len(texts))
+        return results
+
+    @staticmethod
+    def _parse_event(raw: Any) -> Optional[Event]:
+        """Событие из элемента ответа модели или None, если оно некорректно."""
+        if not isinstance(raw, dict) or not isinstance(raw.get("title"), str) or not raw["title"].strip():
+            return None
+        try:
+            start = datetime.fromisoformat(str(raw["start"]).replace("Z", "+00:00"))
+            end = datetime.fromisoformat(str(raw["end"]).replace("Z", "+00:00")) if raw.get("end") else None
+        except (KeyError, ValueError):
+            return None
+        return Event(title=raw["title"].strip(), start=start, end=end)
+
+    @property
+    def remote_icon_generation(self) -> bool:
+        # Imagen вызывается, только если Vertex AI инициализирован
+        return self.vertex_ai_initialized
 
     async def generate_achievement_icon(
         self,
@@ -260,14 +545,80 @@ Instructions:
         palette_hint: str,
         shape_hint: str
         ) -> bytes | None:
-        log.info(f"Imagen: Attempting icon generation. Context='{context}', StyleID='{style_id}'")
+        """
+        Генерирует иконку через Imagen. Если Imagen недоступен или вернул
+        ошибку, рендерит локальный значок по тем же подсказкам
+        (ACHIEVEMENT_ICON_FALLBACK_ENABLED).
+        """
+        icons = await self.generate_achievement_icons(
+            context, style_id, style_keywords, palette_hint, shape_hint, count=1
+        )
+        return icons[0] if icons else None
+
+    async def generate_achievement_icons(
+        self,
+        context: str,
+        style_id: str,
+        style_keywords: str,
+        palette_hint: str,
+        shape_hint: str,
+        count: int,
+        ) -> List[bytes]:
+        """
+        Генерирует ``count`` вариантов иконки: Imagen получает ``number_of_images``
+        в одном запросе (не больше IMAGEN_MAX_IMAGES_PER_CALL, остальное -
+        следующими запросами). Недостающие варианты при включённом
+        ACHIEVEMENT_ICON_FALLBACK_ENABLED дополняются локальными значками.
+        """
+        icons: List[bytes] = []
+        while len(icons) < count:
+            batch = await self._generate_imagen_icons(
+                context, style_id, style_keywords, palette_hint, shape_hint,
+                count=min(count - len(icons), self.IMAGEN_MAX_IMAGES_PER_CALL),
+            )
+            if not batch:
+                break
+            icons.extend(batch)
+        if len(icons) < count and settings.ACHIEVEMENT_ICON_FALLBACK_ENABLED:
+            log.warning(f"Imagen: {count - len(icons)} icon(s) unavailable, rendering local badge fallback.")
+            # Локальный значок детерминирован: одного достаточно для всех недостающих вариантов
+            icons.extend([await render_badge(context, palette_hint, shape_hint)] * (count - len(icons)))
+        return icons[:count]
+
+    @staticmethod
+    def _extract_png(generated_image: Any) -> bytes | None:
+        """Байты PNG из объекта изображения Imagen (атрибут зависит от версии SDK)."""
+        if hasattr(generated_image, '_blob') and isinstance(generated_image._blob, bytes):
+            return generated_image._blob or None
+        if hasattr(generated_image, 'image_bytes') and isinstance(generated_image.image_bytes, bytes):
+            return generated_image.image_bytes or None
+        if hasattr(generated_image, 'base64_image') and isinstance(generated_image.base64_image, str):
+            try:
+                return base64.b64decode(generated_image.base64_image) or None
+            except Exception as e_b64:
+                log.error(f"Imagen: Failed to decode base64 image: {e_b64}")
+                return None
+        log.warning("Imagen response did not contain image data in expected attributes (_blob, image_bytes, base64_image).")
+        log.debug(f"Imagen full generated_image object: {generated_image}")
+        return None
+
+    async def _generate_imagen_icons(
+        self,
+        context: str,
+        style_id: str,
+        style_keywords: str,
+        palette_hint: str,
+        shape_hint: str,
+        count: int = 1,
+        ) -> List[bytes]:
+        log.info(f"Imagen: Attempting generation of {count} icon(s). Context='{context}', StyleID='{style_id}'")
 
         if not self.vertex_ai_initialized:
             log.error("Imagen: Vertex AI SDK not initialized. Cannot generate icon.")
-            return None
+            return []
         if not settings.VERTEX_AI_PROJECT or not settings.VERTEX_AI_LOCATION: # Двойная проверка
             log.error("Imagen: Vertex AI project or location not configured.")
-            return None
+            return []
 
         try:
             # Получаем модель Imagen (from_pretrained кэширует, не создает каждый раз)
@@ -292,52 +643,32 @@ Instructions:
             images_response = None
             try:
                 loop = asyncio.get_running_loop()
-                # model.generate_images() - синхронный вызов
+                # model.generate_images() - синхронный вызов; варианты генерируются одним запросом
                 images_response = await loop.run_in_executor(
                     None,
-                    model.generate_images,
-                    prompt=full_prompt,
-                    number_of_images=1,
-                    # aspect_ratio="1:1", # Можно добавить
-                    # seed=12345, # Для воспроизводимости, если нужно
+                    functools.partial(
+                        model.generate_images,
+                        prompt=full_prompt,
+                        number_of_images=count,
+                        # aspect_ratio="1:1", # Можно добавить
+                        # seed=12345, # Для воспроизводимости, если нужно
+                    ),
                 )
             except Exception as e_gen_img:
                 log.exception(f"Imagen: Error during model.generate_images call: {e_gen_img}")
-                return None
+                return []
 
             if images_response and images_response.images:
-                generated_image = images_response.images[0]
-                png_bytes: bytes | None = None
-                # Пытаемся извлечь байты разными способами
-                if hasattr(generated_image, '_blob') and isinstance(generated_image._blob, bytes):
-                    png_bytes = generated_image._blob
-                elif hasattr(generated_image, 'image_bytes') and isinstance(generated_image.image_bytes, bytes):
-                    png_bytes = generated_image.image_bytes
-                elif hasattr(generated_image, 'base64_image') and isinstance(generated_image.base64_image, str):
-                    try:
-                        png_bytes = base64.b64decode(generated_image.base64_image)
-                    except Exception as e_b64:
-                        log.error(f"Imagen: Failed to decode base64 image: {e_b64}")
-                        return None
-                else:
-                    log.warning("Imagen response did not contain image data in expected attributes (_blob, image_bytes, base64_image).")
-                    log.debug(f"Imagen full generated_image object: {generated_image}")
-                    return None
-
-                if png_bytes:
-                    log.info(f"Imagen: Icon generated successfully ({len(png_bytes)} bytes).")
-                    return png_bytes
-                else:
-                    log.warning("Imagen: Extracted image bytes are empty or invalid.")
-                    return None
-            else:
-                log.warning(f"Imagen API returned no images or an unexpected response. Full response: {images_response}")
-                return None
+                icons = [png for png in map(self._extract_png, images_response.images) if png]
+                log.info(f"Imagen: {len(icons)} of {count} icon(s) generated successfully.")
+                return icons
+            log.warning(f"Imagen API returned no images or an unexpected response. Full response: {images_response}")
+            return []
         except ImportError:
              log.error("google-cloud-aiplatform library not found. Cannot generate icons with Imagen.")
-             return None
+             return []
         except Exception as e:
             log.exception(f"Unexpected error during Imagen icon generation: {e}")
-            return None
+            return []
 
 __all__ = ["GeminiLLMProvider"]
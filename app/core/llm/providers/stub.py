@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 import logging # Добавляем logging
-from typing import List, Sequence, Optional # Добавляем Optional
+from typing import AsyncIterator, List, Sequence, Optional # Добавляем Optional
 
+from app.core.llm.badge_renderer import render_badge
 from app.core.llm.message import Message, Event
 from .base import BaseLLMProvider
 
@@ -13,10 +14,27 @@ class StubLLMProvider(BaseLLMProvider):
     """Возвращает фиксированные ответы – удобен в unit-тестах."""
     name = "stub"
 
-    async def generate(self, prompt: str, ctx: Sequence[Message]) -> str:
+    async def generate(
+        self, prompt: str, ctx: Sequence[Message], rag_facts: Optional[List[str]] = None
+    ) -> str:
         log.debug("StubLLMProvider: generate called")
         return "ok" # Для тестов API чата
 
+    async def generate_stream(
+        self, prompt: str, ctx: Sequence[Message], rag_facts: Optional[List[str]] = None
+    ) -> AsyncIterator[str]:
+        log.debug("StubLLMProvider: generate_stream called")
+        yield "ok" # Тот же ответ, что и generate, одним фрагментом
+
+    async def summarize_conversation(
+        self, previous_summary: Optional[str], messages: Sequence[Message]
+    ) -> str:
+        log.debug("StubLLMProvider: summarize_conversation called")
+        # Детерминированное "резюме" для тестов: первые слова каждой реплики
+        parts = [previous_summary] if previous_summary else []
+        parts.extend(f"{m['role']}: {m['content'][:40]}" for m in messages)
+        return " | ".join(parts)[-2000:]
+
     async def extract_events(self, text: str) -> List[Event]:
         log.debug("StubLLMProvider: extract_events called")
         return [] # Ничего не извлекаем
@@ -32,8 +50,7 @@ class StubLLMProvider(BaseLLMProvider):
         self, context: str, style_id: str, style_keywords: str,
         palette_hint: str, shape_hint: str
         ) -> bytes | None:
-        log.debug("StubLLMProvider: generate_achievement_icon called (returns None)")
-        # В тестах обычно не нужна реальная генерация, возвращаем None
-        # или можно вернуть заранее подготовленные тестовые байты PNG.
-        return None
+        log.debug("StubLLMProvider: generate_achievement_icon called (local badge renderer)")
+        # Локальный значок: быстрый и детерминированный, без внешних сервисов
+        return await render_badge(context, palette_hint, shape_hint)
     # ---------------------------
@@ -0,0 +1,13 @@
+# app/core/outbox/__init__.py
+
+"""
+Transactional outbox для фоновых задач Celery.
+
+Задачи не публикуются в брокер из транзакции запроса: вместо этого строка
+``outbox_messages`` пишется в той же транзакции, что и данные, а relay
+публикует её после коммита (см. relay.py).
+"""
+
+from .service import OutboxService  # noqa: F401
+
+__all__: list[str] = ["OutboxService"]
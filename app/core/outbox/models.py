@@ -0,0 +1,42 @@
+# app/core/outbox/models.py
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import JSON, DateTime, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class OutboxMessage(Base):
+    """
+    Задача Celery, ожидающая публикации в брокер.
+
+    ``dedupe_key`` уникален и используется как task_id при публикации:
+    повторная публикация той же строки (at-least-once) даёт тот же task_id.
+    ``attempts`` считает публикации и ошибки самой строки; строка, набравшая
+    OUTBOX_MAX_ATTEMPTS ошибок, больше не публикуется (dead letter).
+    """
+    __tablename__ = "outbox_messages"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    task_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False, comment="Task keyword arguments")
+    dedupe_key: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    published_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str: # pragma: no cover
+        return f"<OutboxMessage id={self.id} task='{self.task_name}' published={self.published_at is not None}>"
+
+
+# Очистка удаляет опубликованные строки старше срока хранения
+Index("ix_outbox_messages_published_at", OutboxMessage.published_at)
+# Relay выбирает неопубликованные строки по порядку id
+Index("ix_outbox_messages_unpublished", OutboxMessage.id, postgresql_where=OutboxMessage.published_at.is_(None),
+      sqlite_where=OutboxMessage.published_at.is_(None))
@@ -0,0 +1,160 @@
+# app/core/outbox/relay.py
+
+"""
+Relay: публикует строки outbox в брокер Celery пачками.
+
+Запускается:
+  • после коммита в web-процессе (schedule_outbox_relay, если включён
+    OUTBOX_RELAY_ON_COMMIT) - в фоне, не задерживая ответ;
+  • периодически задачей relay_outbox_task (Celery beat) - подбирает строки,
+    которые не успели опубликовать (падение процесса после коммита и т.п.).
+
+Доставка at-least-once: строка отмечается опубликованной после успешной
+публикации, поэтому при сбое между ними задача уйдёт повторно - с тем же
+task_id (dedupe_key). Задачи должны быть идемпотентны.
+
+Ошибка брокера останавливает проход (остальные строки подождут следующего).
+Ошибка самой строки (незарегистрированная задача, несериализуемый payload)
+не мешает остальным: строка получает попытку и после OUTBOX_MAX_ATTEMPTS
+ошибок остаётся в таблице как dead letter. Опубликованные строки и dead
+letter удаляются через OUTBOX_RETENTION_HOURS (purge_outbox).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from kombu.exceptions import OperationalError
+
+from app.config import settings
+from app.db.base import async_session_context
+from .service import OutboxService
+
+log = logging.getLogger(__name__)
+
+# (id, task_name, payload, dedupe_key)
+_PendingMessage = Tuple[int, str, Dict[str, Any], str]
+
+# Ошибки соединения с брокером: публиковать дальше бессмысленно
+_BROKER_ERRORS = (OperationalError, OSError)
+
+
+def _publish(messages: List[_PendingMessage]) -> Tuple[List[int], List[int], bool]:
+    """
+    Синхронно публикует сообщения в брокер (вызывается в отдельном потоке).
+    Ошибка отдельного сообщения не мешает остальным; на ошибке брокера
+    публикация останавливается.
+
+    Returns:
+        Tuple[List[int], List[int], bool]: id опубликованных, id сообщений
+            с собственной ошибкой и признак недоступности брокера.
+    """
+    # Импорт внутри функции, чтобы избежать циклического импорта при старте
+    from app.workers.tasks import celery_app
+
+    published: List[int] = []
+    failed: List[int] = []
+    for message_id, task_name, payload, dedupe_key in messages:
+        try:
+            celery_app.tasks[task_name].apply_async(kwargs=payload, task_id=dedupe_key)
+        except _BROKER_ERRORS as e_broker:
+            log.error("Outbox relay: broker unavailable while publishing %s (id=%d): %s", task_name, message_id, e_broker)
+            return published, failed, True
+        except Exception as e_publish:
+            log.error("Outbox relay: failed to publish %s (id=%d): %r", task_name, message_id, e_publish)
+            failed.append(message_id)
+            continue
+        published.append(message_id)
+    return published, failed, False
+
+
+async def relay_outbox(batch_size: Optional[int] = None) -> int:
+    """
+    Публикует все неопубликованные строки outbox пачками по ``batch_size``.
+    Каждая пачка - отдельная короткая транзакция; публикация выполняется в
+    потоке, чтобы не блокировать event loop. За проход каждая строка
+    публикуется не больше одного раза.
+
+    Returns:
+        int: Число опубликованных сообщений.
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    max_attempts = settings.OUTBOX_MAX_ATTEMPTS
+    published_total = 0
+    last_id = 0
+    while True:
+        async with async_session_context() as session:
+            outbox = OutboxService(session)
+            rows = await outbox.claim_batch(batch_size, max_attempts, after_id=last_id)
+            if not rows:
+                break
+            messages = [(row.id, row.task_name, row.payload, row.dedupe_key) for row in rows]
+            published_ids, failed_ids, broker_down = await asyncio.to_thread(_publish, messages)
+            await outbox.mark_published(published_ids)
+            await outbox.mark_failed(failed_ids)
+        for row in rows:
+            if row.id in failed_ids and row.attempts + 1 >= max_attempts:
+                log.error("Outbox relay: %s (id=%d) failed %d times, moved to dead letter",
+                          row.task_name, row.id, row.attempts + 1)
+        published_total += len(published_ids)
+        last_id = rows[-1].id
+        if broker_down or len(rows) < batch_size:
+            break
+    if published_total:
+        log.info("Outbox relay: published %d messages", published_total)
+    return published_total
+
+
+async def purge_outbox() -> int:
+    """
+    Удаляет опубликованные строки и dead letter старше OUTBOX_RETENTION_HOURS.
+
+    Returns:
+        int: Число удалённых строк.
+    """
+    older_than = datetime.now(timezone.utc) - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    async with async_session_context() as session:
+        deleted = await OutboxService(session).purge(older_than, settings.OUTBOX_MAX_ATTEMPTS)
+    if deleted:
+        log.info("Outbox purge: deleted %d rows older than %s", deleted, older_than.isoformat())
+    return deleted
+
+
+# --- Запуск после коммита (web-процесс) ---
+_relay_task: Optional[asyncio.Task] = None
+_relay_requested = False
+
+
+async def _relay_until_idle() -> None:
+    global _relay_requested
+    while True:
+        _relay_requested = False
+        try:
+            await relay_outbox()
+        except Exception as e_relay:
+            # Строки остались в outbox - их опубликует периодическая задача
+            log.exception("Outbox relay failed: %s", e_relay)
+            return
+        if not _relay_requested:
+            return
+
+
+def schedule_outbox_relay() -> None:
+    """
+    Запускает relay в фоне текущего event loop после коммита транзакции.
+    Одновременно работает не больше одного relay на процесс: запросы,
+    пришедшие во время работы, объединяются в ещё один проход.
+    """
+    global _relay_task, _relay_requested
+    if not settings.OUTBOX_RELAY_ON_COMMIT:
+        return
+    if _relay_task is not None and not _relay_task.done():
+        _relay_requested = True
+        return
+    _relay_task = asyncio.get_running_loop().create_task(_relay_until_idle())
+
+
+__all__ = ["purge_outbox", "relay_outbox", "schedule_outbox_relay"]
@@ -0,0 +1,131 @@
+# app/core/outbox/service.py
+
+from __future__ import annotations
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from .models import OutboxMessage
+
+log = logging.getLogger(__name__)
+
+# Ключ в session.info: в транзакции ставились задачи (relay после коммита нужен)
+_ENQUEUED_INFO_KEY = "outbox_enqueued"
+
+
+class OutboxService:
+    """
+    Запись задач в outbox и выборка их для relay.
+    Как и остальные сервисы, делает только flush/execute - коммит за вызывающим кодом.
+    """
+
+    def __init__(self, db_session: AsyncSession):
+        """
+        Args:
+            db_session (AsyncSession): Асинхронная сессия БД (транзакция бизнес-данных).
+        """
+        self.db: AsyncSession = db_session
+
+    def _insert_for_dialect(self):
+        dialect_name = self.db.get_bind().dialect.name
+        if dialect_name == "postgresql":
+            return postgresql_insert(OutboxMessage)
+        if dialect_name == "sqlite":
+            return sqlite_insert(OutboxMessage)
+        raise NotImplementedError(f"Outbox is not supported for dialect '{dialect_name}'") # pragma: no cover
+
+    async def enqueue(self, task_name: str, payload: Dict[str, Any], dedupe_key: str | None = None) -> str:
+        """
+        Добавляет задачу в outbox в текущей транзакции.
+
+        Args:
+            task_name (str): Зарегистрированное имя задачи Celery.
+            payload (Dict[str, Any]): Именованные аргументы задачи (JSON-сериализуемые).
+            dedupe_key (str | None): Ключ идемпотентности; повторная постановка
+                с тем же ключом игнорируется. По умолчанию - случайный UUID.
+
+        Returns:
+            str: Использованный dedupe_key (он же task_id при публикации).
+        """
+        dedupe_key = dedupe_key or uuid.uuid4().hex
+        stmt = self._insert_for_dialect().values(
+            task_name=task_name, payload=payload, dedupe_key=dedupe_key
+        ).on_conflict_do_nothing(index_elements=[OutboxMessage.__table__.c.dedupe_key])
+        await self.db.execute(stmt)
+        self.db.info[_ENQUEUED_INFO_KEY] = True
+        log.debug("Outbox: enqueued %s (dedupe_key=%s)", task_name, dedupe_key)
+        return dedupe_key
+
+    @property
+    def enqueued(self) -> bool:
+        """Ставились ли задачи в outbox в этой сессии (любым OutboxService)."""
+        return bool(self.db.info.get(_ENQUEUED_INFO_KEY, False))
+
+    async def claim_batch(self, batch_size: int, max_attempts: int, after_id: int = 0) -> Sequence[OutboxMessage]:
+        """
+        Выбирает пачку неопубликованных строк с ``id > after_id``, у которых
+        меньше ``max_attempts`` попыток. В Postgres строки блокируются
+        с SKIP LOCKED, поэтому несколько relay не публикуют одну пачку параллельно.
+        """
+        stmt = (
+            select(OutboxMessage)
+            .where(
+                OutboxMessage.published_at.is_(None),
+                OutboxMessage.attempts < max_attempts,
+                OutboxMessage.id > after_id,
+            )
+            .order_by(OutboxMessage.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        return (await self.db.scalars(stmt)).all()
+
+    async def mark_published(self, ids: List[int]) -> None:
+        """Отмечает строки опубликованными одним UPDATE."""
+        if not ids:
+            return
+        await self.db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids))
+            .values(published_at=func.now(), attempts=OutboxMessage.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def mark_failed(self, ids: List[int]) -> None:
+        """Увеличивает счётчик попыток строк, которые не удалось опубликовать из-за них самих."""
+        if not ids:
+            return
+        await self.db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids))
+            .values(attempts=OutboxMessage.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def purge(self, older_than: datetime, max_attempts: int) -> int:
+        """
+        Удаляет строки, опубликованные раньше ``older_than``, и строки
+        dead letter (``max_attempts`` ошибок), созданные раньше ``older_than``.
+
+        Returns:
+            int: Число удалённых строк.
+        """
+        result = await self.db.execute(
+            delete(OutboxMessage)
+            .where(or_(
+                OutboxMessage.published_at < older_than,
+                (OutboxMessage.published_at.is_(None))
+                & (OutboxMessage.attempts >= max_attempts)
+                & (OutboxMessage.created_at < older_than),
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount or 0
@@ -0,0 +1,68 @@
+# app/core/storage/__init__.py
+
+"""
+Хранилище бинарных объектов (иконки ачивок).
+
+Бэкенд выбирается настройкой STORAGE_BACKEND:
+  • ``gcs``    - Google Cloud Storage (GCS_BUCKET_NAME);
+  • ``local``  - каталог LOCAL_STORAGE_ROOT (локальная разработка, CI);
+  • ``memory`` - память процесса (тесты, бенчмарки);
+  • ``none``   - загрузка отключена.
+По умолчанию - ``gcs``, если задан GCS_BUCKET_NAME, иначе ``none``.
+
+Экземпляр создаётся фабрикой и кэшируется вызывающим кодом на процесс
+(в воркере Celery - WorkerRuntime.blob_store()).
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from app.config import settings
+from .base import BlobData, BlobStore, content_key
+from .local import LocalBlobStore
+from .memory import MemoryBlobStore
+
+log = logging.getLogger(__name__)
+
+
+def create_blob_store() -> Optional[BlobStore]:
+    """
+    Создаёт хранилище по настройкам.
+
+    Returns:
+        BlobStore | None: Хранилище или None, если загрузка отключена.
+
+    Raises:
+        ValueError: Неизвестный бэкенд или не хватает настроек для него.
+    """
+    backend = (settings.STORAGE_BACKEND or ("gcs" if settings.GCS_BUCKET_NAME else "none")).lower()
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryBlobStore()
+    if backend == "local":
+        return LocalBlobStore(settings.LOCAL_STORAGE_ROOT, base_url=settings.LOCAL_STORAGE_BASE_URL)
+    if backend == "gcs":
+        if not settings.GCS_BUCKET_NAME:
+            raise ValueError("STORAGE_BACKEND=gcs requires GCS_BUCKET_NAME")
+        # Импорт здесь: google-cloud-storage нужен только для этого бэкенда
+        from .gcs import GCSBlobStore
+        return GCSBlobStore(
+            settings.GCS_BUCKET_NAME,
+            max_workers=settings.STORAGE_MAX_CONCURRENCY,
+            chunk_size=settings.STORAGE_UPLOAD_CHUNK_SIZE,
+            public_read=settings.GCS_PUBLIC_READ,
+        )
+    raise ValueError(f"Unknown storage backend: {settings.STORAGE_BACKEND}")
+
+
+__all__ = [
+    "BlobData",
+    "BlobStore",
+    "LocalBlobStore",
+    "MemoryBlobStore",
+    "content_key",
+    "create_blob_store",
+]
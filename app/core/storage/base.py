@@ -0,0 +1,71 @@
+# app/core/storage/base.py
+
+from __future__ import annotations
+
+import hashlib
+import io
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Optional, Union
+
+# Данные для загрузки: байты или файловый объект (читается потоково, частями)
+BlobData = Union[bytes, BinaryIO]
+
+
+def content_key(prefix: str, data: bytes, extension: str) -> str:
+    """
+    Ключ объекта по хэшу содержимого: ``{prefix}/{sha256[:32]}.{extension}``.
+    Одинаковое содержимое всегда попадает в один и тот же объект.
+    """
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return f"{prefix.strip('/')}/{digest}.{extension}"
+
+
+def as_stream(data: BlobData) -> BinaryIO:
+    """Файловый объект для потоковой записи (байты оборачиваются в BytesIO)."""
+    return io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+
+
+class BlobStore(ABC):
+    """Абстрактное асинхронное хранилище бинарных объектов (иконки ачивок и т.п.)."""
+    name: str # Имя бэкенда (e.g., 'gcs', 'local', 'memory')
+
+    @abstractmethod
+    async def put(self, key: str, data: BlobData, content_type: Optional[str] = None) -> str:
+        """Сохраняет объект (перезаписывая существующий) и возвращает его URL."""
+        ...
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Содержимое объекта или None, если объекта нет."""
+        ...
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Есть ли объект с таким ключом."""
+        ...
+
+    @abstractmethod
+    async def url(self, key: str) -> str:
+        """URL объекта (без проверки существования)."""
+        ...
+
+    async def put_content_addressed(
+        self, prefix: str, data: bytes, extension: str, content_type: Optional[str] = None
+    ) -> str:
+        """
+        Сохраняет объект под ключом из хэша содержимого. Если такой объект
+        уже есть, повторная загрузка пропускается.
+
+        Args:
+            prefix (str): Префикс ключа (например, ``badges/achievements/cat``).
+            data (bytes): Содержимое объекта.
+            extension (str): Расширение файла без точки.
+            content_type (str | None): MIME-тип.
+
+        Returns:
+            str: URL объекта.
+        """
+        key = content_key(prefix, data, extension)
+        if await self.exists(key):
+            return await self.url(key)
+        return await self.put(key, data, content_type=content_type)
@@ -0,0 +1,102 @@
+# app/core/storage/gcs.py
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+from urllib.parse import quote
+
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+
+from .base import BlobData, BlobStore, as_stream
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Resumable-загрузка GCS требует размер чанка, кратный 256 КБ
+_GCS_CHUNK_ALIGNMENT = 256 * 1024
+_PUBLIC_HOST = "https://storage.googleapis.com"
+
+
+class GCSBlobStore(BlobStore):
+    """
+    Хранилище в Google Cloud Storage.
+
+    Клиент создаётся один раз при первом обращении и переиспользуется всеми
+    операциями экземпляра. Вызовы google-cloud-storage блокирующие, поэтому
+    выполняются в собственном ограниченном пуле потоков, а не в default
+    executor event loop (его делят с другими задачами).
+    """
+    name = "gcs"
+
+    def __init__(
+        self,
+        bucket_name: str,
+        client: Optional[storage.Client] = None,
+        max_workers: int = 8,
+        chunk_size: int = 8 * 1024 * 1024,
+        public_read: bool = True,
+    ) -> None:
+        """
+        Args:
+            bucket_name (str): Имя бакета.
+            client (storage.Client | None): Готовый клиент (по умолчанию создаётся лениво).
+            max_workers (int): Число параллельных операций с GCS.
+            chunk_size (int): Размер чанка потоковой (resumable) загрузки.
+            public_read (bool): Открывать ли загруженные объекты на чтение (``make_public``).
+        """
+        self.bucket_name = bucket_name
+        self._client = client
+        self._bucket: Optional[storage.Bucket] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcs-blob-store")
+        self.chunk_size = max(_GCS_CHUNK_ALIGNMENT, chunk_size // _GCS_CHUNK_ALIGNMENT * _GCS_CHUNK_ALIGNMENT)
+        self.public_read = public_read
+
+    @property
+    def bucket(self) -> storage.Bucket:
+        with self._lock:
+            if self._bucket is None:
+                if self._client is None:
+                    # GOOGLE_APPLICATION_CREDENTIALS должен быть установлен в окружении контейнера
+                    self._client = storage.Client()
+                    log.debug("GCSBlobStore: client initialized for bucket %s", self.bucket_name)
+                self._bucket = self._client.bucket(self.bucket_name)
+            return self._bucket
+
+    async def _call(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+
+    def _upload(self, key: str, data: BlobData, content_type: Optional[str]) -> str:
+        small = isinstance(data, (bytes, bytearray, memoryview)) and len(data) <= self.chunk_size
+        # Небольшие объекты уходят одним запросом, крупные и потоки - чанками
+        blob = self.bucket.blob(key, chunk_size=None if small else self.chunk_size)
+        blob.upload_from_file(as_stream(data), content_type=content_type, rewind=False)
+        if self.public_read:
+            blob.make_public()
+        return blob.public_url
+
+    def _download(self, key: str) -> Optional[bytes]:
+        try:
+            return self.bucket.blob(key).download_as_bytes()
+        except NotFound:
+            return None
+
+    async def put(self, key: str, data: BlobData, content_type: Optional[str] = None) -> str:
+        return await self._call(self._upload, key, data, content_type)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._call(self._download, key)
+
+    async def exists(self, key: str) -> bool:
+        return await self._call(lambda: self.bucket.blob(key).exists())
+
+    async def url(self, key: str) -> str:
+        # Как Blob.public_url, но без создания клиента
+        return f"{_PUBLIC_HOST}/{self.bucket_name}/{quote(key, safe='/~')}"
@@ -0,0 +1,72 @@
+# app/core/storage/local.py
+
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from .base import BlobData, BlobStore, as_stream
+
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Хранилище в локальной файловой системе (локальная разработка, CI).
+    Запись атомарна: данные потоково пишутся во временный файл рядом с
+    целевым и переименовываются, поэтому читатели не видят недописанных файлов.
+    """
+    name = "local"
+
+    def __init__(self, root: str, base_url: Optional[str] = None) -> None:
+        """
+        Args:
+            root (str): Корневой каталог хранилища.
+            base_url (str | None): Публичный URL каталога (например, статика за nginx);
+                без него возвращаются ``file://`` URI.
+        """
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Blob key escapes storage root: {key!r}")
+        return path
+
+    def _write(self, key: str, data: BlobData) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                shutil.copyfileobj(as_stream(data), tmp, _COPY_CHUNK_SIZE)
+            os.replace(tmp_name, path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    async def put(self, key: str, data: BlobData, content_type: Optional[str] = None) -> str:
+        await asyncio.to_thread(self._write, key, data)
+        return await self.url(key)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._path(key).is_file)
+
+    async def url(self, key: str) -> str:
+        if self.base_url:
+            return f"{self.base_url}/{key}"
+        return self._path(key).as_uri()
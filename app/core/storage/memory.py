@@ -0,0 +1,30 @@
+# app/core/storage/memory.py
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+from .base import BlobData, BlobStore, as_stream
+
+
+class MemoryBlobStore(BlobStore):
+    """Хранилище в памяти процесса - для тестов и бенчмарков."""
+    name = "memory"
+
+    def __init__(self) -> None:
+        # key -> (данные, content_type)
+        self.objects: Dict[str, Tuple[bytes, Optional[str]]] = {}
+
+    async def put(self, key: str, data: BlobData, content_type: Optional[str] = None) -> str:
+        self.objects[key] = (as_stream(data).read(), content_type)
+        return await self.url(key)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        stored = self.objects.get(key)
+        return stored[0] if stored else None
+
+    async def exists(self, key: str) -> bool:
+        return key in self.objects
+
+    async def url(self, key: str) -> str:
+        return f"memory://{key}"
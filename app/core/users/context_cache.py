@@ -0,0 +1,249 @@
+# /app/app/core/users/context_cache.py
+
+"""
+Кэш контекста диалога (последних сообщений пользователя).
+
+Источник истины - Postgres; кэш только убирает запрос истории с горячего
+пути для активных пользователей.
+
+Устройство:
+  • Redis-список ``ctx:{user_id}:msgs`` - не более ``max_messages`` последних
+    сообщений (JSON), общий для всех web-узлов;
+  • ключ версии ``ctx:{user_id}:ver`` - увеличивается при каждом изменении
+    списка. Его наличие означает, что список "прогрет" и полон: пустой
+    Redis-список неотличим от отсутствующего;
+  • маркер прогрева ``ctx:{user_id}:prime`` - случайный токен, который
+    запрос ставит перед чтением истории из БД (begin_prime). append и
+    invalidate его удаляют, а prime пишет список только при неизменном
+    токене: иначе реплика, закоммиченная между чтением из БД и прогревом,
+    потерялась бы в кэше;
+  • опциональный LRU в памяти процесса: хранит (версия, сообщения) и
+    проверяет версию в Redis при каждом чтении, поэтому не отдаёт устаревшие
+    данные, даже если историю дописал другой узел.
+
+Ошибки Redis не пробрасываются: чтение считается промахом (фолбэк на БД),
+а неудачная запись инвалидирует ключи пользователя.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from app.config import settings
+from app.core.llm.message import Message
+
+log = logging.getLogger(__name__)
+
+
+class ConversationContextCache:
+    """Ограниченный по длине кэш последних сообщений пользователя."""
+
+    KEY_PREFIX = "ctx"
+    PRIME_TOKEN_TTL_SECONDS = 30 # Дольше чтения истории из БД; истёкший токен - просто промах
+
+    def __init__(
+        self,
+        redis: Redis,
+        max_messages: int = 50,
+        ttl_seconds: int = 60 * 60 * 24,
+        local_lru_size: int = 0,
+    ) -> None:
+        """
+        Args:
+            redis (Redis): Асинхронный клиент Redis.
+            max_messages (int): Сколько последних сообщений хранить на пользователя.
+            ttl_seconds (int): Время жизни ключей пользователя без активности.
+            local_lru_size (int): Размер LRU в памяти процесса (0 - отключён).
+        """
+        self.redis = redis
+        self.max_messages = max_messages
+        self.ttl_seconds = ttl_seconds
+        self.local_lru_size = local_lru_size
+        self._local: OrderedDict[str, Tuple[bytes, Tuple[Message, ...]]] = OrderedDict()
+
+    # --- Ключи и сериализация ---
+    def _list_key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:msgs"
+
+    def _version_key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:ver"
+
+    def _prime_key(self, user_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{user_id}:prime"
+
+    @staticmethod
+    def _dump(message: Message) -> str:
+        return json.dumps({"role": message["role"], "content": message["content"]}, ensure_ascii=False)
+
+    @staticmethod
+    def _load(raw: bytes | str) -> Message:
+        data = json.loads(raw)
+        return Message(role=data["role"], content=data["content"])
+
+    # --- Локальный LRU ---
+    def _local_get(self, user_id: str, version: bytes) -> Optional[Tuple[Message, ...]]:
+        entry = self._local.get(user_id)
+        if entry is None or entry[0] != version:
+            return None
+        self._local.move_to_end(user_id)
+        return entry[1]
+
+    def _local_put(self, user_id: str, version: bytes, messages: Tuple[Message, ...]) -> None:
+        if self.local_lru_size <= 0:
+            return
+        self._local[user_id] = (version, messages)
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.local_lru_size:
+            self._local.popitem(last=False)
+
+    # --- Публичный API ---
+    async def get(self, user_id: str, limit: int) -> Optional[List[Message]]:
+        """
+        Возвращает последние ``limit`` сообщений в хронологическом порядке
+        или None при промахе (кэш не прогрет или Redis недоступен).
+        """
+        if limit > self.max_messages:
+            return None # Кэш не может содержать столько сообщений
+        try:
+            if self.local_lru_size > 0:
+                version = await self.redis.get(self._version_key(user_id))
+                if version is None:
+                    self._local.pop(user_id, None)
+                    return None
+                local_messages = self._local_get(user_id, version)
+                if local_messages is not None:
+                    return list(local_messages[-limit:]) if limit > 0 else []
+
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.get(self._version_key(user_id))
+                pipe.lrange(self._list_key(user_id), 0, -1)
+                version, raw_messages = await pipe.execute()
+        except RedisError as e:
+            log.warning("Context cache read failed for user %s: %s", user_id, e)
+            return None
+
+        if version is None:
+            return None
+        messages = tuple(self._load(raw) for raw in raw_messages)
+        self._local_put(user_id, version, messages)
+        return list(messages[-limit:]) if limit > 0 else []
+
+    async def begin_prime(self, user_id: str) -> Optional[str]:
+        """
+        Ставит маркер прогрева перед чтением истории из БД после промаха.
+
+        Returns:
+            str | None: Токен для prime или None, если Redis недоступен.
+        """
+        token = uuid.uuid4().hex
+        try:
+            await self.redis.set(self._prime_key(user_id), token, ex=self.PRIME_TOKEN_TTL_SECONDS)
+        except RedisError as e:
+            log.warning("Context cache prime marker failed for user %s: %s", user_id, e)
+            return None
+        return token
+
+    async def prime(self, user_id: str, messages: Sequence[Message], token: Optional[str]) -> None:
+        """
+        Заполняет кэш историей, прочитанной из БД после begin_prime.
+        Ничего не делает, если кэш уже прогрет другим запросом/узлом (его
+        данные не старше прочитанных из БД) или маркер прогрева сменился:
+        после чтения могла закоммититься реплика, которой нет в ``messages``.
+        """
+        if token is None:
+            return
+        version_key, list_key, prime_key = self._version_key(user_id), self._list_key(user_id), self._prime_key(user_id)
+        tail = list(messages)[-self.max_messages:]
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(version_key, prime_key)
+                if await pipe.exists(version_key):
+                    return
+                current = await pipe.get(prime_key)
+                if current is None or current.decode() != token:
+                    log.debug("Context cache prime for user %s skipped: history changed while reading", user_id)
+                    return
+                pipe.multi()
+                pipe.delete(list_key, prime_key)
+                if tail:
+                    pipe.rpush(list_key, *(self._dump(m) for m in tail))
+                    pipe.expire(list_key, self.ttl_seconds)
+                pipe.incr(version_key)
+                pipe.expire(version_key, self.ttl_seconds)
+                await pipe.execute()
+            log.debug("Context cache primed for user %s with %d messages", user_id, len(tail))
+        except WatchError:
+            log.debug("Context cache prime for user %s skipped: concurrent update", user_id)
+        except RedisError as e:
+            log.warning("Context cache prime failed for user %s: %s", user_id, e)
+
+    async def append(self, user_id: str, messages: Sequence[Message]) -> None:
+        """
+        Дописывает новые сообщения (после коммита в БД) и обрезает список до
+        ``max_messages``. Если кэш не прогрет, только сбрасывает маркер
+        прогрева: частичный список выглядел бы как полная история, а
+        прогрев, прочитавший БД до этого коммита, не должен записаться.
+        """
+        if not messages:
+            return
+        version_key, list_key = self._version_key(user_id), self._list_key(user_id)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(version_key)
+                if not await pipe.exists(version_key):
+                    await pipe.reset()
+                    await self.redis.delete(self._prime_key(user_id))
+                    return
+                pipe.multi()
+                pipe.rpush(list_key, *(self._dump(m) for m in messages))
+                pipe.ltrim(list_key, -self.max_messages, -1)
+                pipe.expire(list_key, self.ttl_seconds)
+                pipe.incr(version_key)
+                pipe.expire(version_key, self.ttl_seconds)
+                await pipe.execute()
+        except (WatchError, RedisError) as e:
+            # Порядок/полнота списка под вопросом - безопаснее перечитать из БД
+            log.warning("Context cache append failed for user %s (%s), invalidating.", user_id, e)
+            await self.invalidate(user_id)
+
+    async def invalidate(self, user_id: str) -> None:
+        """Удаляет кэш пользователя; следующее чтение пойдёт в БД."""
+        self._local.pop(user_id, None)
+        try:
+            await self.redis.delete(self._list_key(user_id), self._version_key(user_id), self._prime_key(user_id))
+        except RedisError as e:
+            log.warning("Context cache invalidation failed for user %s: %s", user_id, e)
+
+
+# --- Фабрика (один экземпляр на процесс) ---
+_context_cache_instance: Optional[ConversationContextCache] = None
+
+
+def get_context_cache() -> Optional[ConversationContextCache]:
+    """Возвращает кэш контекста или None, если он отключён в настройках."""
+    global _context_cache_instance
+    if not settings.CONTEXT_CACHE_ENABLED:
+        return None
+    if _context_cache_instance is None:
+        redis_url = settings.CONTEXT_CACHE_REDIS_URL or settings.REDIS_URL
+        _context_cache_instance = ConversationContextCache(
+            Redis.from_url(redis_url, socket_timeout=1.0, socket_connect_timeout=1.0),
+            max_messages=settings.CONTEXT_CACHE_MAX_MESSAGES,
+            ttl_seconds=settings.CONTEXT_CACHE_TTL_SECONDS,
+            local_lru_size=settings.CONTEXT_CACHE_LOCAL_LRU_SIZE,
+        )
+        log.info(
+            "Context cache initialized (max_messages=%d, local_lru_size=%d)",
+            settings.CONTEXT_CACHE_MAX_MESSAGES, settings.CONTEXT_CACHE_LOCAL_LRU_SIZE,
+        )
+    return _context_cache_instance
+
+
+__all__ = ["ConversationContextCache", "get_context_cache"]
@@ -1,7 +1,7 @@
 # /app/app/core/users/models.py (ФИНАЛЬНАЯ ИСПРАВЛЕННАЯ ВЕРСИЯ v3)
 
 from __future__ import annotations
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional, TYPE_CHECKING
 
 # --- ВАЖНО: Импортируем sqlalchemy как sa ---
@@ -16,8 +16,10 @@ from sqlalchemy import (
     Integer,
     Text,
     Boolean,
+    Date,
     LargeBinary,
-    UniqueConstraint # Добавил UniqueConstraint для использования в __table_args__
+    UniqueConstraint, # Добавил UniqueConstraint для использования в __table_args__
+    Index,
 )
 # -------------------------------------
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -47,23 +49,37 @@ class User(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    # Денормализованные счётчики сообщений: обновляются атомарно при вставке
+    # (см. UsersService.save_turn), чтобы не считать COUNT(*) по истории.
+    user_message_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False, server_default="0")
+    assistant_message_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False, server_default="0")
+    # Серия дней подряд с сообщениями (в часовом поясе USER_ACTIVITY_TIMEZONE)
+    streak_days: Mapped[int] = mapped_column(Integer, default=0, nullable=False, server_default="0")
+    last_active_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+
     # Поля для токенов календаря
     google_calendar_access_token_encrypted: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
     google_calendar_refresh_token_encrypted: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
     google_calendar_token_expiry: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     # --- Связи ---
+    # Коллекции не загружаются вместе с пользователем (lazy="raise"): иначе
+    # каждый db.get(User, ...) тянул бы всю историю чата. Где они нужны,
+    # их загружают явно через selectinload(...) - см. UsersService.
+    # passive_deletes=True: удаление дочерних строк выполняет ON DELETE CASCADE в БД.
     messages: Mapped[List["Message"]] = relationship(
         "Message",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        passive_deletes=True,
+        lazy="raise"
     )
     achievements: Mapped[List["Achievement"]] = relationship(
         "app.core.achievements.models.Achievement",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        passive_deletes=True,
+        lazy="raise"
     )
 
     def __repr__(self) -> str: # pragma: no cover
@@ -83,3 +99,31 @@ class Message(Base):
 
     def __repr__(self) -> str: # pragma: no cover
         return f"<Message id={self.id} user_id={self.user_id!r} role={self.role!r}>"
+
+
+# --- Свёрнутая история диалога ---
+class ConversationSummary(Base):
+    """
+    Накопительное резюме сообщений пользователя, не попадающих в окно
+    контекста. ``last_message_id`` - верхняя граница уже свёрнутых
+    сообщений: следующее обновление читает только сообщения после неё.
+    """
+    __tablename__ = 'conversation_summaries'
+    user_id: Mapped[str] = mapped_column(String(64), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    last_message_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self) -> str: # pragma: no cover
+        return f"<ConversationSummary user_id={self.user_id!r} last_message_id={self.last_message_id}>"
+
+
+# Составной индекс под выборку "последних N сообщений пользователя":
+# WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT N читается
+# прямо из индекса, без сортировки всей истории пользователя.
+Index(
+    "ix_messages_user_id_created_at_id",
+    Message.user_id,
+    Message.created_at.desc(),
+    Message.id.desc(),
+)
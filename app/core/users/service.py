@@ -3,18 +3,38 @@
 from __future__ import annotations
 
 import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
 from typing import List, Sequence, Optional
+from zoneinfo import ZoneInfo
 
-from sqlalchemy import select, desc
+from sqlalchemy import case, insert, select, update, desc
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from sqlalchemy.sql import func
 
+from app.config import settings
 from app.core.llm.message import Message
-from app.core.users.models import User, Message as MessageModel # Модели User и Message
+from app.core.users.models import User, ConversationSummary, Message as MessageModel # Модели User и Message
+from app.core.users.context_cache import ConversationContextCache
 
 log = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class SavedTurn:
+    """Результат :meth:`UsersService.save_turn`."""
+    user_message_id: int
+    assistant_message_id: int
+    user_message_count: int # Число сообщений пользователя с ролью ``user`` после вставки
+    streak_days: int = 0 # Серия дней подряд с сообщениями, включая текущий
+
+
+def local_now() -> datetime:
+    """Текущее время в часовом поясе активности пользователей (USER_ACTIVITY_TIMEZONE)."""
+    return datetime.now(ZoneInfo(settings.USER_ACTIVITY_TIMEZONE))
+
+
 class UsersService:
     """
     Асинхронный сервис для работы с пользователями и сообщениями (MVP).
@@ -22,14 +42,19 @@ class UsersService:
     """
     model = User
 
-    def __init__(self, db_session: AsyncSession):
+    def __init__(
+        self, db_session: AsyncSession, context_cache: Optional[ConversationContextCache] = None
+    ):
         """
         Инициализирует сервис с асинхронной сессией БД.
 
         Args:
             db_session (AsyncSession): Активная сессия SQLAlchemy.
+            context_cache (ConversationContextCache | None): Кэш последних
+                сообщений; если задан, get_recent_messages сначала читает его.
         """
         self.db: AsyncSession = db_session
+        self.context_cache = context_cache
 
     async def get_or_create_user(self, user_id: str, name: str | None = None) -> User:
         """
@@ -63,6 +88,30 @@ class UsersService:
             log.debug("Found existing user: %r", user)
         return user
 
+    async def get_user_with_relations(
+        self, user_id: str, with_messages: bool = False, with_achievements: bool = False
+    ) -> User | None:
+        """
+        Загружает пользователя вместе с явно запрошенными коллекциями.
+        По умолчанию ``User.messages`` и ``User.achievements`` не загружаются
+        (``lazy="raise"``), поэтому обращаться к ним можно только после такой загрузки.
+
+        Args:
+            user_id (str): Внутренний идентификатор пользователя.
+            with_messages (bool): Загрузить всю историю сообщений.
+            with_achievements (bool): Загрузить все ачивки пользователя.
+
+        Returns:
+            User | None: Пользователь или None, если не найден.
+        """
+        stmt = select(User).where(User.id == user_id)
+        if with_messages:
+            stmt = stmt.options(selectinload(User.messages))
+        if with_achievements:
+            stmt = stmt.options(selectinload(User.achievements))
+        result = await self.db.execute(stmt)
+        return result.scalar_one_or_none()
+
     async def ensure_user(self, user_id: str, name: str | None = None) -> User:
         """Thin wrapper around :meth:`get_or_create_user` for backwards compatibility."""
         return await self.get_or_create_user(user_id, name=name)
@@ -91,41 +140,274 @@ class UsersService:
         self.db.add(db_msg)
         await self.db.flush()
         await self.db.refresh(db_msg)
+        is_user_message = message['role'] == "user"
+        await self._increment_message_counters(
+            user_id,
+            user_delta=1 if is_user_message else 0,
+            assistant_delta=1 if message['role'] == "assistant" else 0,
+            activity_date=local_now().date() if is_user_message else None,
+        )
         log.info("Saved message id=%d for user %s", db_msg.id, user_id)
         # TODO: Вызов AchievementsService
         return db_msg
 
-    async def get_recent_messages(self, user_id: str, limit: int = 20) -> List[Message]:
+    async def save_turn(
+        self, user_id: str, user_text: str, assistant_text: str, activity_date: date | None = None
+    ) -> SavedTurn:
         """
-        Получает последние сообщения пользователя из истории.
+        Сохраняет реплику пользователя и ответ AI одним многострочным
+        ``INSERT ... RETURNING`` и в той же транзакции возвращает новое число
+        сообщений пользователя.
+
+        В отличие от двух вызовов :meth:`save_message`, не выполняет
+        ``get_or_create_user`` (пользователь уже аутентифицирован) и не делает
+        ``refresh`` - нужные значения приходят из ``RETURNING``.
 
         Args:
             user_id (str): Внутренний идентификатор пользователя.
-            limit (int, optional): Максимальное количество сообщений. Defaults to 20.
+            user_text (str): Текст сообщения пользователя.
+            assistant_text (str): Текст ответа AI.
+            activity_date (date | None): Локальная дата реплики для серии дней
+                (по умолчанию - сегодня в USER_ACTIVITY_TIMEZONE).
 
         Returns:
-            List[Message]: Список сообщений в хронологическом порядке.
+            SavedTurn: Идентификаторы сохранённых сообщений, счётчик сообщений и серия дней.
         """
-        # Код остается тем же, что и в предыдущей версии
-        log.debug("Getting recent messages for user_id=%s, limit=%d", user_id, limit)
+        log.debug("Saving turn for user_id=%s", user_id)
+        messages_table = MessageModel.__table__
         stmt = (
+            insert(messages_table)
+            .values([
+                {"user_id": user_id, "role": "user", "content": user_text},
+                {"user_id": user_id, "role": "assistant", "content": assistant_text},
+            ])
+            .returning(messages_table.c.id, messages_table.c.role)
+        )
+        result = await self.db.execute(stmt)
+        ids_by_role = {row.role: row.id for row in result}
+        user_message_count, streak_days = await self._increment_message_counters(
+            user_id, user_delta=1, assistant_delta=1, activity_date=activity_date or local_now().date()
+        )
+        log.info(
+            "Saved turn (messages %d, %d) for user %s",
+            ids_by_role["user"], ids_by_role["assistant"], user_id
+        )
+        return SavedTurn(
+            user_message_id=ids_by_role["user"],
+            assistant_message_id=ids_by_role["assistant"],
+            user_message_count=user_message_count,
+            streak_days=streak_days,
+        )
+
+    def _recent_messages_query(self, user_id: str, limit: int):
+        """
+        Запрос последних ``limit`` сообщений пользователя, от новых к старым.
+        Обслуживается индексом ``ix_messages_user_id_created_at_id``.
+        """
+        return (
             select(MessageModel)
             .where(MessageModel.user_id == user_id)
-            .order_by(MessageModel.created_at.asc(), MessageModel.id.asc())
+            .order_by(MessageModel.created_at.desc(), MessageModel.id.desc())
             .limit(limit)
         )
-        result = await self.db.scalars(stmt)
+
+    async def get_recent_messages(self, user_id: str, limit: int = 20) -> List[Message]:
+        """
+        Получает последние сообщения пользователя из истории.
+
+        Если задан кэш контекста, сообщения берутся из него; при промахе
+        самые новые строки читаются по составному индексу
+        (user_id, created_at DESC, id DESC), разворачиваются в памяти
+        и прогревают кэш.
+
+        Args:
+            user_id (str): Внутренний идентификатор пользователя.
+            limit (int, optional): Максимальное количество сообщений. Defaults to 20.
+
+        Returns:
+            List[Message]: Список сообщений в хронологическом порядке.
+        """
+        log.debug("Getting recent messages for user_id=%s, limit=%d", user_id, limit)
+        cache = self.context_cache
+        if cache is not None:
+            cached = await cache.get(user_id, limit)
+            if cached is not None:
+                log.debug("Context cache hit for user %s (%d messages)", user_id, len(cached))
+                return cached
+
+        # Маркер ставится до чтения: append между чтением и prime его сбросит
+        prime_token = await cache.begin_prime(user_id) if cache is not None else None
+        # При включённом кэше читаем столько, сколько он хранит, чтобы прогреть его целиком
+        fetch_limit = max(limit, cache.max_messages) if cache is not None else limit
+        result = await self.db.scalars(self._recent_messages_query(user_id, fetch_limit))
         raw_messages = result.all()
         messages: List[Message] = [
-            Message(role=m.role, content=m.content) for m in raw_messages
+            Message(role=m.role, content=m.content) for m in reversed(raw_messages)
         ]
+        if cache is not None:
+            await cache.prime(user_id, messages, prime_token)
+            messages = messages[-limit:] if limit > 0 else []
         log.debug("Found %d recent messages for user %s", len(messages), user_id)
         return messages
 
-    async def get_user_message_count(self, user_id: str) -> int:
-        """Возвращает количество сообщений пользователя с ролью ``user``."""
-        stmt = select(func.count()).select_from(MessageModel).where(
-            MessageModel.user_id == user_id, MessageModel.role == "user"
+    async def get_conversation_summary(self, user_id: str) -> str | None:
+        """Возвращает накопительное резюме ранней части диалога (или None)."""
+        stmt = select(ConversationSummary.summary).where(ConversationSummary.user_id == user_id)
+        result = await self.db.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_messages_to_summarize(
+        self, user_id: str, after_message_id: int, keep_recent: int, limit: int
+    ) -> List[tuple[int, Message]]:
+        """
+        Возвращает сообщения после высокой отметки ``after_message_id``,
+        которые уже вышли из окна последних ``keep_recent`` сообщений.
+
+        Args:
+            user_id (str): Внутренний идентификатор пользователя.
+            after_message_id (int): Последний уже свёрнутый messages.id.
+            keep_recent (int): Размер окна контекста, которое не сворачивается.
+            limit (int): Максимум сообщений за один проход.
+
+        Returns:
+            List[tuple[int, Message]]: Пары (id, сообщение) в хронологическом порядке.
+        """
+        # Самое старое сообщение окна: всё, что раньше, можно сворачивать
+        window_start_stmt = (
+            select(MessageModel.id)
+            .where(MessageModel.user_id == user_id)
+            .order_by(MessageModel.created_at.desc(), MessageModel.id.desc())
+            .offset(keep_recent - 1)
+            .limit(1)
+        )
+        window_start_id = (await self.db.execute(window_start_stmt)).scalar_one_or_none()
+        if window_start_id is None:
+            return [] # История целиком помещается в окно
+
+        stmt = (
+            select(MessageModel.id, MessageModel.role, MessageModel.content)
+            .where(
+                MessageModel.user_id == user_id,
+                MessageModel.id > after_message_id,
+                MessageModel.id < window_start_id,
+            )
+            .order_by(MessageModel.id.asc())
+            .limit(limit)
+        )
+        rows = (await self.db.execute(stmt)).all()
+        return [(row.id, Message(role=row.role, content=row.content)) for row in rows]
+
+    async def save_conversation_summary(
+        self, user_id: str, summary: str, last_message_id: int, expected_last_message_id: int | None
+    ) -> bool:
+        """
+        Сохраняет новое резюме и сдвигает высокую отметку. Оптимистическая
+        блокировка: обновление применяется, только если отметка всё ещё равна
+        ``expected_last_message_id`` (None - резюме ещё не существовало).
+
+        Returns:
+            bool: True, если резюме сохранено; False при конкурентном обновлении.
+        """
+        if expected_last_message_id is None:
+            self.db.add(ConversationSummary(user_id=user_id, summary=summary, last_message_id=last_message_id))
+            await self.db.flush()
+            return True
+        stmt = (
+            update(ConversationSummary)
+            .where(
+                ConversationSummary.user_id == user_id,
+                ConversationSummary.last_message_id == expected_last_message_id,
+            )
+            .values(summary=summary, last_message_id=last_message_id)
+            .execution_options(synchronize_session=False)
         )
         result = await self.db.execute(stmt)
-        return int(result.scalar_one())
+        return result.rowcount == 1
+
+    async def _increment_message_counters(
+        self, user_id: str, user_delta: int, assistant_delta: int, activity_date: date | None = None
+    ) -> tuple[int, int]:
+        """
+        Атомарно увеличивает счётчики сообщений пользователя одним
+        ``UPDATE ... RETURNING``. Если передан ``activity_date``, в том же
+        запросе продлевается серия дней: даты "сегодня" и "вчера" вычисляются
+        в Python, поэтому выражение одинаково работает в Postgres и SQLite.
+
+        Returns:
+            tuple[int, int]: Новые ``user_message_count`` и ``streak_days``.
+        """
+        values = {
+            "user_message_count": User.user_message_count + user_delta,
+            "assistant_message_count": User.assistant_message_count + assistant_delta,
+        }
+        if activity_date is not None:
+            values["streak_days"] = case(
+                (User.last_active_date == activity_date, User.streak_days),
+                (User.last_active_date == activity_date - timedelta(days=1), User.streak_days + 1),
+                else_=1,
+            )
+            values["last_active_date"] = activity_date
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(**values)
+            .returning(User.user_message_count, User.streak_days)
+        )
+        result = await self.db.execute(stmt)
+        row = result.one_or_none()
+        if row is None:
+            log.warning("Message counters not updated: user %s not found", user_id)
+            return 0, 0
+        return int(row.user_message_count), int(row.streak_days)
+
+    async def get_user_message_count(self, user_id: str) -> int:
+        """
+        Возвращает количество сообщений пользователя с ролью ``user``.
+        Читает денормализованный счётчик по первичному ключу, без ``COUNT(*)``.
+        """
+        stmt = select(User.user_message_count).where(User.id == user_id)
+        result = await self.db.execute(stmt)
+        return int(result.scalar_one_or_none() or 0)
+
+    async def recount_message_counters(
+        self, after_user_id: str | None = None, batch_size: int = 500
+    ) -> str | None:
+        """
+        Пересчитывает счётчики сообщений по таблице ``messages`` для следующей
+        пачки пользователей (keyset-пагинация по ``users.id``).
+        Используется задачей бэкфилла; коммит выполняет вызывающий код.
+
+        Args:
+            after_user_id (str | None): Последний обработанный id из предыдущей пачки.
+            batch_size (int): Размер пачки пользователей.
+
+        Returns:
+            str | None: Последний id обработанной пачки или None, если пользователи закончились.
+        """
+        id_stmt = select(User.id).order_by(User.id).limit(batch_size)
+        if after_user_id is not None:
+            id_stmt = id_stmt.where(User.id > after_user_id)
+        user_ids = list((await self.db.scalars(id_stmt)).all())
+        if not user_ids:
+            return None
+
+        def _count_for(role: str):
+            return (
+                select(func.count())
+                .select_from(MessageModel)
+                .where(MessageModel.user_id == User.id, MessageModel.role == role)
+                .scalar_subquery()
+            )
+
+        stmt = (
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(
+                user_message_count=_count_for("user"),
+                assistant_message_count=_count_for("assistant"),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.execute(stmt)
+        log.info("Recounted message counters for %d users (up to id=%s)", len(user_ids), user_ids[-1])
+        return user_ids[-1]
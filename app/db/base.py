@@ -4,12 +4,15 @@ from __future__ import annotations
 
 import contextlib
 import logging
+import os
+import threading
 from typing import AsyncGenerator
 
 # Импорты SQLAlchemy
 from sqlalchemy import create_engine # Для синхронного движка в тестах
 from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
+    AsyncEngine,
     AsyncSession,
     create_async_engine,
 )
@@ -26,35 +29,120 @@ class Base(DeclarativeBase):
     pass
 
 # --- Engine & Session factory ---
-engine = None
-async_session_factory = None
-
-# --- Инициализация engine и фабрики (как в ответе #18) ---
-# (Этот блок должен быть здесь и работать корректно)
-if settings.ENVIRONMENT == "test":
-    log.info("Using ASYNC SQLite database for tests.")
-    engine = create_async_engine(
-        "sqlite+aiosqlite:///:memory:", echo=False, future=True
-    )
-    async_session_factory = async_sessionmaker(
-        bind=engine, class_=AsyncSession, expire_on_commit=False
-    )
-else:
-    log.info("Using ASYNC PostgreSQL database: %s", settings.DATABASE_URL)
-    if not settings.DATABASE_URL.startswith("postgresql+asyncpg://"):
-        log.warning("DATABASE_URL does not start with 'postgresql+asyncpg://'.")
-        # Лучше выбросить ошибку, чтобы не продолжать с неверной конфигурацией
-        raise ValueError("DATABASE_URL must use 'asyncpg' driver for async operations.")
-
-    engine = create_async_engine(
-        settings.DATABASE_URL, echo=(settings.ENVIRONMENT == "dev"), pool_pre_ping=True, future=True
-    )
-    async_session_factory = async_sessionmaker(
-        bind=engine, class_=AsyncSession, expire_on_commit=False
-    )
-
-if async_session_factory is None: # pragma: no cover
-    raise RuntimeError("Async session factory could not be initialized!")
+class EngineManager:
+    """
+    Жизненный цикл async engine: один engine на процесс, создаётся лениво
+    при первом обращении (а не при импорте модуля).
+
+    Пул соединений не переживает fork: если процесс был форкнут (prefork-пул
+    Celery, gunicorn с --preload), унаследованный пул заменяется новым через
+    ``dispose(close=False)`` - сокеты родителя не закрываются и не
+    используются. Объект engine при этом сохраняется.
+
+    Размер пула берётся из профиля роли процесса (``web`` / ``worker``),
+    см. ``Settings.get_db_pool_options``.
+    """
+
+    def __init__(self, url: str | None = None, role: str | None = None) -> None:
+        """
+        Args:
+            url (str | None): URL БД (по умолчанию - из Settings / тестовый SQLite).
+            role (str | None): Профиль пула: ``web`` или ``worker`` (по умолчанию DB_ROLE).
+        """
+        self.url = url
+        self.role = role or settings.DB_ROLE
+        self._engine: AsyncEngine | None = None
+        self._session_factory: async_sessionmaker[AsyncSession] | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def configure(self, role: str) -> None:
+        """Задаёт профиль пула; действует, только пока engine ещё не создан."""
+        if role == self.role:
+            return
+        if self._engine is not None:
+            log.warning("EngineManager: engine already created with role '%s', ignoring role '%s'", self.role, role)
+            return
+        self.role = role
+
+    def _create_engine(self) -> AsyncEngine:
+        if self.url is None and settings.ENVIRONMENT == "test":
+            log.info("Using ASYNC SQLite database for tests.")
+            return create_async_engine("sqlite+aiosqlite:///:memory:", echo=False, future=True)
+
+        url = self.url or settings.DATABASE_URL
+        log.info("Using ASYNC PostgreSQL database (role=%s)", self.role)
+        if not url.startswith("postgresql+asyncpg://"):
+            log.warning("DATABASE_URL does not start with 'postgresql+asyncpg://'.")
+            # Лучше выбросить ошибку, чтобы не продолжать с неверной конфигурацией
+            raise ValueError("DATABASE_URL must use 'asyncpg' driver for async operations.")
+        return create_async_engine(
+            url,
+            echo=settings.DB_ECHO,
+            pool_pre_ping=True,
+            connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+            future=True,
+            **settings.get_db_pool_options(self.role),
+        )
+
+    def _ensure(self) -> None:
+        with self._lock:
+            pid = os.getpid()
+            if self._engine is None:
+                self._engine = self._create_engine()
+                self._session_factory = async_sessionmaker(
+                    bind=self._engine, class_=AsyncSession, expire_on_commit=False
+                )
+                self._pid = pid
+            elif self._pid != pid:
+                self._reset_pool(pid)
+
+    def _reset_pool(self, pid: int) -> None:
+        self._engine.sync_engine.dispose(close=False)
+        self._pid = pid
+        log.info("EngineManager: connection pool replaced after fork in process %d", pid)
+
+    @property
+    def engine(self) -> AsyncEngine:
+        """Engine текущего процесса."""
+        self._ensure()
+        return self._engine
+
+    @property
+    def session_factory(self) -> async_sessionmaker[AsyncSession]:
+        """Фабрика сессий, привязанная к engine текущего процесса."""
+        self._ensure()
+        return self._session_factory
+
+    def after_fork(self) -> None:
+        """Явный сброс пула в дочернем процессе (хук worker_process_init и т.п.)."""
+        self._lock = threading.Lock()
+        if self._engine is not None:
+            self._reset_pool(os.getpid())
+
+    async def dispose(self) -> None:
+        """Закрывает соединения пула текущего процесса (при остановке)."""
+        if self._engine is not None and self._pid == os.getpid():
+            await self._engine.dispose()
+
+
+# Один менеджер на процесс
+engine_manager = EngineManager()
+
+
+def get_engine() -> AsyncEngine:
+    """Async engine текущего процесса."""
+    return engine_manager.engine
+
+
+def __getattr__(name: str):
+    # Совместимость: ``from app.db.base import engine`` / ``async_session_factory``
+    # создают engine лениво при первом обращении
+    if name == "engine":
+        return engine_manager.engine
+    if name == "async_session_factory":
+        return engine_manager.session_factory
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 # --- Конец инициализации ---
 
 
@@ -66,7 +154,7 @@ async def get_async_db_session() -> AsyncGenerator[AsyncSession, None]:
     session: AsyncSession | None = None
     session_id_for_log = "N/A" # Для логирования в случае ошибки создания
     try:
-        session = async_session_factory()
+        session = engine_manager.session_factory()
         session_id_for_log = id(session) # Получаем ID для логов
         log.debug(">>> get_async_db_session: Session %s created, yielding...", session_id_for_log)
         yield session
@@ -103,7 +191,7 @@ async def get_async_db_session() -> AsyncGenerator[AsyncSession, None]:
 @contextlib.asynccontextmanager
 async def async_session_context() -> AsyncGenerator[AsyncSession, None]:
     # ... (код как в ответе #18, он уже содержит commit/rollback) ...
-    session: AsyncSession = async_session_factory()
+    session: AsyncSession = engine_manager.session_factory()
     log.debug("Entering async session context %s", id(session))
     try:
         yield session
@@ -122,28 +210,31 @@ async def async_session_context() -> AsyncGenerator[AsyncSession, None]:
 async def create_db_and_tables() -> None:
     """Create all tables defined by ``Base``."""
     if settings.ENVIRONMENT == "test":
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
     else:
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
 
 
 async def drop_db_and_tables() -> None:
     """Drop all tables defined by ``Base``."""
     if settings.ENVIRONMENT == "test":
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             await conn.run_sync(Base.metadata.drop_all)
     else:
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             await conn.run_sync(Base.metadata.drop_all)
 
 
 # --- Экспорты ---
+# engine / async_session_factory доступны только через __getattr__ (совместимость),
+# поэтому в __all__ их нет: новый код использует get_engine() / engine_manager
 __all__ = [
     "Base",
-    "engine",
-    "async_session_factory",
+    "EngineManager",
+    "engine_manager",
+    "get_engine",
     "AsyncSession",
     "get_async_db_session",
     "async_session_context",
@@ -1,4 +1,5 @@
 # Импорт моделей для Alembic
-from app.core.users.models import User, Message
-from app.core.achievements.models import Achievement
+from app.core.users.models import User, Message, ConversationSummary
+from app.core.achievements.models import Achievement, AchievementAssetVariant, AchievementBadgeVariant
 from app.core.reminders.models import Reminder
+from app.core.outbox.models import OutboxMessage
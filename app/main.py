@@ -10,6 +10,7 @@ from app.api.v1.calendar import router as calendar_router
 from app.api.v1.achievements_api import router as achievements_router
 from app.api.v1.audio import router as audio_router
 from app.config import settings
+from app.core.llm.event_extractor import shutdown_event_extractor, warm_up_event_extractor
 
 # Configure basic logging. Python 3.8+ requires keyword args for ``basicConfig``
 # to avoid ``TypeError: basicConfig() takes 0 positional arguments``. The call
@@ -50,10 +51,14 @@ log.info("\U0001F331 FastAPI application configured. Environment: %s", settings.
 
 @app.on_event("startup")
 async def startup_event() -> None:
+    if settings.LLM_PROVIDER == "gemini" and settings.EVENT_EXTRACTION_LOCAL_ENABLED:
+        # Процессы dateparser загружают локали до первой реплики
+        warm_up_event_extractor()
     log.info("\U0001F680 FastAPI application startup complete.")
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
+    shutdown_event_extractor()
     log.info("\U0001F44B FastAPI application shutdown.")
 
 @app.get("/healthz", tags=["Health"], status_code=status.HTTP_200_OK)
@@ -0,0 +1,173 @@
+# /app/app/workers/runtime.py
+
+"""
+Asyncio-рантайм для задач Celery.
+
+Celery 5 вызывает задачи синхронно и не ожидает корутины, поэтому задачи
+объявлены обычными функциями и передают асинхронную логику в
+``run_async(...)``. Корутина выполняется в одном долгоживущем event loop,
+который крутится в фоновом потоке процесса воркера:
+
+  • пул соединений async engine, LLMClient и хранилище объектов создаются один раз
+    на процесс и переиспользуются между задачами (asyncio.run на каждую
+    задачу создавал бы новый loop, а соединения asyncpg привязаны к loop);
+  • несколько потоков пула (``--pool threads``) могут одновременно ждать
+    свои корутины в общем loop;
+  • после fork (prefork-пул) ссылки на loop/клиенты родителя сбрасываются, а
+    пул соединений engine заменяется без закрытия родительских сокетов;
+  • при старте воркера engine переключается на профиль пула ``worker``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from app.core.llm.badge_renderer import shutdown_badge_renderer
+from app.core.llm.client import LLMClient
+from app.core.storage import BlobStore, create_blob_store
+from app.db.base import engine_manager
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class WorkerRuntime:
+    """Event loop в фоновом потоке и общие ресурсы одного процесса воркера."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._llm_client: Optional[LLMClient] = None
+        self._blob_store: Optional[BlobStore] = None
+
+    # --- Event loop ---
+    def _start_loop(self) -> None:
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def _run() -> None:
+            asyncio.set_event_loop(loop)
+            ready.set()
+            loop.run_forever()
+
+        thread = threading.Thread(target=_run, name="worker-asyncio-loop", daemon=True)
+        thread.start()
+        ready.wait()
+        self._loop, self._thread, self._pid = loop, thread, os.getpid()
+        log.info("Worker runtime: event loop started in process %d", self._pid)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop рантайма (запускается при первом обращении)."""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._start_loop()
+            return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """
+        Выполняет корутину в event loop рантайма и блокирует вызывающий поток
+        до её завершения.
+
+        Args:
+            coro (Coroutine): Асинхронная логика задачи.
+            timeout (float | None): Максимальное время ожидания в секундах.
+
+        Returns:
+            Результат корутины (исключения пробрасываются как есть).
+
+        Raises:
+            RuntimeError: При вызове из потока самого рантайма (взаимоблокировка).
+        """
+        if self._thread is not None and threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run_async() cannot be called from the runtime event loop thread")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result(timeout)
+
+    # --- Общие ресурсы ---
+    def llm_client(self) -> LLMClient:
+        """LLMClient, общий для всех задач процесса."""
+        if self._llm_client is None:
+            self._llm_client = LLMClient()
+        return self._llm_client
+
+    def blob_store(self) -> Optional[BlobStore]:
+        """
+        Хранилище объектов, общее для всех задач процесса (клиент GCS внутри
+        создаётся один раз), или None, если загрузка отключена либо хранилище
+        не удалось создать (попытка повторится в следующей задаче).
+        """
+        if self._blob_store is None:
+            try:
+                self._blob_store = create_blob_store()
+            except Exception as e_store:
+                log.exception(f"Worker runtime: failed to initialize blob store: {e_store}")
+        return self._blob_store
+
+    # --- Жизненный цикл процесса ---
+    def reset_after_fork(self) -> None:
+        """
+        Вызывается в дочернем процессе после fork. Поток loop родителя в
+        дочернем процессе не существует, а клиенты держат его сокеты - ссылки
+        просто отбрасываются. Пул соединений engine заменяется новым без
+        закрытия унаследованных соединений (их закроет родитель).
+        """
+        self._lock = threading.Lock()
+        self._loop = self._thread = self._pid = None
+        self._llm_client = None
+        self._blob_store = None
+        engine_manager.after_fork()
+        log.info("Worker runtime: reset after fork in process %d", os.getpid())
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Закрывает соединения engine в loop рантайма и останавливает loop."""
+        loop, thread = self._loop, self._thread
+        if loop is None or thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(engine_manager.dispose(), loop).result(timeout)
+        except Exception as e_dispose:
+            log.warning("Worker runtime: engine dispose failed on shutdown: %s", e_dispose)
+        shutdown_badge_renderer()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+        self._loop = self._thread = self._pid = None
+        log.info("Worker runtime: event loop stopped in process %d", os.getpid())
+
+
+# Один рантайм на процесс
+runtime = WorkerRuntime()
+
+
+def run_async(coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """Выполняет корутину в event loop рантайма воркера (см. WorkerRuntime.run)."""
+    return runtime.run(coro, timeout)
+
+
+@worker_init.connect
+def _on_worker_init(**_: Any) -> None:
+    # Воркер держит небольшой пул: параллелизм задаётся числом процессов/потоков
+    engine_manager.configure("worker")
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**_: Any) -> None:
+    runtime.reset_after_fork()
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**_: Any) -> None:
+    runtime.shutdown()
+
+
+__all__ = ["WorkerRuntime", "runtime", "run_async"]
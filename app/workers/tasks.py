@@ -1,9 +1,10 @@
-# /app/app/workers/tasks.py (Дополненная задача ачивок с реальной GCS загрузкой)
+# /app/app/workers/tasks.py (Дополненная задача ачивок с загрузкой иконки в хранилище объектов)
 
 from __future__ import annotations
 
 import asyncio
 import logging
+from datetime import datetime
 import base64
 import tempfile # Может не понадобиться, если работаем с байтами в памяти
 import os
@@ -15,15 +16,26 @@ from celery.exceptions import Ignore
 from celery.utils.log import get_task_logger
 
 from app.config import settings
+from app.core.aio import gather_cancelling
 from app.core.achievements.models import Achievement # Убрали AchievementRule
+from app.core.achievements.service import AchievementsService
+from app.core.achievements.badge_pool import BadgePoolService, in_time_windows, parse_time_windows
+from app.core.achievements.rules import ACHIEVEMENT_RULES
+from app.core.achievements.asset_cache import AchievementAssetCache, CachedAsset, asset_cache_key
+from app.core.llm.badge_renderer import render_badge
 from app.core.llm.client import LLMClient
+from app.workers.runtime import run_async, runtime
+from app.core.outbox.relay import purge_outbox, relay_outbox
+from app.core.outbox.service import OutboxService
+from app.core.users.models import ConversationSummary
+from app.core.users.service import UsersService, local_now
 from app.db.base import async_session_context, AsyncSession
-# --- Клиент GCS и ошибки ---
-from google.cloud import storage
-from google.auth.exceptions import DefaultCredentialsError # Для отлова ошибок инициализации клиента
+from sqlalchemy.exc import IntegrityError
+# --- Хранилище объектов и ошибки GCS ---
+from app.core.storage import BlobStore
 from google.api_core.exceptions import GoogleAPICallError
 # ---------------------------
-from typing import Optional, List, Sequence, Any
+from typing import Optional, List, Sequence, Any, Tuple
 
 log = get_task_logger(__name__)
 
@@ -42,7 +54,99 @@ celery_app.conf.update(
     timezone='UTC',
     broker_connection_retry_on_startup=True,
 )
-# celery_app.conf.beat_schedule = {}
+celery_app.conf.beat_schedule = {
+    # Подбирает строки outbox, которые не опубликовал relay после коммита
+    "relay-outbox": {
+        "task": "app.workers.tasks.relay_outbox_task",
+        "schedule": settings.OUTBOX_RELAY_INTERVAL_SECONDS,
+    },
+    # Пополняет пул готовых вариантов ачивок (работает только в непиковые окна)
+    "refill-badge-pool": {
+        "task": "app.workers.tasks.refill_badge_pool_task",
+        "schedule": settings.ACHIEVEMENT_POOL_REFILL_INTERVAL_SECONDS,
+    },
+}
+
+def _generation_model_version(llm: LLMClient) -> str:
+    """Версия моделей генерации для ключа кэша ассетов (провайдер + модели)."""
+    provider = llm.provider
+    parts = [provider.name, getattr(provider, "model_name", None), getattr(provider, "IMAGEN_MODEL_NAME", None)]
+    return ":".join(str(part) for part in parts if part)
+
+
+# Параметры генерации (как в #89) - они же входят в ключ общего кэша ассетов
+_NAME_STYLE_ID = "default_game_style"
+_NAME_TONE_HINT = "Exciting, Short, Memorable"
+_NAME_STYLE_EXAMPLES = "1. Victory!\n2. Quest Complete!\n3. Legend Born"
+_ICON_STYLE_ID = "flat_badge_icon_v2"
+_ICON_STYLE_KEYWORDS = "minimalist achievement badge, flat design, simple vector art, bold outline"
+_ICON_PALETTE_HINT = "gold, blue, white, black outline"
+_ICON_SHAPE_HINT = "circle"
+
+
+async def _upload_icon(
+    blob_store: Optional[BlobStore], achievement_code: str, icon_png_bytes: Optional[bytes], task_id: str
+) -> Optional[str]:
+    """
+    Загружает иконку в хранилище и возвращает URL. Ошибка загрузки не валит
+    задачу: ачивка завершается без иконки.
+    """
+    if not icon_png_bytes:
+        log.warning(f"[_run_achv_logic {task_id}] No icon bytes were generated. Skipping upload.")
+        return None
+    if blob_store is None:
+        log.warning(f"[_run_achv_logic {task_id}] Icon generated, but blob storage is not configured/initialized. Skipping upload.")
+        return None
+    log.info(f"[_run_achv_logic {task_id}] Uploading icon to '{blob_store.name}' storage...")
+    try:
+        # Ключ - хэш содержимого: иконка общая для всех пользователей с этим вариантом,
+        # уже загруженный объект повторно не отправляется
+        badge_png_url = await blob_store.put_content_addressed(
+            f"badges/achievements/{achievement_code}", icon_png_bytes, "png", content_type="image/png"
+        )
+        log.info(f"[_run_achv_logic {task_id}] Icon uploaded: {badge_png_url}")
+        return badge_png_url
+    except GoogleAPICallError as e_gcs:
+        log.exception(f"[_run_achv_logic {task_id}] GCS API Error during icon upload: {e_gcs}")
+    except Exception as e_upload:
+        log.exception(f"[_run_achv_logic {task_id}] Unexpected error uploading icon: {e_upload}")
+    return None
+
+
+async def _generate_and_upload_icon(
+    llm: LLMClient, blob_store: Optional[BlobStore], achievement_code: str, theme: str, task_id: str
+) -> Tuple[Optional[bytes], Optional[str]]:
+    """Генерирует иконку (Imagen) и сразу загружает её; возвращает байты и URL."""
+    log.info(f"[_run_achv_logic {task_id}] Generating achievement icon...")
+    icon_png_bytes = await llm.generate_achievement_icon(
+        context=theme, style_id=_ICON_STYLE_ID, style_keywords=_ICON_STYLE_KEYWORDS,
+        palette_hint=_ICON_PALETTE_HINT, shape_hint=_ICON_SHAPE_HINT
+    )
+    return icon_png_bytes, await _upload_icon(blob_store, achievement_code, icon_png_bytes, task_id)
+
+
+async def _publish_placeholder_icon(
+    blob_store: Optional[BlobStore], achievement_id: int, achievement_code: str, theme: str, task_id: str
+) -> None:
+    """
+    Рендерит локальный значок и сразу показывает его в ачивке, пока удалённая
+    модель генерирует итоговую иконку. Ошибки не прерывают задачу.
+    """
+    try:
+        placeholder_png = await render_badge(theme, _ICON_PALETTE_HINT, _ICON_SHAPE_HINT)
+        placeholder_url = await _upload_icon(blob_store, achievement_code, placeholder_png, task_id)
+        if not placeholder_url:
+            return
+        async with async_session_context() as session:
+            await session.execute(
+                sa.update(Achievement)
+                .where(Achievement.id == achievement_id, Achievement.status == "PROCESSING")
+                .values(badge_png_url=placeholder_url)
+            )
+        log.info(f"[_run_achv_logic {task_id}] Placeholder icon published: {placeholder_url}")
+    except Exception as e_placeholder:
+        log.warning(f"[_run_achv_logic {task_id}] Failed to publish placeholder icon: {e_placeholder}")
+
 
 # --- Внутренняя асинхронная логика для задачи ---
 async def _run_generate_achievement_logic(
@@ -51,144 +155,123 @@ async def _run_generate_achievement_logic(
     achievement_code: str,
     theme: str | None = "A generic positive achievement"
     ) -> str:
+    """
+    Генерирует название и иконку ачивки.
+
+    Сессия БД не держится во время обращений к моделям: статус PROCESSING
+    (вместе с поиском в кэше ассетов) и итоговый COMPLETED записываются
+    двумя короткими транзакциями. Название и иконка генерируются
+    параллельно, загрузка иконки идёт сразу после её генерации.
+    """
     task_id = task_instance.request.id
     log.info(f">>> [_run_achv_logic START] Task ID: {task_id} for user '{user_id}', code '{achievement_code}', theme: '{theme}'")
-    
-    gcs_client: Optional[storage.Client] = None
+
     achievement_status = "FAILED_PREPARATION"
-    llm = LLMClient() # Инициализируем LLM клиент
+    achievement_id: Optional[int] = None
+    llm = runtime.llm_client() # Общий LLM клиент процесса воркера
+    # Общее хранилище объектов процесса (None, если не настроено)
+    blob_store: Optional[BlobStore] = runtime.blob_store()
+    if blob_store is None:
+        log.warning(f"[_run_achv_logic {task_id}] Blob storage not configured. Icon upload will be skipped.")
+    actual_theme_for_generation = theme or "a significant accomplishment"
+    cache_key: Optional[str] = None
+    if settings.ACHIEVEMENT_ASSET_CACHE_ENABLED:
+        cache_key = asset_cache_key(
+            achievement_code, actual_theme_for_generation, _ICON_STYLE_ID,
+            _ICON_PALETTE_HINT, _ICON_SHAPE_HINT, _generation_model_version(llm),
+        )
 
     try:
-        # Инициализация GCS клиента (если настроен)
-        if settings.GCS_BUCKET_NAME:
-            try:
-                # GOOGLE_APPLICATION_CREDENTIALS должен быть установлен в окружении контейнера
-                gcs_client = storage.Client()
-                log.debug(f"[_run_achv_logic {task_id}] GCS Client initialized for bucket: {settings.GCS_BUCKET_NAME}")
-            except DefaultCredentialsError as e_gcs_auth:
-                log.error(f"[_run_achv_logic {task_id}] GCS Auth Error: {e_gcs_auth}. Ensure GOOGLE_APPLICATION_CREDENTIALS is set and valid.")
-                gcs_client = None # Не сможем загрузить
-            except Exception as e_gcs_init:
-                 log.exception(f"[_run_achv_logic {task_id}] Failed to initialize GCS client: {e_gcs_init}")
-                 gcs_client = None # Не сможем загрузить
-        else:
-            log.warning(f"[_run_achv_logic {task_id}] GCS_BUCKET_NAME not configured. Icon upload will be skipped.")
-
+        # Транзакция 1: статус PROCESSING и поиск готовых ассетов в общем кэше
+        cached: Optional[CachedAsset] = None
         async with async_session_context() as session:
-            log.debug(f"[_run_achv_logic {task_id}] DB Session created.")
-            actual_theme_for_generation = theme or "a significant accomplishment"
-
-            # Получаем/Создаем запись ачивки
             stmt_ach = sa.select(Achievement).where(Achievement.user_id == user_id, Achievement.code == achievement_code)
             achievement = (await session.execute(stmt_ach)).scalar_one_or_none()
 
             if not achievement:
                  log.error(f"[_run_achv_logic {task_id}] Achievement record '{achievement_code}' for user '{user_id}' not found. This should have been created by AchievementsService. Ignoring.")
                  raise Ignore()
-            
+
+            achievement_id = achievement.id
             if achievement.status == "COMPLETED":
                  log.warning(f"[_run_achv_logic {task_id}] Achievement '{achievement_code}' for user '{user_id}' already COMPLETED. Skipping.")
-                 return f"ALREADY_COMPLETED:{achievement.id}"
+                 return f"ALREADY_COMPLETED:{achievement_id}"
 
-            # Устанавливаем статус PROCESSING и коммитим, чтобы было видно, что задача в работе
             achievement.status = "PROCESSING"
             if not achievement.title or achievement.title.startswith("Pending:"): # Если еще не было попытки генерации имени
                 achievement.title = "Generating title..."
-            session.add(achievement)
-            await session.commit()
-            log.info(f"[_run_achv_logic {task_id}] Achievement '{achievement.code}' status set to PROCESSING.")
-
-            # Шаг 1: Генерация Названия
-            log.info(f"[_run_achv_logic {task_id}] Generating achievement title...")
-            # ... (параметры для generate_achievement_name, как в #89) ...
-            name_style_id = "default_game_style"
-            name_tone_hint = "Exciting, Short, Memorable"
-            name_style_examples = "1. Victory!\n2. Quest Complete!\n3. Legend Born"
-            generated_names = await llm.generate_achievement_name(
-                context=actual_theme_for_generation, style_id=name_style_id, tone_hint=name_tone_hint, style_examples=name_style_examples
+            if cache_key is not None:
+                cached = await AchievementAssetCache(session).lookup(cache_key, seed=user_id)
+        log.info(f"[_run_achv_logic {task_id}] Achievement '{achievement_code}' status set to PROCESSING.")
+
+        if cached is not None:
+            # Ассеты из общего кэша, без обращения к Gemini/Imagen
+            log.info(f"[_run_achv_logic {task_id}] Asset cache hit for '{achievement_code}' (variant {cached.variant_index}).")
+            generated_names = cached.title_candidates
+            icon_png_bytes = cached.icon_png
+            badge_png_url = cached.badge_png_url or await _upload_icon(blob_store, achievement_code, icon_png_bytes, task_id)
+        else:
+            # Название и иконка (с загрузкой) - независимые удалённые вызовы, выполняются параллельно
+            log.info(f"[_run_achv_logic {task_id}] Generating achievement title and icon...")
+            steps = [
+                llm.generate_achievement_name(
+                    context=actual_theme_for_generation, style_id=_NAME_STYLE_ID,
+                    tone_hint=_NAME_TONE_HINT, style_examples=_NAME_STYLE_EXAMPLES
+                ),
+                _generate_and_upload_icon(llm, blob_store, achievement_code, actual_theme_for_generation, task_id),
+            ]
+            if settings.ACHIEVEMENT_ICON_PLACEHOLDER_ENABLED and llm.provider.remote_icon_generation:
+                steps.append(_publish_placeholder_icon(
+                    blob_store, achievement_id, achievement_code, actual_theme_for_generation, task_id
+                ))
+            generated_names, (icon_png_bytes, badge_png_url), *_ = await gather_cancelling(*steps)
+
+        achievement_title = generated_names[0] if generated_names else f"{achievement_code.replace('_',' ').title()} Unlocked!"
+        log.info(f"[_run_achv_logic {task_id}] Title: '{achievement_title}'")
+
+        # Транзакция 2: итоговые данные ачивки и новый вариант в общем кэше
+        async with async_session_context() as session:
+            await session.execute(
+                sa.update(Achievement)
+                .where(Achievement.id == achievement_id)
+                .values(title=achievement_title, badge_png_url=badge_png_url, status="COMPLETED", updated_at=func.now())
             )
-            achievement_title = generated_names[0] if generated_names else f"{achievement_code.replace('_',' ').title()} Unlocked!"
-            log.info(f"[_run_achv_logic {task_id}] Title generated: '{achievement_title}'")
-
-            # Шаг 2: Генерация Иконки
-            log.info(f"[_run_achv_logic {task_id}] Generating achievement icon...")
-            # ... (параметры для generate_achievement_icon, как в #89) ...
-            icon_style_id = "flat_badge_icon_v2"
-            icon_style_keywords = "minimalist achievement badge, flat design, simple vector art, bold outline"
-            icon_palette_hint = "gold, blue, white, black outline"
-            icon_shape_hint = "circle"
-            icon_png_bytes: bytes | None = await llm.generate_achievement_icon(
-                context=actual_theme_for_generation, style_id=icon_style_id, style_keywords=icon_style_keywords,
-                palette_hint=icon_palette_hint, shape_hint=icon_shape_hint
-            ) # generate_achievement_icon теперь должен вызывать Imagen
-
-            # Шаг 3: Загрузка Иконки в GCS
-            badge_png_url: str | None = None
-            if icon_png_bytes and gcs_client and settings.GCS_BUCKET_NAME:
-                log.info(f"[_run_achv_logic {task_id}] Uploading icon to GCS bucket '{settings.GCS_BUCKET_NAME}'...")
-                try:
-                    bucket = gcs_client.bucket(settings.GCS_BUCKET_NAME)
-                    # Уникальное имя файла для иконки
-                    blob_name = f"badges/achievements/{user_id}/{achievement_code}_{task_id[:12]}.png"
-                    blob = bucket.blob(blob_name)
-                    
-                    loop = asyncio.get_running_loop()
-                    # Передаем байты напрямую
-                    await loop.run_in_executor(
-                        None, # Default ThreadPoolExecutor
-                        lambda: blob.upload_from_string(icon_png_bytes, content_type='image/png')
-                    )
-                    # Устанавливаем публичный доступ (или используем Signed URL в будущем)
-                    await loop.run_in_executor(None, blob.make_public)
-                    badge_png_url = blob.public_url # Получаем публичный URL
-                    log.info(f"[_run_achv_logic {task_id}] Icon uploaded to GCS: {badge_png_url}")
-                except GoogleAPICallError as e_gcs:
-                    log.exception(f"[_run_achv_logic {task_id}] GCS API Error during icon upload: {e_gcs}")
-                except Exception as e_gcs_other:
-                     log.exception(f"[_run_achv_logic {task_id}] Unexpected error uploading icon to GCS: {e_gcs_other}")
-            elif icon_png_bytes:
-                 log.warning(f"[_run_achv_logic {task_id}] Icon generated, but GCS client or bucket name not configured/initialized. Skipping upload.")
-            elif not icon_png_bytes:
-                log.warning(f"[_run_achv_logic {task_id}] No icon bytes were generated. Skipping GCS upload.")
-
-
-            # Шаг 4: Обновление Записи Achievement в БД
-            log.info(f"[_run_achv_logic {task_id}] Updating achievement record in DB with final data...")
-            achievement.title = achievement_title
-            achievement.badge_png_url = badge_png_url
-            achievement.status = "COMPLETED"
-            achievement.updated_at = func.now() # Используем sqlalchemy.sql.func
-            session.add(achievement)
-            await session.commit() # Финальный коммит
-            log.info(f"[_run_achv_logic {task_id}] Achievement '{achievement_code}' for user '{user_id}' set to COMPLETED.")
-            achievement_status = "COMPLETED"
+            if cache_key is not None and cached is None and generated_names:
+                await AchievementAssetCache(session).store(
+                    cache_key, achievement_code, generated_names, icon_png_bytes, badge_png_url
+                )
+        log.info(f"[_run_achv_logic {task_id}] Achievement '{achievement_code}' for user '{user_id}' set to COMPLETED.")
+        achievement_status = "COMPLETED"
 
     except Ignore:
         achievement_status = "IGNORED"; log.warning(f"[_run_achv_logic {task_id}] Task ignored.")
     except Exception as exc:
         log.exception(f"[_run_achv_logic {task_id}] Unhandled exception in async logic: {exc}")
         achievement_status = "ERROR_IN_LOGIC"
-        # Попытка обновить статус ачивки на FAILED_GENERATION
+        # Попытка обновить статус ачивки на FAILED_GENERATION одним UPDATE
         try:
             async with async_session_context() as error_session:
-                stmt_ach_err = sa.select(Achievement).where(Achievement.user_id == user_id, Achievement.code == achievement_code)
-                ach_to_fail = (await error_session.execute(stmt_ach_err)).scalar_one_or_none()
-                if ach_to_fail and ach_to_fail.status != "COMPLETED": # Не перезаписываем уже успешную
-                    ach_to_fail.status = "FAILED_GENERATION"
-                    ach_to_fail.updated_at = func.now()
-                    error_session.add(ach_to_fail)
-                    await error_session.commit()
-                    log.info(f"Marked achievement {achievement_code} for user {user_id} as FAILED_GENERATION.")
+                result = await error_session.execute(
+                    sa.update(Achievement)
+                    .where(
+                        Achievement.user_id == user_id,
+                        Achievement.code == achievement_code,
+                        Achievement.status != "COMPLETED", # Не перезаписываем уже успешную
+                    )
+                    .values(status="FAILED_GENERATION", updated_at=func.now())
+                )
+            if result.rowcount:
+                log.info(f"Marked achievement {achievement_code} for user {user_id} as FAILED_GENERATION.")
         except Exception as db_err_update:
             log.exception(f"Failed to mark achievement as FAILED_GENERATION after main error: {db_err_update}")
         raise # Перебрасываем исходное исключение для механизма retry Celery
     finally:
         log.debug(f"[_run_achv_logic {task_id}] Async logic finished with status: {achievement_status}")
 
-    return f"{achievement_status}:{achievement.id if 'achievement' in locals() and achievement else 'N/A'}"
+    return f"{achievement_status}:{achievement_id or 'N/A'}"
 
 
-# Основная задача Celery (остается async def)
+# Основная задача Celery: синхронная обёртка, логика выполняется в event loop рантайма
 @celery_app.task(
     name="app.workers.tasks.generate_achievement_task",
     bind=True,
@@ -198,13 +281,252 @@ async def _run_generate_achievement_logic(
     retry_backoff_max=60 * 5, # 5 минут
     retry_jitter=True
 )
-async def generate_achievement_task(
+def generate_achievement_task(
     self,
     user_id: str,
     achievement_code: str, # Код "зашитого" правила
     theme: str | None = "A generic positive achievement" # Тема для генерации
 ) -> str:
-    """Асинхронная Celery задача для генерации ачивки."""
-    return await _run_generate_achievement_logic(self, user_id, achievement_code, theme)
+    """Celery задача для генерации ачивки."""
+    return run_async(_run_generate_achievement_logic(self, user_id, achievement_code, theme))
+
+
+# --- Бэкфилл денормализованных счётчиков сообщений ---
+async def _run_backfill_message_counters_logic(batch_size: int = 500) -> int:
+    """
+    Пересчитывает users.user_message_count / assistant_message_count по таблице
+    messages. Каждая пачка пользователей обрабатывается в отдельной короткой
+    транзакции, чтобы не блокировать таблицу users надолго.
+    Возвращает число обработанных пачек.
+    """
+    batches_done = 0
+    last_user_id: str | None = None
+    while True:
+        async with async_session_context() as session:
+            last_user_id = await UsersService(session).recount_message_counters(
+                after_user_id=last_user_id, batch_size=batch_size
+            )
+        if last_user_id is None:
+            break
+        batches_done += 1
+    log.info(f"[backfill_message_counters] Finished: {batches_done} batches of up to {batch_size} users.")
+    return batches_done
+
+
+@celery_app.task(name="app.workers.tasks.backfill_message_counters_task")
+def backfill_message_counters_task(batch_size: int = 500) -> int:
+    """Celery задача: пересинхронизирует счётчики сообщений всех пользователей."""
+    return run_async(_run_backfill_message_counters_logic(batch_size))
+
+
+# --- Relay transactional outbox ---
+async def _run_relay_outbox_logic() -> int:
+    """Публикует оставшиеся строки outbox и удаляет устаревшие."""
+    published = await relay_outbox()
+    await purge_outbox()
+    return published
+
+
+@celery_app.task(name="app.workers.tasks.relay_outbox_task")
+def relay_outbox_task() -> int:
+    """Celery задача: публикует задачи outbox, не опубликованные после коммита, и чистит таблицу."""
+    return run_async(_run_relay_outbox_logic())
+
+
+# --- Пул заранее сгенерированных вариантов ачивок ---
+async def _generate_pool_batch(
+    llm: LLMClient, blob_store: Optional[BlobStore], code: str, theme: str, count: int
+) -> List[Tuple[List[str], str]]:
+    """
+    Генерирует пачку вариантов кода: один вызов названий и один пакетный
+    вызов иконок. Возвращает пары (кандидаты названий, URL иконки).
+    """
+    titles, icons = await gather_cancelling(
+        llm.generate_achievement_name(
+            context=theme, style_id=_NAME_STYLE_ID, tone_hint=_NAME_TONE_HINT,
+            style_examples=_NAME_STYLE_EXAMPLES,
+        ),
+        llm.generate_achievement_icons(
+            context=theme, style_id=_ICON_STYLE_ID, style_keywords=_ICON_STYLE_KEYWORDS,
+            palette_hint=_ICON_PALETTE_HINT, shape_hint=_ICON_SHAPE_HINT, count=count,
+        ),
+    )
+    urls = await asyncio.gather(*(_upload_icon(blob_store, code, icon, "badge-pool") for icon in icons))
+    titles = list(titles or [])
+    variants: List[Tuple[List[str], str]] = []
+    for url in urls:
+        if not url:
+            continue
+        # Варианты пачки начинают с разных кандидатов названия
+        shift = len(variants) % len(titles) if titles else 0
+        variants.append((titles[shift:] + titles[:shift], url))
+    return variants
+
+
+async def _run_refill_badge_pool_logic(force: bool = False) -> int:
+    """
+    Пополняет пул каждого кода из ACHIEVEMENT_RULES до
+    ACHIEVEMENT_POOL_TARGET_DEPTH. Вне окон ACHIEVEMENT_POOL_REFILL_WINDOWS
+    ничего не делает (если не ``force``). Каждая пачка сохраняется в отдельной
+    короткой транзакции.
+
+    Returns:
+        int: Число добавленных вариантов.
+    """
+    if not settings.ACHIEVEMENT_POOL_ENABLED:
+        return 0
+    windows = parse_time_windows(settings.ACHIEVEMENT_POOL_REFILL_WINDOWS)
+    if not force and not in_time_windows(local_now().time(), windows):
+        log.debug("[refill_badge_pool] Outside of refill windows, skipping.")
+        return 0
+
+    llm = runtime.llm_client()
+    blob_store = runtime.blob_store()
+    model_version = _generation_model_version(llm)
+    target = settings.ACHIEVEMENT_POOL_TARGET_DEPTH
+    batch_size = max(1, settings.ACHIEVEMENT_POOL_BATCH_SIZE)
+    added = 0
+    for code, rule in ACHIEVEMENT_RULES.items():
+        theme = rule["generation_theme"]
+        params_key = asset_cache_key(
+            code, theme, _ICON_STYLE_ID, _ICON_PALETTE_HINT, _ICON_SHAPE_HINT, model_version
+        )
+        async with async_session_context() as session:
+            pool = BadgePoolService(session)
+            await pool.discard_stale(code, params_key)
+            deficit = target - (await pool.depths()).get(code, 0)
+        while deficit > 0:
+            try:
+                variants = await _generate_pool_batch(llm, blob_store, code, theme, min(batch_size, deficit))
+            except Exception as e_batch:
+                log.warning(f"[refill_badge_pool] Generation failed for '{code}': {e_batch}")
+                break
+            if not variants:
+                break
+            async with async_session_context() as session:
+                added += await BadgePoolService(session).add(code, params_key, variants)
+            deficit -= len(variants)
+    log.info(f"[refill_badge_pool] Added {added} variants (target depth {target}).")
+    return added
+
+
+@celery_app.task(name="app.workers.tasks.refill_badge_pool_task")
+def refill_badge_pool_task(force: bool = False) -> int:
+    """Celery задача: пополняет пул готовых вариантов ачивок."""
+    return run_async(_run_refill_badge_pool_logic(force))
+
+
+# --- Фоновая проверка ачивок (ACHIEVEMENTS_EVALUATION_MODE=async) ---
+async def _run_evaluate_achievements_logic(
+    user_id: str,
+    message_text: str,
+    user_message_count: int,
+    streak_days: int = 0,
+    message_time: str | None = None,
+) -> List[str]:
+    """Проверяет правила ачивок для уже закоммиченной реплики в своей транзакции."""
+    async with async_session_context() as session:
+        outbox = OutboxService(session)
+        codes = await AchievementsService(session).check_and_award(
+            user_id=user_id,
+            message_text=message_text,
+            user_message_count=user_message_count,
+            streak_days=streak_days,
+            # Время реплики, а не момент обработки задачи (ISO-строка: JSON-сериализация Celery)
+            message_time=datetime.fromisoformat(message_time) if message_time else None,
+        )
+        relay_needed = outbox.enqueued
+    log.info(f"[evaluate_achievements] User '{user_id}': triggered {codes}")
+    if relay_needed and settings.OUTBOX_RELAY_ON_COMMIT:
+        await relay_outbox() # Задачи генерации записаны в outbox той же транзакцией
+    return codes
+
+
+@celery_app.task(
+    name="app.workers.tasks.evaluate_achievements_task",
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_kwargs={'max_retries': 3},
+    retry_backoff=True,
+)
+def evaluate_achievements_task(
+    self,
+    user_id: str,
+    message_text: str,
+    user_message_count: int,
+    streak_days: int = 0,
+    message_time: str | None = None,
+) -> List[str]:
+    """
+    Celery задача: проверяет ачивки для реплики пользователя вне запроса /chat.
+    Повтор безопасен - уже выданные ачивки повторно не создаются.
+    """
+    return run_async(_run_evaluate_achievements_logic(
+        user_id, message_text, user_message_count, streak_days, message_time
+    ))
+
+
+# --- Накопительное резюме диалога ---
+async def _run_summarize_conversation_logic(
+    user_id: str, keep_recent: int, batch_size: int, max_batches: int = 10
+) -> int:
+    """
+    Сворачивает сообщения, вышедшие из окна контекста, в резюме пользователя.
+    Читает только сообщения после высокой отметки (last_message_id), пачками
+    по ``batch_size``; вызов LLM выполняется без открытой транзакции.
+    Возвращает число свёрнутых сообщений.
+    """
+    llm = runtime.llm_client()
+    folded = 0
+    for _ in range(max_batches):
+        async with async_session_context() as session:
+            summary_row = await session.get(ConversationSummary, user_id)
+            previous_summary = summary_row.summary if summary_row else None
+            high_water_mark = summary_row.last_message_id if summary_row else None
+            batch = await UsersService(session).get_messages_to_summarize(
+                user_id, after_message_id=high_water_mark or 0, keep_recent=keep_recent, limit=batch_size
+            )
+        if not batch:
+            break
+
+        new_summary = await llm.summarize_conversation(previous_summary, [message for _, message in batch])
+
+        try:
+            async with async_session_context() as session:
+                saved = await UsersService(session).save_conversation_summary(
+                    user_id, new_summary, last_message_id=batch[-1][0], expected_last_message_id=high_water_mark
+                )
+        except IntegrityError:
+            saved = False # Параллельная задача успела создать резюме первой
+        if not saved:
+            log.warning(f"[summarize_conversation] Concurrent summary update for user '{user_id}', stopping.")
+            break
+        folded += len(batch)
+
+    log.info(f"[summarize_conversation] Folded {folded} messages into summary for user '{user_id}'.")
+    return folded
+
+
+@celery_app.task(
+    name="app.workers.tasks.summarize_conversation_task",
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_kwargs={'max_retries': 3},
+    retry_backoff=True,
+)
+def summarize_conversation_task(self, user_id: str) -> int:
+    """Celery задача: инкрементально обновляет резюме диалога пользователя."""
+    return run_async(_run_summarize_conversation_logic(
+        user_id,
+        keep_recent=settings.CONVERSATION_SUMMARY_KEEP_RECENT,
+        batch_size=settings.CONVERSATION_SUMMARY_BATCH_SIZE,
+    ))
 
-__all__ = ["celery_app", "generate_achievement_task"]
+__all__ = [
+    "celery_app",
+    "generate_achievement_task",
+    "backfill_message_counters_task",
+    "evaluate_achievements_task",
+    "relay_outbox_task",
+    "summarize_conversation_task",
+]
@@ -0,0 +1,16 @@
+# /app/benchmarks/__init__.py
+
+"""
+Микробенчмарки горячих путей. Запускаются из корня проекта:
+    python -m benchmarks.<module>
+
+Пакет app импортирует настройки при загрузке, поэтому здесь задаются
+значения по умолчанию (как в tests/conftest.py): внешние сервисы не нужны.
+"""
+
+import os
+
+os.environ.setdefault("ENVIRONMENT", "test")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark_secret")
+os.environ.setdefault("CONTEXT_CACHE_ENABLED", "false")
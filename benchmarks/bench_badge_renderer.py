@@ -0,0 +1,61 @@
+# /app/benchmarks/bench_badge_renderer.py
+
+"""
+Пропускная способность локального рендера значков ачивок (512x512 PNG):
+по одному процессу для каждой формы и параллельный рендер в пуле процессов.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_badge_renderer
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+from app.config import settings
+from app.core.llm import badge_renderer
+from app.core.llm.badge_renderer import badge_spec, render_badge, render_badge_png
+
+PALETTE = "gold, blue, white, black outline"
+SHAPES = ("circle", "square", "hexagon", "shield", "octagon")
+THEMES = ("first message", "cat lover", "three days in a row", "night owl", "long conversation")
+RENDERS_PER_SHAPE = 20
+POOL_RENDERS = 200
+
+
+def _single_process() -> None:
+    print(f"{'shape':>8} {'ms/badge':>9} {'badges/s':>9} {'PNG, KB':>8}")
+    for shape in SHAPES:
+        specs = [badge_spec(theme, PALETTE, shape) for theme in THEMES]
+        started = time.perf_counter()
+        for i in range(RENDERS_PER_SHAPE):
+            png = render_badge_png(specs[i % len(specs)])
+        elapsed = (time.perf_counter() - started) / RENDERS_PER_SHAPE
+        print(f"{shape:>8} {elapsed * 1000:>9.1f} {1 / elapsed:>9.0f} {len(png) / 1024:>8.1f}")
+
+
+async def _pool(processes: int) -> float:
+    settings.BADGE_RENDER_PROCESSES = processes
+    try:
+        await render_badge("warmup", PALETTE, "circle") # Запуск процессов пула
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            render_badge(THEMES[i % len(THEMES)], PALETTE, SHAPES[i % len(SHAPES)]) for i in range(POOL_RENDERS)
+        ))
+        return POOL_RENDERS / (time.perf_counter() - started)
+    finally:
+        badge_renderer.shutdown_badge_renderer()
+
+
+def main() -> None:
+    _single_process()
+    print(f"\n{POOL_RENDERS} badges via render_badge():")
+    for processes in sorted({0, 1, 2, os.cpu_count() or 1}):
+        label = "thread" if processes == 0 else f"{processes} proc"
+        print(f"{label:>8} {asyncio.run(_pool(processes)):>9.0f} badges/s")
+
+
+if __name__ == "__main__":
+    main()
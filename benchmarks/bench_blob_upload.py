@@ -0,0 +1,67 @@
+# /app/benchmarks/bench_blob_upload.py
+
+"""
+Пропускная способность загрузки иконок ачивок в LocalBlobStore (без сети):
+последовательная загрузка, параллельная (asyncio.gather с ограничением) и
+повторная загрузка того же содержимого по хэшу (объекты уже есть - пропуск).
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_blob_upload
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+from app.core.storage import LocalBlobStore
+
+ICONS_COUNT = 300
+ICON_SIZE = 256 * 1024 # Байт: порядок размера PNG 512x512
+CONCURRENCY = 8
+
+
+def _make_icons() -> List[bytes]:
+    return [os.urandom(ICON_SIZE) for _ in range(ICONS_COUNT)]
+
+
+async def _sequential(store: LocalBlobStore, icons: List[bytes]) -> None:
+    for icon in icons:
+        await store.put_content_addressed("badges/bench", icon, "png", content_type="image/png")
+
+
+async def _concurrent(store: LocalBlobStore, icons: List[bytes]) -> None:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def upload(icon: bytes) -> None:
+        async with semaphore:
+            await store.put_content_addressed("badges/bench", icon, "png", content_type="image/png")
+
+    await asyncio.gather(*(upload(icon) for icon in icons))
+
+
+async def _measure(label: str, run: Callable[[], Awaitable[None]]) -> None:
+    started = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - started
+    mb = ICONS_COUNT * ICON_SIZE / (1024 * 1024)
+    print(f"{label:<28} {elapsed * 1000:>9.1f} ms {ICONS_COUNT / elapsed:>9.0f} icons/s {mb / elapsed:>8.1f} MB/s")
+
+
+async def main() -> None:
+    icons = _make_icons()
+    print(f"{ICONS_COUNT} icons x {ICON_SIZE // 1024} KB, concurrency {CONCURRENCY}")
+    with tempfile.TemporaryDirectory() as root_a, tempfile.TemporaryDirectory() as root_b:
+        sequential_store = LocalBlobStore(root_a)
+        concurrent_store = LocalBlobStore(root_b)
+        await _measure("sequential upload", lambda: _sequential(sequential_store, icons))
+        await _measure("concurrent upload", lambda: _concurrent(concurrent_store, icons))
+        # Те же иконки: объекты уже есть, загрузка пропускается по хэшу
+        await _measure("re-upload (dedupe skip)", lambda: _concurrent(concurrent_store, icons))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
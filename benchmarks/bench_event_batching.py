@@ -0,0 +1,90 @@
+# /app/benchmarks/bench_event_batching.py
+
+"""
+Микро-батчинг LLMClient.extract_events: поток параллельных запросов чата к
+провайдеру с моделью задержки (фиксированная стоимость round trip + стоимость
+на текст, ограниченное число одновременных вызовов - лимит провайдера).
+Сравниваются вызовы по одному и пачки с разными окнами.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_event_batching
+"""
+
+from __future__ import annotations
+
+import asyncio
+import statistics
+import time
+from typing import List, Sequence
+
+from app.config import settings
+from app.core.llm.client import LLMClient
+from app.core.llm.providers.stub import StubLLMProvider
+
+REQUESTS = 400
+ARRIVAL_INTERVAL = 0.001 # Секунды между запросами (~1000 запросов/с)
+ROUND_TRIP = 0.060 # Фиксированная задержка вызова модели
+PER_TEXT = 0.002 # Добавка за каждый текст пачки
+PROVIDER_CONCURRENCY = 8 # Одновременных вызовов провайдера
+
+CONFIGS = [(0, 1), (2, 16), (5, 16), (5, 32), (10, 64)] # (окно, мс; размер пачки)
+
+
+class SimulatedProvider(StubLLMProvider):
+    """Провайдер с задержкой, зависящей от размера пачки."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self._slots = asyncio.Semaphore(PROVIDER_CONCURRENCY)
+
+    async def _call(self, count: int) -> None:
+        async with self._slots:
+            self.calls += 1
+            await asyncio.sleep(ROUND_TRIP + PER_TEXT * count)
+
+    async def extract_events(self, text: str):
+        await self._call(1)
+        return []
+
+    async def extract_events_batch(self, texts: Sequence[str]):
+        await self._call(len(texts))
+        return [[] for _ in texts]
+
+
+async def _run(window_ms: int, max_size: int) -> None:
+    settings.EVENT_EXTRACTION_BATCH_WINDOW_MS = window_ms
+    settings.EVENT_EXTRACTION_BATCH_MAX_SIZE = max_size
+    provider = SimulatedProvider()
+    latencies: List[float] = []
+
+    async def request(i: int) -> None:
+        await asyncio.sleep(i * ARRIVAL_INTERVAL)
+        client = LLMClient()
+        client.provider = provider # Клиент на запрос, провайдер общий - как в /chat
+        started = time.perf_counter()
+        await client.extract_events(f"message {i}")
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(REQUESTS)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    label = "per-request" if window_ms <= 0 else f"window {window_ms} ms, max {max_size}"
+    print(
+        f"{label:<24} {REQUESTS / elapsed:>8.0f} req/s {provider.calls:>6} calls"
+        f" {statistics.median(latencies) * 1000:>8.1f} ms p50"
+        f" {latencies[int(len(latencies) * 0.95)] * 1000:>8.1f} ms p95"
+    )
+
+
+async def main() -> None:
+    print(
+        f"{REQUESTS} requests every {ARRIVAL_INTERVAL * 1000:.0f} ms; provider: "
+        f"{ROUND_TRIP * 1000:.0f} ms + {PER_TEXT * 1000:.0f} ms/text, {PROVIDER_CONCURRENCY} concurrent calls"
+    )
+    for window_ms, max_size in CONFIGS:
+        await _run(window_ms, max_size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+# /app/benchmarks/bench_event_extractor.py
+
+"""
+Точность и пропускная способность локального извлечения событий
+(app/core/llm/event_extractor.py) на корпусе русских и английских реплик.
+
+Точность: для каждого текста локальный конвейер либо возвращает события
+(верная дата / неверная дата / ложное событие / пропуск), либо отдаёт текст
+LLM как неоднозначный. Пропускная способность: dateparser на каждом тексте,
+префильтр + dateparser в потоке и в пуле процессов.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_event_extractor
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.config import settings
+from app.core.llm import event_extractor
+from app.core.llm.event_extractor import classify_matches, extract_events_hybrid, has_temporal_expression, search_texts
+
+TZ = ZoneInfo("Europe/Moscow")
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=TZ) # Суббота
+LANGUAGES = ("ru", "en")
+THROUGHPUT_REPEAT = 20
+
+
+def _at(month: int, day: int, hour: int = 0, minute: int = 0) -> datetime:
+    return datetime(2026, month, day, hour, minute, tzinfo=TZ)
+
+
+# (текст, ожидаемое начало события или None)
+CORPUS: List[Tuple[str, Optional[datetime]]] = [
+    # --- С событиями ---
+    ("Давай встретимся завтра в 15:00 в кафе", _at(10, 18, 15)),
+    ("Напомни про стоматолога во вторник в 10 утра", _at(10, 20, 10)),
+    ("Концерт 25 декабря, не забудь билеты", _at(12, 25)),
+    ("В пятницу вечером идём в кино", _at(10, 23, 19)),
+    ("Созвон через 2 часа", _at(10, 17, 14)),
+    ("Завтра экзамен по истории", _at(10, 18)),
+    ("Встреча с командой 20.10 в 11:30", _at(10, 20, 11, 30)),
+    ("Послезавтра в 9:00 планёрка", _at(10, 19, 9)),
+    ("День рождения мамы 3 ноября", _at(11, 3)),
+    ("Тренировка в понедельник в 19:00", _at(10, 19, 19)),
+    ("Вебинар 30 октября в 18:00", _at(10, 30, 18)),
+    ("Запись к врачу на 22 октября в 16:15", _at(10, 22, 16, 15)),
+    ("Let's have a call tomorrow at 3pm", _at(10, 18, 15)),
+    ("Meeting on October 25 at 14:30", _at(10, 25, 14, 30)),
+    ("Dentist appointment on Monday at 9am", _at(10, 19, 9)),
+    ("Flight to Berlin on November 2", _at(11, 2)),
+    ("Don't forget the team lunch on Wednesday at 1pm", _at(10, 21, 13)),
+    ("Project deadline is October 30", _at(10, 30)),
+    ("Dinner with Anna tonight at 8pm", _at(10, 17, 20)),
+    ("Yoga class in 3 hours", _at(10, 17, 15)),
+    ("Dentist the day after tomorrow", _at(10, 19)),
+    # --- Без событий ---
+    ("Привет! Как у тебя дела?", None),
+    ("Я сегодня очень устал", None),
+    ("У меня 3 кошки и собака", None),
+    ("Мне нравится эта песня", None),
+    ("Спасибо за поддержку, это много значит", None),
+    ("Я сейчас дома, смотрю сериал", None),
+    ("Вчера было весело", None),
+    ("Погода отличная, пойду гулять", None),
+    ("Читаю книгу про космос", None),
+    ("Что посоветуешь посмотреть?", None),
+    ("Я выучил 20 новых слов", None),
+    ("Какой твой любимый цвет?", None),
+    ("Мы с другом играли в шахматы", None),
+    ("Готовлю ужин, пахнет вкусно", None),
+    ("Hi, how are you doing?", None),
+    ("I have 2 cats and a dog", None),
+    ("This song is amazing", None),
+    ("Thanks for listening to me", None),
+    ("I'm at home right now", None),
+    ("What book should I read next?", None),
+    ("I walked 10000 steps", None),
+    ("My favourite movie is Alien", None),
+    ("The weather is lovely", None),
+    ("I feel a bit sad", None),
+    ("Can you tell me a joke?", None),
+    ("We played chess with my brother", None),
+    ("Cooking pasta, smells great", None),
+    ("Learning Spanish is fun", None),
+    ("Мой кот спит весь день", None),
+    ("Нашёл старые фотографии, приятно вспомнить", None),
+    # --- Без событий: омонимы месяцев/дней недели и отрицания ---
+    ("You may be right", None),
+    ("I may be late", None),
+    ("May I ask you something?", None),
+    ("I was born in March", None),
+    ("The band will march on", None),
+    ("Sat at home all day", None),
+    ("I sat on the sofa and read", None),
+    ("Завтра не смогу", None),
+    ("I can't make it tomorrow", None),
+    ("В мае было тепло", None),
+]
+
+
+def _accuracy() -> None:
+    texts = [text for text, _ in CORPUS]
+    filtered = [text for text in texts if has_temporal_expression(text)]
+    matches = dict(zip(filtered, search_texts(filtered, NOW, LANGUAGES)))
+    counts = {"correct": 0, "wrong date": 0, "false event": 0, "missed": 0, "no event": 0, "to LLM": 0}
+    for text, expected in CORPUS:
+        events = classify_matches(text, matches[text], NOW) if text in matches else []
+        if events is None:
+            counts["to LLM"] += 1
+        elif expected is None:
+            counts["false event" if events else "no event"] += 1
+        elif not events:
+            counts["missed"] += 1
+        else:
+            counts["correct" if events[0]["start"] == expected else "wrong date"] += 1
+    with_events = sum(1 for _, expected in CORPUS if expected is not None)
+    print(f"corpus: {len(CORPUS)} messages, {with_events} with events; prefilter passed {len(filtered)}")
+    for label, count in counts.items():
+        print(f"  {label:<12} {count:>4}")
+    print(f"  LLM calls avoided: {1 - counts['to LLM'] / len(CORPUS):.0%} of messages")
+
+
+def _measure(label: str, run) -> None:
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    total = len(CORPUS) * THROUGHPUT_REPEAT
+    print(f"{label:<34} {elapsed * 1000:>8.1f} ms {total / elapsed:>8.0f} msg/s")
+
+
+async def _pipeline(processes: int) -> None:
+    settings.EVENT_EXTRACTION_PROCESSES = processes
+    texts = [text for text, _ in CORPUS] * THROUGHPUT_REPEAT
+    await extract_events_hybrid(texts[:4], now=NOW) # Прогрев пула/потока
+    started = time.perf_counter()
+    # Пачки по 16 текстов, как у микро-батчера LLMClient
+    await asyncio.gather(*(extract_events_hybrid(texts[i:i + 16], now=NOW) for i in range(0, len(texts), 16)))
+    elapsed = time.perf_counter() - started
+    label = f"pipeline, {processes} processes" if processes else "pipeline, thread"
+    print(f"{label:<34} {elapsed * 1000:>8.1f} ms {len(texts) / elapsed:>8.0f} msg/s")
+    event_extractor.shutdown_event_extractor()
+
+
+def main() -> None:
+    _accuracy()
+    texts = [text for text, _ in CORPUS] * THROUGHPUT_REPEAT
+    search_texts(texts[:4], NOW, LANGUAGES) # Загрузка локалей dateparser
+    print(f"\nthroughput, {len(texts)} messages:")
+    _measure("dateparser on every message", lambda: search_texts(texts, NOW, LANGUAGES))
+    _measure("prefilter + dateparser", lambda: search_texts([t for t in texts if has_temporal_expression(t)], NOW, LANGUAGES))
+    _measure("prefilter only", lambda: [has_temporal_expression(t) for t in texts])
+    for processes in (0, 1, 2):
+        asyncio.run(_pipeline(processes))
+
+
+if __name__ == "__main__":
+    main()
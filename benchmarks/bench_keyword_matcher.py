@@ -0,0 +1,72 @@
+# /app/benchmarks/bench_keyword_matcher.py
+
+"""
+Микробенчмарк поиска ключевых слов ачивок: 1000 правил, сообщения
+разной длины. Сравнивает прежний подход (подстрока для каждого ключевого
+слова каждого правила) с KeywordMatcher.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_keyword_matcher
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+from typing import Dict, List
+
+from app.core.achievements.matcher import KeywordMatcher
+
+RULES_COUNT = 1000
+KEYWORDS_PER_RULE = 8
+MESSAGE_LENGTHS = (40, 300, 2000) # символов: короткая реплика, абзац, длинное сообщение
+
+_ALPHABET = "абвгдежзиклмнопрстуфхцчшыэюя"
+_FILLER = (
+    "привет как дела сегодня была хорошая погода мы гуляли в парке и пили кофе "
+    "вечером смотрели фильм про космос завтра планирую работать над проектом "
+    "hello how are you today we went for a walk and talked about the weekend "
+).split()
+
+
+def _make_rules(rng: random.Random) -> Dict[str, List[str]]:
+    return {
+        f"rule_{i}": ["".join(rng.choice(_ALPHABET) for _ in range(rng.randint(4, 9))) for _ in range(KEYWORDS_PER_RULE)]
+        for i in range(RULES_COUNT)
+    }
+
+
+def _make_message(rng: random.Random, length: int, keywords: List[str]) -> str:
+    words: List[str] = []
+    while sum(len(w) + 1 for w in words) < length:
+        words.append(rng.choice(keywords) if rng.random() < 0.02 else rng.choice(_FILLER))
+    return " ".join(words)
+
+
+def _naive_match(rules: Dict[str, List[str]], text: str) -> set:
+    lowered = text.lower()
+    return {code for code, keywords in rules.items() if any(k in lowered for k in keywords)}
+
+
+def main() -> None:
+    rng = random.Random(42)
+    rules = _make_rules(rng)
+    all_keywords = [k for keywords in rules.values() for k in keywords]
+
+    build_seconds = timeit.timeit(lambda: KeywordMatcher(rules), number=3) / 3
+    matcher = KeywordMatcher(rules)
+    print(f"{RULES_COUNT} rules x {KEYWORDS_PER_RULE} keywords, build: {build_seconds * 1000:.1f} ms")
+    print(f"{'length':>8} {'naive, us':>12} {'matcher, us':>12} {'speedup':>8}")
+
+    for length in MESSAGE_LENGTHS:
+        messages = [_make_message(rng, length, all_keywords) for _ in range(50)]
+        runs = 5
+        naive = timeit.timeit(lambda: [_naive_match(rules, m) for m in messages], number=runs)
+        compiled = timeit.timeit(lambda: [matcher.match(m) for m in messages], number=runs)
+        per_naive = naive / (runs * len(messages)) * 1e6
+        per_compiled = compiled / (runs * len(messages)) * 1e6
+        print(f"{length:>8} {per_naive:>12.1f} {per_compiled:>12.1f} {per_naive / per_compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
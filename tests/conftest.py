@@ -10,6 +10,13 @@ if ROOT_DIR not in sys.path:
 os.environ.setdefault("ENVIRONMENT", "test")
 os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
 os.environ.setdefault("JWT_SECRET_KEY", "test_secret")
+# Redis в тестах нет: кэш контекста проверяется отдельно на fakeredis
+os.environ.setdefault("CONTEXT_CACHE_ENABLED", "false")
+# Outbox публикуется явно в тестах, а не в фоне после каждого коммита
+os.environ.setdefault("OUTBOX_RELAY_ON_COMMIT", "false")
+# Значки stub-провайдера рендерятся в потоке, без пула процессов
+os.environ.setdefault("BADGE_RENDER_PROCESSES", "0")
+os.environ.setdefault("EVENT_EXTRACTION_PROCESSES", "0")
 
 # Load additional fixtures and Celery configuration from the app package
 import app.conftest  # noqa: F401
@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, select, update
+
+from app.core.achievements.models import Achievement
+from app.core.achievements.rules import ACHIEVEMENT_RULES, RuleEngine, TurnContext
+from app.core.achievements.service import AchievementsService
+from app.core.outbox.models import OutboxMessage
+from app.core.users.models import User
+from app.db.base import async_session_context, create_db_and_tables, drop_db_and_tables, engine
+
+
+def _ctx(text=None, count=0, streak=0, at=datetime(2026, 10, 16, 12, 0)):
+    return TurnContext(message_text=text, user_message_count=count, streak_days=streak, local_time=at)
+
+
+def test_engine_evaluates_all_rule_types():
+    engine_ = RuleEngine(ACHIEVEMENT_RULES)
+    assert engine_.evaluate(_ctx(count=1)) == ["first_message_sent"]
+    assert engine_.evaluate(_ctx(text="мой кот", count=50, streak=3, at=datetime(2026, 10, 16, 1, 30))) == [
+        "cat_lover_discovery", "long_convo_starter", "three_day_streak", "night_owl",
+    ]
+    # Счётчики - точные условия: после своего сообщения/дня правило больше не срабатывает
+    assert engine_.evaluate(_ctx(count=2, streak=1)) == []
+    assert engine_.evaluate(_ctx(count=51, streak=4)) == []
+
+
+def test_time_of_day_window_across_midnight():
+    engine_ = RuleEngine({"late": {"trigger": {"time_of_day": ("22:00", "02:00")}}})
+    assert engine_.evaluate(_ctx(at=datetime(2026, 1, 1, 23, 0))) == ["late"]
+    assert engine_.evaluate(_ctx(at=datetime(2026, 1, 1, 1, 59))) == ["late"]
+    assert engine_.evaluate(_ctx(at=datetime(2026, 1, 1, 2, 0))) == []
+
+
+def test_unknown_condition_is_rejected():
+    with pytest.raises(ValueError):
+        RuleEngine({"bad": {"trigger": {"moon_phase": "full"}}})
+
+
+@pytest_asyncio.fixture
+async def db():
+    await create_db_and_tables()
+    async with async_session_context() as session:
+        session.add(User(id="r1"))
+    yield
+    await drop_db_and_tables()
+
+
+async def _queued_codes():
+    async with async_session_context() as session:
+        rows = (await session.scalars(select(OutboxMessage).order_by(OutboxMessage.id))).all()
+    return [row.payload["achievement_code"] for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_check_and_award_batches_queries(db):
+
+    async with async_session_context() as session:
+        session.add(Achievement(user_id="r1", code="cat_lover_discovery", title="x", status="FAILED_GENERATION"))
+        session.add(Achievement(user_id="r1", code="first_message_sent", title="x", status="COMPLETED"))
+
+    statements = []
+
+    def listener(conn, cursor, stmt, *a):
+        statements.append(stmt.split()[0])
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        async with async_session_context() as session:
+            codes = await AchievementsService(session).check_and_award(
+                "r1", message_text="кошки", user_message_count=50, streak_days=3,
+                message_time=datetime(2026, 10, 16, 12, 0),
+            )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+
+    assert codes == ["cat_lover_discovery", "long_convo_starter", "three_day_streak"]
+    assert await _queued_codes() == codes
+    # Один SELECT статусов, один UPSERT для новых и сброшенных, затем для
+    # каждого кода попытка забрать вариант из (пустого) пула и строка outbox
+    assert statements == ["SELECT", "INSERT"] + ["DELETE", "INSERT"] * len(codes)
+
+    async with async_session_context() as session:
+        rows = {a.code: a for a in (await session.scalars(select(Achievement))).all()}
+    assert rows["cat_lover_discovery"].status == "PENDING_GENERATION"
+    assert rows["cat_lover_discovery"].title == "Retrying: Feline Friend"
+    assert rows["long_convo_starter"].title == "Pending: Chatty Companion"
+    assert rows["first_message_sent"].status == "COMPLETED"
+
+
+@pytest.mark.asyncio
+async def test_upsert_pending_is_idempotent_under_race(db, monkeypatch):
+
+    async with async_session_context() as session:
+        session.add(Achievement(user_id="r1", code="first_message_sent", title="x", status="PENDING_GENERATION"))
+
+    # Устаревший снимок статусов: как будто параллельный запрос вставил строку после нашего SELECT
+    async def stale_statuses(self, user_id):
+        return {}
+    monkeypatch.setattr(AchievementsService, "_get_statuses", stale_statuses)
+
+    async with async_session_context() as session:
+        codes = await AchievementsService(session).check_and_award("r1", user_message_count=1,
+                                                                   message_time=datetime(2026, 10, 16, 12, 0))
+    assert codes == []
+    assert await _queued_codes() == []
+
+    async with async_session_context() as session:
+        service = AchievementsService(session)
+        assert await service._upsert_pending("r1", ["long_convo_starter"]) == {"long_convo_starter": 1}
+        assert await service._upsert_pending("r1", ["long_convo_starter"]) == {}
+
+
+@pytest.mark.asyncio
+async def test_generation_dedupe_key_changes_after_failed_reset(db):
+    at = datetime(2026, 10, 16, 12, 0)
+    async with async_session_context() as session:
+        await AchievementsService(session).check_and_award("r1", message_text="кот", message_time=at)
+    async with async_session_context() as session:
+        await session.execute(update(Achievement).values(status="FAILED_GENERATION"))
+    async with async_session_context() as session:
+        await AchievementsService(session).check_and_award("r1", message_text="кот", message_time=at)
+
+    async with async_session_context() as session:
+        keys = (await session.scalars(select(OutboxMessage.dedupe_key).order_by(OutboxMessage.id))).all()
+    assert keys == ["generate_achievement:r1:cat_lover_discovery:1", "generate_achievement:r1:cat_lover_discovery:2"]
@@ -7,7 +7,9 @@ from app.main import app
 from app.db.base import create_db_and_tables, drop_db_and_tables, async_session_context
 from app.core.users.models import User
 from app.core.achievements.models import Achievement
-from app.core.auth.security import get_current_user, oauth2_scheme
+from app.core.outbox.models import OutboxMessage
+from app.core.auth.schemas import TokenData
+from app.core.auth.security import get_current_user, get_token_data, oauth2_scheme
 
 client = TestClient(app)
 
@@ -25,6 +27,7 @@ def override_auth():
         async with async_session_context() as session:
             return await session.get(User, "u1")
     app.dependency_overrides[get_current_user] = fake_user
+    app.dependency_overrides[get_token_data] = lambda: TokenData(user_id="u1")
     app.dependency_overrides[oauth2_scheme] = lambda: "token"
     yield
     app.dependency_overrides.clear()
@@ -39,7 +42,7 @@ async def test_achievements_after_message(monkeypatch):
     from app.core.llm.client import LLMClient
     async def fake_extract(self, txt):
         return [None]
-    async def fake_generate(self, prompt, ctx):
+    async def fake_generate(self, prompt, ctx, **kwargs):
         return "ok"
     monkeypatch.setattr(LLMClient, "extract_events", fake_extract)
     monkeypatch.setattr(LLMClient, "generate", fake_generate)
@@ -56,3 +59,39 @@ async def test_achievements_after_message(monkeypatch):
     async with async_session_context() as session:
         achs = (await session.execute(select(Achievement))).scalars().all()
         assert any(a.code == "first_message_sent" for a in achs)
+
+
+@pytest.mark.asyncio
+async def test_async_evaluation_reports_unlock_on_next_response(monkeypatch):
+    from app.config import settings
+    from app.core.llm.client import LLMClient
+    from app.workers import tasks
+
+    async def fake_extract(self, txt):
+        return []
+
+    async def fake_generate(self, prompt, ctx, **kwargs):
+        return "ok"
+    monkeypatch.setattr(LLMClient, "extract_events", fake_extract)
+    monkeypatch.setattr(LLMClient, "generate", fake_generate)
+    monkeypatch.setattr(settings, "ACHIEVEMENTS_EVALUATION_MODE", "async")
+    # Днём, чтобы не сработало правило по времени суток
+    from datetime import datetime, timezone
+    monkeypatch.setattr("app.api.v1.chat.local_now", lambda: datetime(2026, 10, 16, 12, 0, tzinfo=timezone.utc))
+
+    first = client.post("/v1/chat/", json={"message_text": "hi"})
+    assert first.status_code == 200
+    # Проверка ачивок не выполнялась в запросе - событие реплики записано в outbox
+    assert first.json()["unlocked_achievements"] == []
+    async with async_session_context() as session:
+        queued = (await session.scalars(select(OutboxMessage))).all()
+    assert [row.task_name for row in queued] == ["app.workers.tasks.evaluate_achievements_task"]
+    assert queued[0].payload["user_message_count"] == 1 and queued[0].payload["streak_days"] == 1
+
+    await tasks._run_evaluate_achievements_logic(**queued[0].payload)
+
+    second = client.post("/v1/chat/", json={"message_text": "again"})
+    assert second.json()["unlocked_achievements"] == ["first_message_sent"]
+    # О каждой ачивке сообщается один раз
+    third = client.post("/v1/chat/", json={"message_text": "more"})
+    assert third.json()["unlocked_achievements"] == []
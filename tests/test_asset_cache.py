@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from app.core.achievements.asset_cache import AchievementAssetCache, asset_cache_key
+from app.core.achievements.models import Achievement, AchievementAssetVariant
+from app.core.storage import MemoryBlobStore
+from app.core.users.models import User
+from app.db.base import async_session_context, create_db_and_tables, drop_db_and_tables
+from app.workers import tasks
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def setup_db():
+    await create_db_and_tables()
+    yield
+    await drop_db_and_tables()
+
+
+def test_cache_key_depends_on_generation_parameters():
+    key = asset_cache_key("cat", "theme", "style", "gold", "circle", "gemini:v1")
+    assert key == asset_cache_key("cat", "theme", "style", "gold", "circle", "gemini:v1")
+    assert key != asset_cache_key("cat", "theme", "style", "gold", "circle", "gemini:v2")
+    assert key != asset_cache_key("cat", "theme", "style", "gold", "square", "gemini:v1")
+    assert len(key) == 64
+
+
+@pytest.mark.asyncio
+async def test_lookup_misses_until_k_variants_then_picks_stably():
+    async with async_session_context() as session:
+        cache = AchievementAssetCache(session, variants_per_key=2)
+        assert await cache.lookup("k", seed="u1") is None
+        assert await cache.store("k", "cat", ["A"], b"png-a", "url-a")
+        assert await cache.lookup("k", seed="u1") is None
+        assert await cache.store("k", "cat", ["B"], b"png-b", None)
+
+        picks = {seed: await cache.lookup("k", seed=seed) for seed in ("u1", "u2", "u3", "u4", "u5")}
+        assert {pick.variant_index for pick in picks.values()} <= {0, 1}
+        assert (await cache.lookup("k", seed="u1")).variant_index == picks["u1"].variant_index
+        variant = picks["u1"]
+        assert variant.title_candidates == (["A"] if variant.variant_index == 0 else ["B"])
+
+
+@pytest.mark.asyncio
+async def test_store_evicts_least_recently_used():
+    old = datetime.now(timezone.utc) - timedelta(days=1)
+    async with async_session_context() as session:
+        cache = AchievementAssetCache(session, variants_per_key=1, max_entries=2)
+        await cache.store("k1", "a", ["A"], None, None)
+        await cache.store("k2", "b", ["B"], None, None)
+        for row in (await session.scalars(select(AchievementAssetVariant))).all():
+            row.last_used_at = old
+        await session.flush()
+        # Обращение к k1 обновляет last_used_at - вытесняется k2
+        assert await cache.lookup("k1", seed="u") is not None
+        await cache.store("k3", "c", ["C"], None, None)
+
+    async with async_session_context() as session:
+        keys = (await session.scalars(select(AchievementAssetVariant.cache_key))).all()
+    assert sorted(keys) == ["k1", "k3"]
+
+
+class _CountingLLM:
+    def __init__(self):
+        self.provider = SimpleNamespace(name="fake", model_name="fake-1", remote_icon_generation=False)
+        self.name_calls = 0
+        self.icon_calls = 0
+
+    async def generate_achievement_name(self, **kwargs):
+        self.name_calls += 1
+        return [f"Title {self.name_calls}"]
+
+    async def generate_achievement_icon(self, **kwargs):
+        self.icon_calls += 1
+        return f"png-{self.icon_calls}".encode()
+
+
+@pytest.mark.asyncio
+async def test_worker_reuses_cached_assets_after_k_variants(monkeypatch):
+    monkeypatch.setattr(tasks.settings, "ACHIEVEMENT_ASSET_VARIANTS_PER_KEY", 2)
+    llm = _CountingLLM()
+    monkeypatch.setattr(tasks.runtime, "llm_client", lambda: llm)
+    blob_store = MemoryBlobStore()
+    monkeypatch.setattr(tasks.runtime, "blob_store", lambda: blob_store)
+    users = [f"user{i}" for i in range(6)]
+    async with async_session_context() as session:
+        for user_id in users:
+            session.add(User(id=user_id))
+        await session.flush()
+        for user_id in users:
+            session.add(Achievement(user_id=user_id, code="cat_lover_discovery", status="PENDING_GENERATION"))
+
+    for i, user_id in enumerate(users):
+        task = SimpleNamespace(request=SimpleNamespace(id=f"task-{i}"))
+        result = await tasks._run_generate_achievement_logic(task, user_id, "cat_lover_discovery", "cats")
+        assert result.startswith("COMPLETED:")
+
+    # Сгенерировано только K вариантов, остальные пользователи получили их из кэша
+    assert (llm.name_calls, llm.icon_calls) == (2, 2)
+    async with async_session_context() as session:
+        rows = (await session.execute(select(Achievement.title, Achievement.badge_png_url))).all()
+    assert {row.title for row in rows} == {"Title 1", "Title 2"}
+    # Иконка загружается один раз на вариант, URL берётся из кэша
+    assert len(blob_store.objects) == 2
+    assert {row.badge_png_url for row in rows} == {f"memory://{key}" for key in blob_store.objects}
@@ -0,0 +1,54 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+
+from app.core.auth.security import create_access_token, get_current_user
+from app.core.users.models import User, Message as MessageModel
+from app.core.users.service import UsersService
+from app.db.base import async_session_context, create_db_and_tables, drop_db_and_tables, engine
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def setup_db():
+    await create_db_and_tables()
+    async with async_session_context() as session:
+        session.add(User(id="auth_user"))
+        await session.flush()
+        session.add_all(
+            [MessageModel(user_id="auth_user", role="user", content=f"m{i}") for i in range(50)]
+        )
+    yield
+    await drop_db_and_tables()
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_does_not_query_messages():
+    """Регрессия: аутентификация не должна загружать историю сообщений и ачивки."""
+    statements: list[str] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lower())
+
+    token = create_access_token({"user_id": "auth_user"})
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        user = await get_current_user(token=token)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert user.id == "auth_user"
+    assert any("from users" in s for s in statements)
+    assert not any("messages" in s or "achievements" in s for s in statements)
+    with pytest.raises(InvalidRequestError):
+        _ = user.messages
+
+
+@pytest.mark.asyncio
+async def test_relations_loaded_explicitly():
+    async with async_session_context() as session:
+        user = await UsersService(session).get_user_with_relations(
+            "auth_user", with_messages=True, with_achievements=True
+        )
+    assert len(user.messages) == 50
+    assert user.achievements == []
@@ -0,0 +1,128 @@
+from datetime import datetime, time
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from app.core.achievements.badge_pool import BadgePoolService, in_time_windows, parse_time_windows
+from app.core.achievements.models import Achievement, AchievementBadgeVariant
+from app.core.achievements.rules import ACHIEVEMENT_RULES
+from app.core.achievements.service import AchievementsService
+from app.core.outbox.models import OutboxMessage
+from app.core.storage import MemoryBlobStore
+from app.core.users.models import User
+from app.db.base import async_session_context, create_db_and_tables, drop_db_and_tables
+from app.workers import tasks
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def setup_db():
+    await create_db_and_tables()
+    async with async_session_context() as session:
+        session.add(User(id="u1"))
+    yield
+    await drop_db_and_tables()
+
+
+def test_time_windows_including_wrap_past_midnight():
+    windows = parse_time_windows("01:00-06:00, 23:30-00:30")
+    assert in_time_windows(time(1, 0), windows)
+    assert in_time_windows(time(23, 45), windows)
+    assert in_time_windows(time(0, 15), windows)
+    assert not in_time_windows(time(6, 0), windows)
+    assert not in_time_windows(time(12, 0), windows)
+    assert parse_time_windows("") == []
+    with pytest.raises(ValueError):
+        parse_time_windows("01:00")
+
+
+@pytest.mark.asyncio
+async def test_claim_takes_oldest_variant_once():
+    async with async_session_context() as session:
+        pool = BadgePoolService(session)
+        await pool.add("cat_lover_discovery", "k", [(["A"], "url-a"), (["B"], "url-b")])
+        assert await pool.depths() == {"cat_lover_discovery": 2}
+        first = await pool.claim("cat_lover_discovery")
+        second = await pool.claim("cat_lover_discovery")
+        assert (first.title_candidates, first.badge_png_url) == (["A"], "url-a")
+        assert second.badge_png_url == "url-b"
+        assert await pool.claim("cat_lover_discovery") is None
+        assert await pool.claim("night_owl") is None
+
+
+@pytest.mark.asyncio
+async def test_unlock_completes_from_pool_without_generation():
+    async with async_session_context() as session:
+        await BadgePoolService(session).add("first_message_sent", "k", [(["Hello There"], "url-1")])
+
+    async with async_session_context() as session:
+        codes = await AchievementsService(session).check_and_award(
+            "u1", message_text="hi", user_message_count=1, message_time=datetime(2026, 10, 17, 12, 0),
+        )
+
+    assert codes == ["first_message_sent"]
+    async with async_session_context() as session:
+        achievement = (await session.scalars(select(Achievement))).one()
+        assert (achievement.status, achievement.title, achievement.badge_png_url) == (
+            "COMPLETED", "Hello There", "url-1"
+        )
+        assert (await session.scalars(select(OutboxMessage))).all() == []
+        assert (await session.scalars(select(AchievementBadgeVariant))).all() == []
+
+
+class _BatchLLM:
+    def __init__(self):
+        self.provider = SimpleNamespace(name="fake", model_name="fake-1", remote_icon_generation=False)
+        self.icon_batches = []
+
+    async def generate_achievement_name(self, **kwargs):
+        return ["One", "Two", "Three"]
+
+    async def generate_achievement_icons(self, count, **kwargs):
+        self.icon_batches.append(count)
+        start = sum(self.icon_batches) - count
+        return [f"png-{kwargs['context']}-{start + i}".encode() for i in range(count)]
+
+
+@pytest.fixture
+def refill_env(monkeypatch):
+    monkeypatch.setattr(tasks.settings, "ACHIEVEMENT_POOL_TARGET_DEPTH", 5)
+    monkeypatch.setattr(tasks.settings, "ACHIEVEMENT_POOL_BATCH_SIZE", 2)
+    llm = _BatchLLM()
+    monkeypatch.setattr(tasks.runtime, "llm_client", lambda: llm)
+    blob_store = MemoryBlobStore()
+    monkeypatch.setattr(tasks.runtime, "blob_store", lambda: blob_store)
+    return llm
+
+
+@pytest.mark.asyncio
+async def test_refill_fills_each_code_to_target_depth_in_batches(refill_env):
+    async with async_session_context() as session:
+        await BadgePoolService(session).add("cat_lover_discovery", "stale-key", [(["Old"], "url-old")])
+
+    added = await tasks._run_refill_badge_pool_logic(force=True)
+
+    assert added == 5 * len(ACHIEVEMENT_RULES)
+    # Пачки по 2: 2 + 2 + 1 на каждый код
+    assert refill_env.icon_batches == [2, 2, 1] * len(ACHIEVEMENT_RULES)
+    async with async_session_context() as session:
+        assert await BadgePoolService(session).depths() == {code: 5 for code in ACHIEVEMENT_RULES}
+        rows = (await session.scalars(
+            select(AchievementBadgeVariant).where(AchievementBadgeVariant.code == "cat_lover_discovery")
+        )).all()
+    # Устаревший вариант удалён, названия чередуются между вариантами пачки
+    assert "url-old" not in {row.badge_png_url for row in rows}
+    assert [row.title_candidates[0] for row in rows[:2]] == ["One", "Two"]
+
+    # Полный пул не пополняется повторно
+    assert await tasks._run_refill_badge_pool_logic(force=True) == 0
+
+
+@pytest.mark.asyncio
+async def test_refill_skips_outside_windows(refill_env, monkeypatch):
+    monkeypatch.setattr(tasks.settings, "ACHIEVEMENT_POOL_REFILL_WINDOWS", "01:00-06:00")
+    monkeypatch.setattr(tasks, "local_now", lambda: datetime(2026, 10, 17, 12, 0))
+
+    assert await tasks._run_refill_badge_pool_logic() == 0
+    assert refill_env.icon_batches == []
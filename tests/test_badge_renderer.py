@@ -0,0 +1,84 @@
+import struct
+import zlib
+
+import pytest
+
+from app.core.llm import badge_renderer
+from app.core.llm.badge_renderer import badge_spec, render_badge, render_badge_png
+from app.core.llm.providers.stub import StubLLMProvider
+
+PALETTE = "gold, blue, white, black outline"
+
+
+def _decode_png(png: bytes):
+    """Минимальный декодер PNG рендерера: RGBA 8 бит, фильтр None."""
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, chunks = 8, {}
+    while pos < len(png):
+        length, tag = struct.unpack(">I4s", png[pos:pos + 8])
+        data = png[pos + 8:pos + 8 + length]
+        assert struct.unpack(">I", png[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(tag + data)
+        chunks.setdefault(tag, b"")
+        chunks[tag] += data
+        pos += 12 + length
+    width, height, depth, color_type = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    assert (depth, color_type) == (8, 6)
+    raw = zlib.decompress(chunks[b"IDAT"])
+    stride = width * 4 + 1
+
+    def pixel(x, y):
+        offset = y * stride + 1 + x * 4
+        return tuple(raw[offset:offset + 4])
+
+    return width, height, pixel
+
+
+def test_spec_follows_palette_and_shape_hints():
+    spec = badge_spec("A joyful moment with a cat", PALETTE, "hexagon badge")
+    assert spec.shape == "hexagon"
+    assert spec.emblem == "heart"
+    assert spec.fill == badge_renderer._COLORS["gold"]
+    assert spec.ring == badge_renderer._COLORS["blue"]
+    assert spec.emblem_color == badge_renderer._COLORS["white"]
+    assert spec.outline == badge_renderer._COLORS["black"]
+    # Неизвестные подсказки - значения по умолчанию
+    fallback = badge_spec("", "", "blob")
+    assert fallback.shape == "circle"
+    assert fallback.emblem in badge_renderer._EMBLEMS
+
+
+@pytest.mark.parametrize("shape", ["circle", "square", "hexagon", "shield", "octagon"])
+def test_render_produces_512_rgba_badge(shape):
+    spec = badge_spec("first message", PALETTE, shape)
+    width, height, pixel = _decode_png(render_badge_png(spec))
+    assert (width, height) == (512, 512)
+    assert pixel(0, 0) == (0, 0, 0, 0) # Прозрачный фон
+    assert pixel(256, 256) == spec.emblem_color # Центр звезды
+    assert pixel(256, 256 + 150) == spec.fill # Между эмблемой и кольцом
+    # Вниз от центра: эмблема, заливка, кольцо, обводка, фон
+    column = [pixel(256, y) for y in range(256, 512)]
+    layers = [color for i, color in enumerate(column) if i == 0 or column[i - 1] != color]
+    assert layers == [spec.emblem_color, spec.fill, spec.ring, spec.outline, (0, 0, 0, 0)]
+
+
+def test_render_is_deterministic():
+    spec = badge_spec("night owl", PALETTE, "circle")
+    assert render_badge_png(spec) == render_badge_png(spec)
+
+
+@pytest.mark.asyncio
+async def test_render_badge_in_process_pool(monkeypatch):
+    monkeypatch.setattr(badge_renderer.settings, "BADGE_RENDER_PROCESSES", 1)
+    try:
+        png = await render_badge("three days in a row", PALETTE, "shield")
+    finally:
+        badge_renderer.shutdown_badge_renderer()
+    assert png == render_badge_png(badge_spec("three days in a row", PALETTE, "shield"))
+
+
+@pytest.mark.asyncio
+async def test_stub_provider_renders_local_badge():
+    png = await StubLLMProvider().generate_achievement_icon(
+        context="cats", style_id="s", style_keywords="k", palette_hint=PALETTE, shape_hint="circle"
+    )
+    assert _decode_png(png)[:2] == (512, 512)
@@ -0,0 +1,89 @@
+import io
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core import storage as storage_module
+from app.core.storage import LocalBlobStore, MemoryBlobStore, content_key, create_blob_store
+from app.core.storage.gcs import GCSBlobStore
+
+
+@pytest.fixture(params=["memory", "local"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBlobStore()
+    return LocalBlobStore(str(tmp_path), base_url="https://cdn.example.com/media/")
+
+
+@pytest.mark.asyncio
+async def test_put_get_exists_url(store):
+    assert await store.get("a/b.png") is None
+    assert not await store.exists("a/b.png")
+    url = await store.put("a/b.png", b"data", content_type="image/png")
+    assert url == await store.url("a/b.png")
+    assert await store.exists("a/b.png")
+    assert await store.get("a/b.png") == b"data"
+    # Потоковые данные и перезапись
+    await store.put("a/b.png", io.BytesIO(b"new"))
+    assert await store.get("a/b.png") == b"new"
+
+
+@pytest.mark.asyncio
+async def test_content_addressed_put_skips_existing_object(store, monkeypatch):
+    puts = []
+    original_put = store.put
+
+    async def counting_put(key, data, content_type=None):
+        puts.append(key)
+        return await original_put(key, data, content_type=content_type)
+
+    monkeypatch.setattr(store, "put", counting_put)
+    first = await store.put_content_addressed("badges/cat", b"icon", "png", content_type="image/png")
+    second = await store.put_content_addressed("badges/cat", b"icon", "png", content_type="image/png")
+    assert first == second
+    assert puts == [content_key("badges/cat", b"icon", "png")]
+
+
+@pytest.mark.asyncio
+async def test_local_store_urls_and_key_validation(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    assert (await store.url("x/y.png")).startswith("file://")
+    with pytest.raises(ValueError):
+        await store.put("../escape.png", b"x")
+    cdn = LocalBlobStore(str(tmp_path), base_url="https://cdn.example.com/media/")
+    assert await cdn.url("x/y.png") == "https://cdn.example.com/media/x/y.png"
+
+
+@pytest.mark.asyncio
+async def test_gcs_store_reuses_client_and_streams_large_objects():
+    client = MagicMock()
+    bucket = client.bucket.return_value
+    bucket.blob.return_value.public_url = "https://storage.googleapis.com/b/k"
+    store = GCSBlobStore("b", client=client, chunk_size=256 * 1024)
+
+    await store.put("small.png", b"x" * 10, content_type="image/png")
+    await store.put("large.bin", b"x" * (300 * 1024))
+    await store.put("stream.bin", io.BytesIO(b"x"))
+
+    client.bucket.assert_called_once_with("b")
+    chunk_sizes = [call.kwargs["chunk_size"] for call in bucket.blob.call_args_list]
+    assert chunk_sizes == [None, 256 * 1024, 256 * 1024]
+    assert bucket.blob.return_value.upload_from_file.call_count == 3
+    assert await store.url("a b.png") == "https://storage.googleapis.com/b/a%20b.png"
+
+
+def test_factory_selects_backend(monkeypatch, tmp_path):
+    monkeypatch.setattr(storage_module.settings, "GCS_BUCKET_NAME", None)
+    monkeypatch.setattr(storage_module.settings, "STORAGE_BACKEND", None)
+    assert create_blob_store() is None
+    monkeypatch.setattr(storage_module.settings, "STORAGE_BACKEND", "memory")
+    assert isinstance(create_blob_store(), MemoryBlobStore)
+    monkeypatch.setattr(storage_module.settings, "STORAGE_BACKEND", "local")
+    monkeypatch.setattr(storage_module.settings, "LOCAL_STORAGE_ROOT", str(tmp_path))
+    assert isinstance(create_blob_store(), LocalBlobStore)
+    monkeypatch.setattr(storage_module.settings, "STORAGE_BACKEND", "gcs")
+    with pytest.raises(ValueError):
+        create_blob_store()
+    monkeypatch.setattr(storage_module.settings, "GCS_BUCKET_NAME", "bucket")
+    monkeypatch.setattr(storage_module.settings, "STORAGE_BACKEND", None)
+    assert isinstance(create_blob_store(), GCSBlobStore)
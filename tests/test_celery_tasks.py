@@ -1,7 +1,6 @@
 import pytest
 from app.workers.tasks import generate_achievement_task, celery_app
 from celery import states
-import asyncio
 
 @pytest.fixture(autouse=True)
 def celery_eager(monkeypatch):
@@ -17,6 +16,6 @@ def test_generate_achievement_task_runs(monkeypatch):
         "app.workers.tasks._run_generate_achievement_logic", dummy_logic
     )
     result = generate_achievement_task.delay("u1", "code", "theme")
-    value = asyncio.get_event_loop().run_until_complete(result.result)
+    # Задача синхронная: результат - значение, а не корутина
     assert result.status in (states.SUCCESS,)
-    assert value == "OK"
+    assert result.get() == "OK"
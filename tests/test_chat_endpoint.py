@@ -1,3 +1,6 @@
+import asyncio
+import json
+
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
@@ -7,14 +10,15 @@ from app.core.calendar.base import get_calendar_provider
 from app.core.achievements.service import AchievementsService
 from app.db.base import create_db_and_tables, drop_db_and_tables, async_session_context
 from app.core.users.models import User
-from app.core.auth.security import get_current_user, oauth2_scheme
+from app.core.auth.schemas import TokenData
+from app.core.auth.security import get_current_user, get_token_data, oauth2_scheme
 
 client = TestClient(app)
 
 @pytest.fixture(autouse=True)
 def patch_dependencies(monkeypatch):
     # Мокаем LLMClient.generate и extract_events
-    async def fake_generate(self, prompt, ctx):
+    async def fake_generate(self, prompt, ctx, **kwargs):
         return 'reply text'
     monkeypatch.setattr(LLMClient, 'generate', fake_generate)
     dummy_event = Event(title='Ev', start=__import__('datetime').datetime(2025,1,1,12,0), end=None)
@@ -40,7 +44,11 @@ def patch_dependencies(monkeypatch):
                 await session.commit()
             return u
 
+    async def fake_token_data():
+        return TokenData(user_id=(await fake_user()).id)
+
     app.dependency_overrides[get_current_user] = fake_user
+    app.dependency_overrides[get_token_data] = fake_token_data
     app.dependency_overrides[oauth2_scheme] = lambda: "token"
     yield
     app.dependency_overrides.clear()
@@ -76,3 +84,238 @@ def test_first_message_count(monkeypatch):
 
     client.post('/v1/chat/', json={'user_id': 'u2', 'message_text': 'two'})
     assert recorded[-1] == 2
+
+
+def _parse_sse(body: str) -> list[tuple[str, dict]]:
+    frames = []
+    for raw in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in raw.splitlines())
+        frames.append((lines['event'], json.loads(lines['data'])))
+    return frames
+
+
+def test_chat_stream_flow(monkeypatch):
+    async def fake_stream(self, prompt, ctx, **kwargs):
+        for chunk in ('re', 'ply ', 'text'):
+            yield chunk
+    monkeypatch.setattr(LLMClient, 'generate_stream', fake_stream)
+
+    res = client.post('/v1/chat/stream', json={'message_text': 'hello'})
+    assert res.status_code == 200
+    assert res.headers['content-type'].startswith('text/event-stream')
+
+    frames = _parse_sse(res.text)
+    assert [f[1]['text'] for f in frames if f[0] == 'token'] == ['re', 'ply ', 'text']
+    event, data = frames[-1]
+    assert event == 'done'
+    assert data['reply_text'] == 'reply text'
+    assert data['detected_events'][0]['title'] == 'Ev'
+    assert data['unlocked_achievements'] == []
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_persists_turn(monkeypatch):
+    async def fake_stream(self, prompt, ctx, **kwargs):
+        yield 'streamed'
+    monkeypatch.setattr(LLMClient, 'generate_stream', fake_stream)
+
+    res = client.post('/v1/chat/stream', json={'message_text': 'persist me'})
+    assert res.status_code == 200
+
+    from app.core.users.service import UsersService
+    async with async_session_context() as session:
+        history = await UsersService(session).get_recent_messages('u1', limit=10)
+    assert [(m['role'], m['content']) for m in history] == [
+        ('user', 'persist me'), ('assistant', 'streamed')
+    ]
+
+
+def test_no_db_connection_held_during_llm_call(monkeypatch):
+    from sqlalchemy import event
+    from app.db.base import engine
+    from app.core.auth.security import create_access_token
+
+    checked_out = {'count': 0, 'total': 0}
+    held_during_llm: list[int] = []
+
+    def on_checkout(*_):
+        checked_out['count'] += 1
+        checked_out['total'] += 1
+
+    def on_checkin(*_):
+        checked_out['count'] -= 1
+
+    async def fake_generate(self, prompt, ctx, **kwargs):
+        held_during_llm.append(checked_out['count'])
+        return 'reply text'
+    monkeypatch.setattr(LLMClient, 'generate', fake_generate)
+
+    # Настоящая аутентификация по токену вместо подменённой зависимости
+    app.dependency_overrides.pop(get_current_user, None)
+    app.dependency_overrides.pop(get_token_data, None)
+    app.dependency_overrides.pop(oauth2_scheme, None)
+
+    async def ensure_user():
+        async with async_session_context() as session:
+            session.add(User(id='u-pool'))
+    asyncio.run(ensure_user())
+    token = create_access_token({'user_id': 'u-pool'})
+
+    event.listen(engine.sync_engine, 'checkout', on_checkout)
+    event.listen(engine.sync_engine, 'checkin', on_checkin)
+    try:
+        res = client.post(
+            '/v1/chat/', json={'message_text': 'hello'},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+    finally:
+        event.remove(engine.sync_engine, 'checkout', on_checkout)
+        event.remove(engine.sync_engine, 'checkin', on_checkin)
+
+    assert res.status_code == 200
+    assert checked_out['total'] > 0  # слушатель пула действительно срабатывал
+    assert held_during_llm == [0]
+    assert checked_out['count'] == 0
+
+
+def test_chat_passes_conversation_summary_as_rag_fact(monkeypatch):
+    from app.core.users.models import ConversationSummary
+
+    seen: dict = {}
+
+    async def fake_generate(self, prompt, ctx, rag_facts=None):
+        seen['rag_facts'] = rag_facts
+        return 'reply text'
+
+    monkeypatch.setattr(LLMClient, 'generate', fake_generate)
+
+    async def add_summary():
+        async with async_session_context() as session:
+            session.add(User(id='u1'))
+            session.add(ConversationSummary(user_id='u1', summary='likes cats', last_message_id=0))
+            await session.commit()
+
+    asyncio.run(add_summary())
+
+    res = client.post('/v1/chat/', json={'user_id': 'u1', 'message_text': 'hi'})
+    assert res.status_code == 200
+    assert any('likes cats' in fact for fact in seen['rag_facts'])
+
+
+def _server_timing(res) -> dict[str, float]:
+    stages = {}
+    for part in res.headers['server-timing'].split(', '):
+        name, dur = part.split(';dur=')
+        stages[name] = float(dur) / 1000
+    return stages
+
+
+def test_chat_turn_stages_overlap_and_are_reported(monkeypatch):
+    import datetime as dt
+
+    async def slow_generate(self, prompt, ctx, **kwargs):
+        await asyncio.sleep(0.3)
+        return 'see you tomorrow'
+
+    async def slow_extract(self, txt):
+        await asyncio.sleep(0.2)
+        return [Event(title=f'from {txt}', start=dt.datetime(2026, 10, 18, 10, 0), end=None)]
+
+    monkeypatch.setattr(LLMClient, 'generate', slow_generate)
+    monkeypatch.setattr(LLMClient, 'extract_events', slow_extract)
+
+    res = client.post('/v1/chat/', json={'message_text': 'meet tomorrow?'})
+    assert res.status_code == 200
+    # События из реплики пользователя (спекулятивно) и из ответа
+    assert sorted(e['title'] for e in res.json()['detected_events']) == [
+        'from meet tomorrow?', 'from see you tomorrow'
+    ]
+    stages = _server_timing(res)
+    assert {'context', 'generate', 'extract_user', 'extract_reply', 'persist', 'total'} <= stages.keys()
+    # Извлечение из реплики идёт во время генерации, из ответа - во время сохранения
+    sequential = stages['generate'] + stages['extract_user'] + stages['extract_reply'] + stages['persist']
+    assert stages['total'] < sequential - 0.15
+    assert stages['total'] < stages['generate'] + stages['extract_reply'] + 0.15
+
+
+def test_slow_extraction_is_dropped_after_timeout(monkeypatch):
+    from app.config import settings
+
+    async def stuck_extract(self, txt):
+        await asyncio.sleep(5)
+        return []
+
+    monkeypatch.setattr(LLMClient, 'extract_events', stuck_extract)
+    monkeypatch.setattr(settings, 'CHAT_EXTRACT_TIMEOUT_SECONDS', 0.05)
+
+    res = client.post('/v1/chat/', json={'message_text': 'hello'})
+    assert res.status_code == 200
+    assert res.json()['reply_text'] == 'reply text'
+    assert res.json()['detected_events'] == []
+
+
+def test_generation_timeout_returns_504(monkeypatch):
+    from app.config import settings
+
+    async def stuck_generate(self, prompt, ctx, **kwargs):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(LLMClient, 'generate', stuck_generate)
+    monkeypatch.setattr(settings, 'CHAT_GENERATE_TIMEOUT_SECONDS', 0.05)
+
+    res = client.post('/v1/chat/', json={'message_text': 'hello'})
+    assert res.status_code == 504
+
+
+def test_relay_is_scheduled_only_when_outbox_was_written(monkeypatch):
+    from app.api.v1 import chat as chat_module
+    from app.config import settings
+    from app.core.outbox.service import OutboxService
+
+    scheduled = []
+    monkeypatch.setattr(chat_module, 'schedule_outbox_relay', lambda: scheduled.append(True))
+    monkeypatch.setattr(settings, 'CONVERSATION_SUMMARY_EVERY_N_MESSAGES', 1000)
+
+    assert client.post('/v1/chat/', json={'message_text': 'hello'}).status_code == 200
+    assert scheduled == []
+
+    async def queueing_award(self, user_id, **kw):
+        await OutboxService(self.db).enqueue('app.workers.tasks.generate_achievement_task', {'user_id': user_id})
+        return ['first_message_sent']
+    monkeypatch.setattr(AchievementsService, 'check_and_award', queueing_award)
+
+    assert client.post('/v1/chat/', json={'message_text': 'hello'}).status_code == 200
+    assert scheduled == [True]
+
+
+def test_stream_context_timeout_returns_504(monkeypatch):
+    from app.api.v1 import chat as chat_module
+    from app.config import settings
+
+    async def stuck_context(*args, **kwargs):
+        await asyncio.sleep(5)
+    monkeypatch.setattr(chat_module, '_load_context', stuck_context)
+    monkeypatch.setattr(settings, 'CHAT_CONTEXT_TIMEOUT_SECONDS', 0.05)
+
+    res = client.post('/v1/chat/stream', json={'message_text': 'hello'})
+    assert res.status_code == 504
+
+
+def test_persist_timeout_returns_504_and_error_frame(monkeypatch):
+    from app.api.v1 import chat as chat_module
+    from app.config import settings
+
+    async def stuck_persist(*args, **kwargs):
+        await asyncio.sleep(5)
+
+    async def fake_stream(self, prompt, ctx, **kwargs):
+        yield 'streamed'
+    monkeypatch.setattr(chat_module, '_persist_turn', stuck_persist)
+    monkeypatch.setattr(LLMClient, 'generate_stream', fake_stream)
+    monkeypatch.setattr(settings, 'CHAT_PERSIST_TIMEOUT_SECONDS', 0.05)
+
+    assert client.post('/v1/chat/', json={'message_text': 'hello'}).status_code == 504
+
+    res = client.post('/v1/chat/stream', json={'message_text': 'hello'})
+    assert res.status_code == 200
+    assert _parse_sse(res.text)[-1] == ('error', {'detail': 'The chat turn timed out'})
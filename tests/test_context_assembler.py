@@ -0,0 +1,82 @@
+from app.config import settings
+from app.core.llm.context import ContextAssembler, estimate_tokens, truncate_to_tokens
+from app.core.llm.message import Message
+
+
+def msg(role: str, content: str) -> Message:
+    return Message(role=role, content=content)
+
+
+def test_estimate_tokens_scales_with_length():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hi!") == 2
+    short, long = estimate_tokens("привет"), estimate_tokens("привет " * 100)
+    assert 0 < short and long == short * 100
+
+
+def test_truncate_respects_limit():
+    text = "word " * 200
+    truncated = truncate_to_tokens(text, 50)
+    assert truncated.endswith("…")
+    assert estimate_tokens(truncated) <= 50
+    assert truncate_to_tokens("short text", 50) == "short text"
+
+
+def test_everything_fits_keeps_order():
+    history = [msg("user", "a"), msg("assistant", "b"), msg("user", "c")]
+    assert ContextAssembler(token_budget=100, max_message_tokens=50).assemble(history) == history
+
+
+def test_budget_keeps_newest_and_prefers_user_messages():
+    long_reply = "reply " * 50  # ~100 токенов
+    history = [
+        msg("user", "old question"),
+        msg("assistant", long_reply),
+        msg("user", "middle question"),
+        msg("assistant", long_reply),
+        msg("user", "newest question"),
+    ]
+    assembler = ContextAssembler(token_budget=100, max_message_tokens=500)
+    result = assembler.assemble(history, prompt="now")
+
+    assert [m["content"] for m in result if m["role"] == "user"] == [
+        "old question", "middle question", "newest question"
+    ]
+    assert sum(estimate_tokens(m["content"]) for m in result) + estimate_tokens("now") <= 100
+    # Самый новый ответ ассистента обрезан до остатка бюджета, старый отброшен
+    assistant = [m for m in result if m["role"] == "assistant"]
+    assert len(assistant) == 1 and assistant[0]["content"].endswith("…")
+    assert result.index(assistant[0]) == 2
+
+
+def test_oversized_messages_are_truncated():
+    history = [msg("user", "x" * 4000)]
+    result = ContextAssembler(token_budget=1000, max_message_tokens=100).assemble(history)
+    assert len(result) == 1 and estimate_tokens(result[0]["content"]) <= 100
+    content = result[0]["content"]
+    assert content.endswith("…")
+    prefix = content[:-len(" …")]
+    assert prefix and set(prefix) == {"x"}
+
+
+def test_truncate_cuts_inside_an_overlong_piece():
+    url = "https://example.com/" + "a" * 2000
+    truncated = truncate_to_tokens(url + " and some more text", 50)
+    assert truncated.endswith(" …")
+    assert estimate_tokens(truncated) <= 50
+    prefix = truncated[:-len(" …")]
+    assert url.startswith(prefix) and len(prefix) > len("https://example.com/")
+    # Кириллица без пробелов режется тем же способом
+    assert truncate_to_tokens("я" * 900, 20).startswith("я" * 10)
+
+
+def test_stops_at_first_user_message_that_does_not_fit():
+    history = [msg("user", "old"), msg("user", "w " * 300), msg("user", "new")]
+    result = ContextAssembler(token_budget=50, max_message_tokens=1000).assemble(history)
+    assert [m["content"] for m in result] == ["new"]
+
+
+def test_budget_per_provider_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_CONTEXT_TOKEN_BUDGET", 1234)
+    assert ContextAssembler.for_provider("gemini").token_budget == 1234
+    assert ContextAssembler.for_provider("unknown").token_budget == settings.LLM_CONTEXT_TOKEN_BUDGET
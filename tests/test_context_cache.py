@@ -0,0 +1,161 @@
+import fakeredis
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+
+from app.core.llm.message import Message
+from app.core.users.context_cache import ConversationContextCache
+from app.core.users.models import User
+from app.core.users.service import UsersService
+from app.db.base import async_session_context, create_db_and_tables, drop_db_and_tables, engine
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def make_cache(server, **kwargs) -> ConversationContextCache:
+    """Отдельный экземпляр кэша = отдельный web-узел с общим Redis."""
+    return ConversationContextCache(fakeredis.FakeAsyncRedis(server=server), **kwargs)
+
+
+def msg(role: str, content: str) -> Message:
+    return Message(role=role, content=content)
+
+
+async def prime(cache: ConversationContextCache, user_id: str, messages) -> None:
+    await cache.prime(user_id, messages, await cache.begin_prime(user_id))
+
+
+@pytest.mark.asyncio
+async def test_miss_prime_and_append_trims(redis_server):
+    cache = make_cache(redis_server, max_messages=3)
+    assert await cache.get("u1", 3) is None
+
+    await prime(cache, "u1", [msg("user", "a"), msg("assistant", "b")])
+    assert [m["content"] for m in await cache.get("u1", 3)] == ["a", "b"]
+
+    await cache.append("u1", [msg("user", "c"), msg("assistant", "d")])
+    assert [m["content"] for m in await cache.get("u1", 3)] == ["b", "c", "d"]
+    assert [m["content"] for m in await cache.get("u1", 1)] == ["d"]
+    # Больше, чем хранит кэш, - промах
+    assert await cache.get("u1", 4) is None
+
+
+@pytest.mark.asyncio
+async def test_empty_history_is_a_hit_after_prime(redis_server):
+    cache = make_cache(redis_server)
+    await prime(cache, "new_user", [])
+    assert await cache.get("new_user", 20) == []
+
+
+@pytest.mark.asyncio
+async def test_append_without_prime_is_noop(redis_server):
+    cache = make_cache(redis_server)
+    await cache.append("cold", [msg("user", "x")])
+    assert await cache.get("cold", 20) is None
+
+
+@pytest.mark.asyncio
+async def test_local_lru_stays_consistent_across_nodes(redis_server):
+    node_a = make_cache(redis_server, local_lru_size=10)
+    node_b = make_cache(redis_server, local_lru_size=10)
+
+    await prime(node_a, "u1", [msg("user", "hello")])
+    assert [m["content"] for m in await node_b.get("u1", 20)] == ["hello"]  # в LRU узла B
+
+    await node_a.append("u1", [msg("assistant", "hi there")])
+    assert [m["content"] for m in await node_b.get("u1", 20)] == ["hello", "hi there"]
+
+    await node_a.invalidate("u1")
+    assert await node_b.get("u1", 20) is None
+
+
+@pytest.mark.asyncio
+async def test_local_lru_evicts_oldest(redis_server):
+    cache = make_cache(redis_server, local_lru_size=2)
+    for uid in ("a", "b", "c"):
+        await prime(cache, uid, [msg("user", uid)])
+        await cache.get(uid, 1)
+    assert list(cache._local) == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_fall_back_to_miss():
+    class BrokenRedis(fakeredis.FakeAsyncRedis):
+        async def get(self, *args, **kwargs):
+            from redis.exceptions import ConnectionError
+            raise ConnectionError("down")
+    cache = ConversationContextCache(BrokenRedis(), local_lru_size=5)
+    assert await cache.get("u1", 5) is None
+
+
+@pytest.mark.asyncio
+async def test_prime_is_refused_when_a_turn_was_appended_during_the_db_read(redis_server):
+    node_a = make_cache(redis_server)
+    node_b = make_cache(redis_server)
+    # Запрос A: промах, маркер, чтение истории из БД
+    token = await node_a.begin_prime("u1")
+    history_read_by_a = [msg("user", "q1"), msg("assistant", "a1")]
+    # Запрос B коммитит реплику; кэш ещё не прогрет
+    await node_b.append("u1", [msg("user", "q2"), msg("assistant", "a2")])
+    # A прогревает кэш устаревшей историей - запись отклоняется
+    await node_a.prime("u1", history_read_by_a, token)
+    assert await node_a.get("u1", 20) is None
+
+    # Следующий промах читает БД уже с репликой B
+    await prime(node_a, "u1", history_read_by_a + [msg("user", "q2"), msg("assistant", "a2")])
+    assert [m["content"] for m in await node_b.get("u1", 20)] == ["q1", "a1", "q2", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_only_the_latest_prime_marker_wins(redis_server):
+    cache = make_cache(redis_server)
+    first = await cache.begin_prime("u1")
+    second = await cache.begin_prime("u1")
+    await cache.prime("u1", [msg("user", "old")], first)
+    assert await cache.get("u1", 20) is None
+    await cache.prime("u1", [msg("user", "new")], second)
+    assert [m["content"] for m in await cache.get("u1", 20)] == ["new"]
+
+
+# --- Интеграция с UsersService ---
+@pytest_asyncio.fixture
+async def db():
+    await create_db_and_tables()
+    yield
+    await drop_db_and_tables()
+
+
+@pytest.mark.asyncio
+async def test_users_service_reads_history_from_cache(db, redis_server):
+    cache = make_cache(redis_server, max_messages=10)
+    async with async_session_context() as session:
+        session.add(User(id="cached_user"))
+        await session.flush()
+        await UsersService(session).save_turn("cached_user", "q1", "a1")
+
+    # Промах: чтение из БД прогревает кэш
+    async with async_session_context() as session:
+        first = await UsersService(session, context_cache=cache).get_recent_messages("cached_user", limit=5)
+    assert [m["content"] for m in first] == ["q1", "a1"]
+
+    # Следующая реплика дописывается в кэш после коммита
+    async with async_session_context() as session:
+        await UsersService(session).save_turn("cached_user", "q2", "a2")
+    await cache.append("cached_user", [msg("user", "q2"), msg("assistant", "a2")])
+
+    statements: list[str] = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with async_session_context() as session:
+            second = await UsersService(session, context_cache=cache).get_recent_messages("cached_user", limit=3)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert [m["content"] for m in second] == ["a1", "q2", "a2"]
+    assert not any("messages" in s for s in statements)
@@ -0,0 +1,125 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.core.llm import event_extractor
+from app.core.llm.event_extractor import classify_matches, extract_events_hybrid, has_temporal_expression
+
+# Суббота, 17 октября 2026, полдень
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=ZoneInfo("Europe/Moscow"))
+
+
+def _at(*args):
+    return datetime(*args, tzinfo=NOW.tzinfo)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Давай встретимся завтра в 15:00", True),
+    ("Meeting on October 25", True),
+    ("во вторник", True),
+    ("call me in 2 hours", True),
+    ("Привет, как дела?", False),
+    ("У меня 3 кошки и собака", False),
+    ("I love cats", False),
+])
+def test_prefilter(text, expected):
+    assert has_temporal_expression(text) is expected
+
+
+def test_confident_match_becomes_event():
+    events = classify_matches("Стоматолог завтра в 15:00.", [("завтра в 15:00", _at(2026, 10, 18, 15, 0))], NOW)
+    assert events == [{"title": "Стоматолог", "start": _at(2026, 10, 18, 15, 0), "end": None}]
+
+
+def test_date_without_time_is_all_day_event():
+    # dateparser подставляет текущее время - событие переносится на начало дня
+    events = classify_matches("Завтра экзамен", [("Завтра", _at(2026, 10, 18, 12, 0))], NOW)
+    assert events == [{"title": "Экзамен", "start": _at(2026, 10, 18, 0, 0), "end": None}]
+
+
+def test_noise_matches_are_not_events():
+    # «сейчас» - текущий момент, прошлое - не событие, голое число - не дата
+    assert classify_matches("Я сейчас дома", [("сейчас", NOW)], NOW) == []
+    assert classify_matches("Вчера было весело", [("Вчера", _at(2026, 10, 16, 12, 0))], NOW) == []
+    assert classify_matches("осталось 5", [("5", _at(2026, 11, 5, 0, 0))], NOW) == []
+    # Модальное «may», глагол «sat»: обычные слова, а не даты
+    assert classify_matches("You may be right", [("may", _at(2027, 5, 17, 0, 0))], NOW) == []
+    assert classify_matches("I may be late", [("may", _at(2027, 5, 14, 0, 0))], NOW) == []
+    assert classify_matches("I sat down", [("sat", _at(2026, 10, 24, 0, 0))], NOW) == []
+    assert not has_temporal_expression("You may be right")
+    assert not has_temporal_expression("The band will march on")
+
+
+@pytest.mark.parametrize("text, matches", [
+    # Месяц или сокращённый день недели без числа
+    ("Sat at home all day", [("Sat at", _at(2026, 10, 24, 0, 0))]),
+    ("I was born in March", [("in March", _at(2027, 3, 17, 0, 0))]),
+    ("May I ask something?", [("May", _at(2027, 5, 17, 0, 0))]),
+    # Отрицание: «не смогу» - не событие «Не смогу»
+    ("Завтра не смогу", [("Завтра", _at(2026, 10, 18, 12, 0))]),
+    # dateparser понял «day after tomorrow» как «tomorrow»
+    ("day after tomorrow dentist", [("day after tomorrow", _at(2026, 10, 18, 12, 0))]),
+    # Префильтр нашёл выражение шире фрагмента
+    ("dentist the day after tomorrow", [("tomorrow", _at(2026, 10, 18, 12, 0))]),
+    # Сокращённый день недели не совпал с датой
+    ("Dentist on Sat at 10am", [("on Sat at 10am", _at(2027, 10, 17, 0, 0))]),
+])
+def test_homonyms_and_negations_are_not_confident_events(text, matches):
+    assert classify_matches(text, matches, NOW) is None
+
+
+def test_reminder_phrasing_is_not_a_negation():
+    events = classify_matches(
+        "Концерт 25 декабря, не забудь билеты", [("25 декабря", _at(2026, 12, 25, 0, 0))], NOW
+    )
+    assert [e["start"] for e in events] == [_at(2026, 12, 25, 0, 0)]
+
+
+@pytest.mark.parametrize("text, matches", [
+    # Разобранный день недели не совпал с названным
+    ("во вторник в 10 утра", [("во вторник в 10", _at(2027, 10, 17, 0, 0))]),
+    # «вечером» осталось за пределами разобранного фрагмента
+    ("в пятницу вечером кино", [("в пятницу", _at(2026, 10, 23, 0, 0))]),
+    # Несколько разных дат
+    ("в 10:00 или в 12:00", [("в 10:00", _at(2026, 10, 17, 22, 0)), ("в 12:00", _at(2026, 10, 18, 12, 0))]),
+    # Фрагмент начинается внутри даты «20.10»
+    ("Встреча 20.10 в 11:30", [("10 в 11:30", _at(2027, 10, 17, 11, 30))]),
+    # Явное время, которое dateparser не разобрал
+    ("встреча 25.13 в переговорке", []),
+])
+def test_ambiguous_matches_go_to_llm(text, matches):
+    assert classify_matches(text, matches, NOW) is None
+
+
+@pytest.mark.asyncio
+async def test_hybrid_pipeline_calls_llm_only_for_ambiguous_texts():
+    texts = [
+        "Привет! Как настроение?",
+        "Напоминаю: завтра в 15:00 стоматолог.",
+        "В пятницу вечером идём в кино",
+        "Meeting on October 25 at 14:30",
+    ]
+    sent_to_llm = []
+
+    async def llm_fallback(batch):
+        sent_to_llm.append(batch)
+        return [[{"title": "Кино", "start": _at(2026, 10, 23, 19, 0), "end": None}] for _ in batch]
+
+    results = await extract_events_hybrid(texts, llm_fallback=llm_fallback, now=NOW)
+
+    assert results[0] == []
+    assert [(e["title"], e["start"]) for e in results[1]] == [("Напоминаю: стоматолог", _at(2026, 10, 18, 15, 0))]
+    assert [e["title"] for e in results[2]] == ["Кино"]
+    assert [(e["title"], e["start"]) for e in results[3]] == [("Meeting", _at(2026, 10, 25, 14, 30))]
+    assert sent_to_llm == [["В пятницу вечером идём в кино"]]
+
+
+@pytest.mark.asyncio
+async def test_hybrid_pipeline_in_process_pool(monkeypatch):
+    monkeypatch.setattr(event_extractor.settings, "EVENT_EXTRACTION_PROCESSES", 1)
+    try:
+        results = await extract_events_hybrid(["Let's have a call tomorrow at 3pm"], now=NOW)
+    finally:
+        event_extractor.shutdown_event_extractor()
+    assert [(e["title"], e["start"]) for e in results[0]] == [("Let's have a call", _at(2026, 10, 18, 15, 0))]
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from app.core.achievements.models import Achievement
+from app.core.llm import client as llm_client_module
+from app.core.llm.client import LLMClient
+from app.core.llm.providers.stub import StubLLMProvider
+from app.core.storage import MemoryBlobStore
+from app.core.users.models import User
+from app.db.base import async_session_context, create_db_and_tables, drop_db_and_tables
+from app.workers import tasks
+
+NAME_LATENCY = 0.3
+ICON_LATENCY = 0.4
+
+
+class LatencyStubProvider(StubLLMProvider):
+    """Stub-провайдер с искусственной задержкой генерации названия и иконки."""
+
+    def __init__(self, name_latency=NAME_LATENCY, icon_latency=ICON_LATENCY, icon_error=None):
+        self.name_latency = name_latency
+        self.icon_latency = icon_latency
+        self.icon_error = icon_error
+        self.name_cancelled = False
+
+    async def generate_achievement_name(self, **kwargs):
+        try:
+            await asyncio.sleep(self.name_latency)
+        except asyncio.CancelledError:
+            self.name_cancelled = True
+            raise
+        return await super().generate_achievement_name(**kwargs)
+
+    async def generate_achievement_icon(self, **kwargs):
+        await asyncio.sleep(self.icon_latency)
+        if self.icon_error:
+            raise self.icon_error
+        return b"png-bytes"
+
+
+@pytest_asyncio.fixture
+async def pending_achievement(monkeypatch):
+    await create_db_and_tables()
+    monkeypatch.setattr(tasks.settings, "ACHIEVEMENT_ASSET_CACHE_ENABLED", False)
+    async with async_session_context() as session:
+        session.add(User(id="u1"))
+        await session.flush()
+        session.add(Achievement(user_id="u1", code="cat_lover_discovery", status="PENDING_GENERATION"))
+    yield
+    await drop_db_and_tables()
+
+
+def _use_provider(monkeypatch, provider):
+    monkeypatch.setattr(llm_client_module, "get_llm_provider", lambda: provider)
+    llm = LLMClient()
+    monkeypatch.setattr(tasks.runtime, "llm_client", lambda: llm)
+    blob_store = MemoryBlobStore()
+    monkeypatch.setattr(tasks.runtime, "blob_store", lambda: blob_store)
+    return blob_store
+
+
+async def _run():
+    task = SimpleNamespace(request=SimpleNamespace(id="task-1"))
+    return await tasks._run_generate_achievement_logic(task, "u1", "cat_lover_discovery", "cats")
+
+
+async def _achievement():
+    async with async_session_context() as session:
+        return (await session.scalars(select(Achievement))).one()
+
+
+@pytest.mark.asyncio
+async def test_title_and_icon_are_generated_concurrently(pending_achievement, monkeypatch):
+    blob_store = _use_provider(monkeypatch, LatencyStubProvider())
+
+    started = time.perf_counter()
+    result = await _run()
+    elapsed = time.perf_counter() - started
+
+    assert result.startswith("COMPLETED:")
+    # Время близко к самому медленному вызову, а не к их сумме
+    assert ICON_LATENCY <= elapsed < ICON_LATENCY + NAME_LATENCY / 2
+    achievement = await _achievement()
+    assert achievement.status == "COMPLETED"
+    assert achievement.title == "Stub Name One"
+    assert achievement.badge_png_url == f"memory://{next(iter(blob_store.objects))}"
+
+
+@pytest.mark.asyncio
+async def test_icon_failure_cancels_title_and_marks_failed(pending_achievement, monkeypatch):
+    # Без окна пачки: запрос названия успевает уйти к провайдеру
+    monkeypatch.setattr(tasks.settings, "ACHIEVEMENT_NAME_BATCH_WINDOW_MS", 0)
+    provider = LatencyStubProvider(name_latency=5, icon_latency=0.01, icon_error=RuntimeError("imagen down"))
+    _use_provider(monkeypatch, provider)
+
+    with pytest.raises(RuntimeError, match="imagen down"):
+        await _run()
+
+    assert provider.name_cancelled
+    assert (await _achievement()).status == "FAILED_GENERATION"
+
+
+class RemoteIconProvider(LatencyStubProvider):
+    """Провайдер с «удалённой» генерацией иконки: воркер публикует заглушку."""
+    remote_icon_generation = True
+
+    def __init__(self):
+        super().__init__(name_latency=0.01, icon_latency=0.2)
+        self.seen_while_pending = None
+
+    async def generate_achievement_icon(self, **kwargs):
+        icon = await super().generate_achievement_icon(**kwargs)
+        self.seen_while_pending = await _achievement()
+        return icon
+
+
+@pytest.mark.asyncio
+async def test_placeholder_badge_is_shown_while_remote_icon_is_pending(pending_achievement, monkeypatch):
+    provider = RemoteIconProvider()
+    blob_store = _use_provider(monkeypatch, provider)
+
+    assert (await _run()).startswith("COMPLETED:")
+
+    pending = provider.seen_while_pending
+    assert pending.status == "PROCESSING"
+    assert pending.badge_png_url and pending.badge_png_url.startswith("memory://")
+    # Итоговая иконка заменяет заглушку; загружены обе
+    final = await _achievement()
+    assert final.badge_png_url != pending.badge_png_url
+    assert len(blob_store.objects) == 2
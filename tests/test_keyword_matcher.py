@@ -0,0 +1,34 @@
+import pytest
+
+from app.core.achievements.matcher import KeywordMatcher
+
+
+@pytest.fixture
+def matcher():
+    return KeywordMatcher({
+        "cat_lover_discovery": ["кот", "кошка", "котенок", "cat"],
+        "black_cat": ["black cat"],
+        "night_owl": ["сова"],
+    })
+
+
+@pytest.mark.parametrize("text", ["У меня есть кот", "Два кота и кошки", "Мой котик спит", "I love cats", "КОТЁНОК"])
+def test_matches_word_forms(matcher, text):
+    assert matcher.match(text) == {"cat_lover_discovery"}
+
+
+@pytest.mark.parametrize("text", ["Который час?", "Котлета на ужин", "category theory", "Скотина", ""])
+def test_respects_word_boundaries(matcher, text):
+    assert matcher.match(text) == set()
+
+
+def test_reports_every_rule_in_one_pass(matcher):
+    assert matcher.match("A black   cat, а ещё сову видел") == {"cat_lover_discovery", "black_cat", "night_owl"}
+
+
+def test_from_rules_skips_rules_without_keywords():
+    matcher = KeywordMatcher.from_rules({
+        "first_message_sent": {"trigger": {"min_user_messages": 1}},
+        "cat_lover_discovery": {"trigger": {"keywords": ["кот"]}},
+    })
+    assert matcher.codes == {"cat_lover_discovery"}
@@ -0,0 +1,204 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.llm import client as llm_client_module
+from app.core.llm.batching import MicroBatcher
+from app.core.llm.client import LLMClient
+from app.core.llm.providers.gemini import GeminiLLMProvider
+from app.core.llm.providers.stub import StubLLMProvider
+
+
+class _RecordingHandler:
+    def __init__(self, delay=0.0, error=None):
+        self.batches = []
+        self.delay = delay
+        self.error = error
+        self.cancelled = False
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return [item * 10 for item in items]
+
+
+@pytest.mark.asyncio
+async def test_requests_within_window_share_one_batch():
+    handler = _RecordingHandler()
+    batcher = MicroBatcher(handler, max_batch_size=10, max_wait=0.02)
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(4)))
+
+    assert results == [0, 10, 20, 30]
+    assert handler.batches == [[0, 1, 2, 3]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_dispatched_without_waiting():
+    handler = _RecordingHandler()
+    batcher = MicroBatcher(handler, max_batch_size=2, max_wait=10)
+
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(4))), 1)
+
+    assert results == [0, 10, 20, 30]
+    assert handler.batches == [[0, 1], [2, 3]]
+
+
+@pytest.mark.asyncio
+async def test_handler_error_reaches_every_request():
+    batcher = MicroBatcher(_RecordingHandler(error=RuntimeError("llm down")), max_batch_size=5, max_wait=0)
+
+    results = await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    assert [str(result) for result in results] == ["llm down"] * 3
+
+
+@pytest.mark.asyncio
+async def test_batch_is_cancelled_when_all_requests_are_cancelled():
+    handler = _RecordingHandler(delay=5)
+    batcher = MicroBatcher(handler, max_batch_size=1, max_wait=0)
+
+    request = asyncio.ensure_future(batcher.submit(1))
+    await asyncio.sleep(0.01)
+    request.cancel()
+    await batcher.drain()
+
+    assert handler.cancelled
+
+
+class _CountingStub(StubLLMProvider):
+    def __init__(self):
+        self.single_calls = 0
+        self.batches = []
+
+    async def generate_achievement_name(self, **kwargs):
+        self.single_calls += 1
+        return [f"{kwargs['context']} name"]
+
+    async def generate_achievement_names(self, requests):
+        self.batches.append(len(requests))
+        return [[f"{request['context']} batched"] for request in requests]
+
+
+@pytest.mark.asyncio
+async def test_client_micro_batches_concurrent_name_requests(monkeypatch):
+    monkeypatch.setattr(llm_client_module.settings, "ACHIEVEMENT_NAME_BATCH_WINDOW_MS", 20)
+    provider = _CountingStub()
+    monkeypatch.setattr(llm_client_module, "get_llm_provider", lambda: provider)
+    client = LLMClient()
+
+    names = await asyncio.gather(*(
+        client.generate_achievement_name(context=f"c{i}", style_id="s", tone_hint="t", style_examples="e")
+        for i in range(3)
+    ))
+    assert names == [["c0 batched"], ["c1 batched"], ["c2 batched"]]
+    assert provider.batches == [3]
+
+    # Одиночный запрос в окне идёт обычным вызовом
+    assert await client.generate_achievement_name(context="solo", style_id="s", tone_hint="t", style_examples="e") == ["solo name"]
+    assert provider.single_calls == 1
+
+
+def _gemini(reply_text):
+    provider = object.__new__(GeminiLLMProvider)
+    provider.safety_settings = []
+    provider.prompts = []
+
+    async def generate_content_async(contents, **kwargs):
+        provider.prompts.append(contents[-1]["parts"][0]["text"])
+        part = SimpleNamespace(text=reply_text)
+        return SimpleNamespace(
+            prompt_feedback=None, candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))]
+        )
+
+    provider.model = SimpleNamespace(generate_content_async=generate_content_async)
+    return provider
+
+
+def test_parse_batched_names_tolerates_noise():
+    text = 'Here you go:\n```json\n[{"id": 1, "names": ["B1", "B2", "B3", "B4"]}, {"id": 0, "names": ["A1", " A1 ", ""]}, {"id": 7, "names": ["X"]}]\n```'
+    assert GeminiLLMProvider._parse_batched_names(text, 3) == [
+        ["A1", "Generated Name 2", "Generated Name 3"], ["B1", "B2", "B3"], None
+    ]
+    assert GeminiLLMProvider._parse_batched_names('{"results": [["A", "B", "C"]]}', 1) == [["A", "B", "C"]]
+    assert GeminiLLMProvider._parse_batched_names("1. Victory!", 2) == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_gemini_batch_uses_one_prompt_and_retries_missing_items(monkeypatch):
+    provider = _gemini(json.dumps([{"id": 0, "names": ["Cat Whisperer", "Purrfect", "Feline Fan"]}]))
+    retried = []
+
+    async def single(**kwargs):
+        retried.append(kwargs["context"])
+        return ["Single 1", "Single 2", "Single 3"]
+
+    monkeypatch.setattr(provider, "generate_achievement_name", single)
+    requests = [
+        dict(context=context, style_id="s", tone_hint="t", style_examples="e") for context in ("cats", "owls")
+    ]
+
+    results = await provider.generate_achievement_names(requests)
+
+    assert results == [["Cat Whisperer", "Purrfect", "Feline Fan"], ["Single 1", "Single 2", "Single 3"]]
+    assert len(provider.prompts) == 1 and '"owls"' in provider.prompts[0]
+    assert retried == ["owls"]
+
+
+class _EventStub(StubLLMProvider):
+    def __init__(self):
+        self.batches = []
+
+    async def extract_events_batch(self, texts):
+        self.batches.append(list(texts))
+        return [[{"title": text, "start": None, "end": None}] for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_extract_events_batched_across_clients(monkeypatch):
+    monkeypatch.setattr(llm_client_module.settings, "EVENT_EXTRACTION_BATCH_WINDOW_MS", 20)
+    provider = _EventStub()
+    monkeypatch.setattr(llm_client_module, "get_llm_provider", lambda: provider)
+
+    # LLMClient создаётся на каждый запрос - пачка общая для провайдера
+    events = await asyncio.gather(*(LLMClient().extract_events(f"text {i}") for i in range(3)))
+
+    assert [item[0]["title"] for item in events] == ["text 0", "text 1", "text 2"]
+    assert provider.batches == [["text 0", "text 1", "text 2"]]
+
+
+@pytest.mark.asyncio
+async def test_gemini_batched_event_extraction(monkeypatch):
+    monkeypatch.setattr(llm_client_module.settings, "EVENT_EXTRACTION_LOCAL_ENABLED", False)
+    monkeypatch.setattr(llm_client_module.settings, "EVENT_EXTRACTION_LLM_ENABLED", True)
+    reply = json.dumps([
+        {"id": 1, "events": [
+            {"title": "Стоматолог", "start": "2026-10-20T15:00:00+03:00", "end": None},
+            {"title": "broken", "start": "next week"},
+        ]},
+        {"id": 0, "events": []},
+    ])
+    provider = _gemini(reply)
+
+    results = await provider.extract_events_batch(["Привет!", "Во вторник в 15:00 стоматолог"])
+
+    assert results[0] == []
+    assert [event["title"] for event in results[1]] == ["Стоматолог"]
+    assert results[1][0]["start"].isoformat() == "2026-10-20T15:00:00+03:00"
+    assert len(provider.prompts) == 1
+
+
+@pytest.mark.asyncio
+async def test_gemini_event_extraction_is_local_by_default():
+    provider = _gemini("[]")
+    events = await provider.extract_events("Завтра в 10:00 встреча")
+    assert [event["title"] for event in events] == ["Встреча"]
+    assert provider.prompts == []
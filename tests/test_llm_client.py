@@ -23,3 +23,9 @@ async def test_extract_events_iso():
     text = '2025-05-01: Test'
     events = await client.extract_events(text)
     assert isinstance(events, list)
+
+@pytest.mark.asyncio
+async def test_generate_stream_matches_generate():
+    client = LLMClient()
+    chunks = [c async for c in client.generate_stream('hi', [Message(role='user', content='hello')])]
+    assert ''.join(chunks) == await client.generate('hi', [])
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, update
+
+from app.config import settings
+
+from app.core.outbox.models import OutboxMessage
+from app.core.outbox.relay import purge_outbox, relay_outbox
+from app.core.outbox.service import OutboxService
+from app.db.base import async_session_context, create_db_and_tables, drop_db_and_tables
+from app.workers.tasks import celery_app
+
+TASK = "app.workers.tasks.summarize_conversation_task"
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def setup_db():
+    await create_db_and_tables()
+    yield
+    await drop_db_and_tables()
+
+
+async def _rows():
+    async with async_session_context() as session:
+        return (await session.scalars(select(OutboxMessage).order_by(OutboxMessage.id))).all()
+
+
+@pytest.mark.asyncio
+async def test_enqueue_ignores_duplicate_dedupe_key():
+    async with async_session_context() as session:
+        outbox = OutboxService(session)
+        await outbox.enqueue(TASK, {"user_id": "u1"}, dedupe_key="k1")
+        await outbox.enqueue(TASK, {"user_id": "u1"}, dedupe_key="k1")
+        generated = await outbox.enqueue(TASK, {"user_id": "u2"})
+    rows = await _rows()
+    assert [row.dedupe_key for row in rows] == ["k1", generated]
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_in_batches_with_dedupe_key_as_task_id(monkeypatch):
+    published = []
+    monkeypatch.setattr(
+        celery_app.tasks[TASK], "apply_async", lambda kwargs, task_id: published.append((task_id, kwargs))
+    )
+    async with async_session_context() as session:
+        outbox = OutboxService(session)
+        for i in range(5):
+            await outbox.enqueue(TASK, {"user_id": f"u{i}"}, dedupe_key=f"k{i}")
+
+    assert await relay_outbox(batch_size=2) == 5
+    assert published == [(f"k{i}", {"user_id": f"u{i}"}) for i in range(5)]
+    assert all(row.published_at is not None for row in await _rows())
+    # Опубликованные строки повторно не отправляются
+    assert await relay_outbox(batch_size=2) == 0
+
+
+@pytest.mark.asyncio
+async def test_relay_keeps_rows_when_broker_fails(monkeypatch):
+    calls = []
+
+    def flaky_apply_async(kwargs, task_id):
+        calls.append(task_id)
+        if task_id == "k1":
+            raise ConnectionError("broker down")
+
+    monkeypatch.setattr(celery_app.tasks[TASK], "apply_async", flaky_apply_async)
+    async with async_session_context() as session:
+        outbox = OutboxService(session)
+        for i in range(3):
+            await outbox.enqueue(TASK, {"user_id": f"u{i}"}, dedupe_key=f"k{i}")
+
+    assert await relay_outbox() == 1
+    rows = await _rows()
+    assert [row.published_at is not None for row in rows] == [True, False, False]
+    # Ошибка брокера не вина строки - попытка не засчитывается
+    assert [row.attempts for row in rows] == [1, 0, 0]
+
+    # Следующий проход доставляет оставшееся (at-least-once)
+    monkeypatch.setattr(celery_app.tasks[TASK], "apply_async", lambda kwargs, task_id: calls.append(task_id))
+    assert await relay_outbox() == 2
+    assert calls == ["k0", "k1", "k1", "k2"]
+
+
+@pytest.mark.asyncio
+async def test_relay_skips_unpublishable_row_and_dead_letters_it(monkeypatch):
+    published = []
+    monkeypatch.setattr(
+        celery_app.tasks[TASK], "apply_async", lambda kwargs, task_id: published.append(task_id)
+    )
+    monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 2)
+    async with async_session_context() as session:
+        outbox = OutboxService(session)
+        await outbox.enqueue("app.workers.tasks.no_such_task", {"user_id": "u0"}, dedupe_key="bad")
+        for i in range(1, 4):
+            await outbox.enqueue(TASK, {"user_id": f"u{i}"}, dedupe_key=f"k{i}")
+
+    # Незарегистрированная задача не блокирует строки после неё
+    assert await relay_outbox(batch_size=2) == 3
+    assert published == ["k1", "k2", "k3"]
+    bad = (await _rows())[0]
+    assert (bad.published_at, bad.attempts) == (None, 1)
+
+    assert await relay_outbox() == 0
+    assert (await _rows())[0].attempts == 2
+    # Достигнут OUTBOX_MAX_ATTEMPTS: строка больше не выбирается
+    assert await relay_outbox() == 0
+    assert (await _rows())[0].attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_purge_outbox_deletes_old_published_and_dead_letter_rows(monkeypatch):
+    monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 3)
+    old = datetime.now(timezone.utc) - timedelta(hours=settings.OUTBOX_RETENTION_HOURS + 1)
+    async with async_session_context() as session:
+        outbox = OutboxService(session)
+        for key in ("old-published", "recent-published", "pending", "old-dead", "failing"):
+            await outbox.enqueue(TASK, {"user_id": "u1"}, dedupe_key=key)
+    async with async_session_context() as session:
+        rows = {row.dedupe_key: row.id for row in await session.scalars(select(OutboxMessage))}
+        await session.execute(update(OutboxMessage).values(created_at=old))
+        await session.execute(
+            update(OutboxMessage).where(OutboxMessage.id == rows["old-published"]).values(published_at=old)
+        )
+        await session.execute(
+            update(OutboxMessage).where(OutboxMessage.id == rows["recent-published"])
+            .values(published_at=datetime.now(timezone.utc))
+        )
+        await session.execute(update(OutboxMessage).where(OutboxMessage.id == rows["old-dead"]).values(attempts=3))
+        await session.execute(update(OutboxMessage).where(OutboxMessage.id == rows["failing"]).values(attempts=2))
+
+    assert await purge_outbox() == 2
+    assert [row.dedupe_key for row in await _rows()] == ["recent-published", "pending", "failing"]
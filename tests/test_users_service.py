@@ -112,3 +112,160 @@ async def test_get_recent_messages(db_session: AsyncSession):
     assert messages[1]['content'] == "Second"
     assert messages[2]['role'] == "user"
     assert messages[2]['content'] == "Third"
+
+@pytest.mark.asyncio
+async def test_save_turn(db_session: AsyncSession):
+    """Тест: save_turn сохраняет обе реплики одной вставкой и возвращает счётчик."""
+    service = UsersService(db_session)
+    user_id = "turn_user"
+    db_session.add(User(id=user_id))
+    await db_session.flush()
+
+    first = await service.save_turn(user_id, "Hi", "Hello!")
+    second = await service.save_turn(user_id, "How are you?", "Great")
+    await db_session.commit()
+
+    assert first.user_message_count == 1
+    assert second.user_message_count == 2
+    assert first.user_message_id < first.assistant_message_id < second.user_message_id
+
+    messages = await service.get_recent_messages(user_id, limit=10)
+    assert [(m['role'], m['content']) for m in messages] == [
+        ("user", "Hi"), ("assistant", "Hello!"),
+        ("user", "How are you?"), ("assistant", "Great"),
+    ]
+
+@pytest.mark.asyncio
+async def test_message_counters_maintained_on_insert(db_session: AsyncSession):
+    """Тест: счётчики сообщений обновляются при save_message и save_turn."""
+    service = UsersService(db_session)
+    user_id = "counter_user"
+
+    await service.save_message(user_id, Message(role="user", content="one"))
+    await service.save_turn(user_id, "two", "reply")
+    await db_session.commit()
+
+    assert await service.get_user_message_count(user_id) == 2
+    async with async_session_context() as verify_session:
+        user = await verify_session.get(User, user_id)
+        assert user.user_message_count == 2
+        assert user.assistant_message_count == 1
+
+@pytest.mark.asyncio
+async def test_backfill_message_counters():
+    """Тест: бэкфилл пересчитывает счётчики по существующей истории."""
+    from app.workers.tasks import _run_backfill_message_counters_logic
+
+    async with async_session_context() as session:
+        session.add_all([User(id="bf_a"), User(id="bf_b"), User(id="bf_c")])
+        await session.flush()
+        session.add_all(
+            [MessageModel(user_id="bf_a", role="user", content=f"m{i}") for i in range(3)]
+            + [MessageModel(user_id="bf_a", role="assistant", content="r")]
+            + [MessageModel(user_id="bf_c", role="user", content="x")]
+        )
+
+    batches = await _run_backfill_message_counters_logic(batch_size=2)
+    assert batches == 2
+
+    async with async_session_context() as session:
+        service = UsersService(session)
+        assert await service.get_user_message_count("bf_a") == 3
+        assert await service.get_user_message_count("bf_b") == 0
+        assert await service.get_user_message_count("bf_c") == 1
+        assert (await session.get(User, "bf_a")).assistant_message_count == 1
+
+@pytest.mark.asyncio
+async def test_get_recent_messages_returns_newest(db_session: AsyncSession):
+    """Тест: при limit меньше истории возвращаются самые новые сообщения по порядку."""
+    service = UsersService(db_session)
+    user_id = "long_history_user"
+    db_session.add(User(id=user_id))
+    await db_session.flush()
+    for i in range(5):
+        await service.save_turn(user_id, f"q{i}", f"a{i}")
+    await db_session.commit()
+
+    messages = await service.get_recent_messages(user_id, limit=3)
+
+    assert [m['content'] for m in messages] == ["a3", "q4", "a4"]
+
+@pytest.mark.asyncio
+async def test_recent_messages_query_uses_index_without_sort(db_session: AsyncSession):
+    """Тест: план запроса последних сообщений - сканирование индекса без сортировки."""
+    from sqlalchemy import insert, text
+
+    user_ids = [f"explain_user_{n}" for n in range(5)]
+    db_session.add_all([User(id=uid) for uid in user_ids])
+    await db_session.flush()
+    rows = [
+        {"user_id": uid, "role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+        for uid in user_ids
+        for i in range(2000)
+    ]
+    await db_session.execute(insert(MessageModel.__table__), rows)
+    await db_session.commit()
+
+    service = UsersService(db_session)
+    stmt = service._recent_messages_query(user_ids[0], limit=20)
+    bind = db_session.get_bind()
+    compiled = str(stmt.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+
+    if bind.dialect.name == "sqlite":
+        await db_session.execute(text("ANALYZE"))
+        plan_rows = (await db_session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))).all()
+        plan = "\n".join(str(row[-1]) for row in plan_rows)
+        assert "ix_messages_user_id_created_at_id" in plan
+        assert "TEMP B-TREE" not in plan  # отдельной сортировки нет
+    else:
+        await db_session.execute(text("ANALYZE messages"))
+        plan = (await db_session.execute(text(f"EXPLAIN {compiled}"))).scalars().all()
+        plan_text = "\n".join(plan)
+        assert "ix_messages_user_id_created_at_id" in plan_text
+        assert "Sort" not in plan_text
+
+@pytest.mark.asyncio
+async def test_summarize_conversation_is_incremental(monkeypatch):
+    """Тест: резюме сворачивает только сообщения после высокой отметки и вне окна."""
+    from app.core.llm.client import LLMClient
+    from app.workers.tasks import _run_summarize_conversation_logic
+
+    seen_batches: list[list[str]] = []
+
+    async def fake_summarize(self, previous_summary, messages):
+        seen_batches.append([m["content"] for m in messages])
+        return (previous_summary or "") + "".join(m["content"] for m in messages)
+
+    monkeypatch.setattr(LLMClient, "summarize_conversation", fake_summarize)
+
+    async with async_session_context() as session:
+        service = UsersService(session)
+        await service.ensure_user("sum_u")
+        for i in range(6):
+            await service.save_message("sum_u", Message(role="user", content=str(i)))
+
+    assert await _run_summarize_conversation_logic("sum_u", keep_recent=2, batch_size=3) == 4
+    assert seen_batches == [["0", "1", "2"], ["3"]]
+
+    async with async_session_context() as session:
+        service = UsersService(session)
+        await service.save_message("sum_u", Message(role="user", content="6"))
+
+    # Повторный запуск читает только то, что вышло из окна после прошлого прохода
+    assert await _run_summarize_conversation_logic("sum_u", keep_recent=2, batch_size=3) == 1
+    assert seen_batches[-1] == ["4"]
+    async with async_session_context() as session:
+        assert await UsersService(session).get_conversation_summary("sum_u") == "01234"
+
+@pytest.mark.asyncio
+async def test_save_turn_maintains_streak(db_session: AsyncSession):
+    """Тест: серия дней продлевается на следующий день и сбрасывается после пропуска."""
+    from datetime import date
+    service = UsersService(db_session)
+    await service.ensure_user("streak_u")
+
+    days = [date(2026, 10, 1), date(2026, 10, 1), date(2026, 10, 2), date(2026, 10, 3), date(2026, 10, 5)]
+    streaks = [
+        (await service.save_turn("streak_u", "hi", "hello", activity_date=day)).streak_days for day in days
+    ]
+    assert streaks == [1, 1, 2, 3, 1]
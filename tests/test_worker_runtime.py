@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from celery.contrib.testing.worker import start_worker
+
+from app.workers import tasks
+from app.workers.runtime import WorkerRuntime, run_async, runtime
+from app.workers.tasks import celery_app, generate_achievement_task
+
+
+async def _loop_id():
+    await asyncio.sleep(0)
+    return id(asyncio.get_running_loop())
+
+
+def test_runtime_reuses_one_loop_and_shared_clients():
+    rt = WorkerRuntime()
+    try:
+        first, second = rt.run(_loop_id()), rt.run(_loop_id())
+        assert first == second
+        assert rt.llm_client() is rt.llm_client()
+    finally:
+        rt.shutdown()
+
+
+def test_runtime_reset_after_fork_starts_fresh_loop():
+    rt = WorkerRuntime()
+    try:
+        before = rt.run(_loop_id())
+        llm = rt.llm_client()
+        old_loop, old_thread = rt.loop, rt._thread
+        rt.reset_after_fork()
+        assert rt.llm_client() is not llm
+        assert rt.run(_loop_id()) != before
+    finally:
+        rt.shutdown()
+        old_loop.call_soon_threadsafe(old_loop.stop)
+        old_thread.join(5)
+        old_loop.close()
+
+
+def test_runtime_rejects_blocking_call_from_its_own_loop():
+    async def nested():
+        return run_async(_loop_id())
+
+    with pytest.raises(RuntimeError):
+        run_async(nested())
+
+
+TASKS_COUNT = 200
+TASK_LATENCY = 0.01
+
+
+def _drop_cached_connections():
+    # Пул соединений брокера и бэкенд результатов кэшируются приложением при
+    # первом обращении - сбрасываем их, чтобы смена broker_url вступила в силу
+    celery_app._after_fork()
+    celery_app._backend_cache = None
+    celery_app._local = threading.local()
+
+
+@pytest.fixture
+def memory_worker():
+    """Настоящий воркер Celery (пул потоков) с брокером и бэкендом в памяти."""
+    conf = celery_app.conf
+    keys = ("broker_url", "result_backend", "task_always_eager", "broker_transport_options", "worker_prefetch_multiplier")
+    saved = {key: conf[key] for key in keys}
+    conf.update(
+        broker_url="memory://",
+        result_backend="cache+memory://",
+        task_always_eager=False,
+        broker_transport_options={"polling_interval": 0.005}, # По умолчанию брокер в памяти опрашивается раз в секунду
+        worker_prefetch_multiplier=TASKS_COUNT,
+    )
+    _drop_cached_connections()
+    try:
+        with start_worker(celery_app, pool="threads", concurrency=8, perform_ping_check=False, shutdown_timeout=10):
+            yield
+    finally:
+        conf.update(saved)
+        _drop_cached_connections()
+
+
+def test_many_async_tasks_through_memory_broker(memory_worker, monkeypatch):
+    loops = set()
+    threads = set()
+
+    async def fake_logic(task_instance, user_id, achievement_code, theme=None):
+        loops.add(id(asyncio.get_running_loop()))
+        threads.add(threading.get_ident())
+        await asyncio.sleep(TASK_LATENCY) # Имитация ожидания LLM/сети
+        return f"COMPLETED:{achievement_code}"
+
+    monkeypatch.setattr(tasks, "_run_generate_achievement_logic", fake_logic)
+
+    started = time.perf_counter()
+    results = [generate_achievement_task.delay("u1", f"code_{i}", "theme") for i in range(TASKS_COUNT)]
+    values = [r.get(timeout=30, interval=0.005) for r in results]
+    elapsed = time.perf_counter() - started
+
+    assert values == [f"COMPLETED:code_{i}" for i in range(TASKS_COUNT)]
+    # Все корутины выполнены в одном долгоживущем loop процесса
+    assert loops == {id(runtime.loop)}
+    assert len(threads) == 1
+    # Потоки пула ждут свои корутины одновременно: быстрее последовательного выполнения
+    assert elapsed < TASKS_COUNT * TASK_LATENCY